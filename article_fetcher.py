@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from metrics import get_logger
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# NewsAPI appends a "[+1234 chars]" marker to truncated content
+TRUNCATION_MARKER = re.compile(r"\[\+\d+ chars\]\s*$")
+MIN_PARAGRAPH_LENGTH = 40
+NOISE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figure"]
+
+log = get_logger("fetcher")
+
+
+def is_truncated(content: Optional[str]) -> bool:
+    return not content or bool(TRUNCATION_MARKER.search(content))
+
+
+def extract_text(html: bytes) -> str:
+    """Body text of an article page: the paragraphs inside <article>, or all paragraphs"""
+    soup = BeautifulSoup(html, PARSER)
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    container = soup.find("article") or soup.body or soup
+    paragraphs = [p.get_text(" ", strip=True) for p in container.find_all("p")]
+    return "\n\n".join(p for p in paragraphs if len(p) >= MIN_PARAGRAPH_LENGTH)
+
+
+class ArticleFetcher:
+    """Concurrent article page fetcher with global and per-host limits.
+
+    Extracted text is cached on disk together with the response's ETag and
+    Last-Modified validators, so unchanged pages cost a 304 instead of a
+    full download and parse.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "article_cache",
+        max_concurrency: int = 16,
+        per_host: int = 2,
+        timeout: float = 15,
+        user_agent: str = "news-aggregator/0.1"
+    ):
+        self.cache_dir = cache_dir
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=per_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.host_limits: Dict[str, threading.Semaphore] = {}
+        self.host_lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc.lower()
+        with self.host_lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.Semaphore(self.per_host)
+            return self.host_limits[host]
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._cache_path(url)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, url: str, entry: dict):
+        path = self._cache_path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def fetch(self, url: str) -> Optional[str]:
+        """Article text for a URL, or None if it can't be fetched"""
+        cached = self._load(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            with self._host_limit(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            log.warning("Error fetching article page", extra={"url": url, "error": str(e)})
+            return cached["text"] if cached else None
+
+        if response.status_code == 304 and cached:
+            return cached["text"]
+        if response.status_code != 200:
+            return cached["text"] if cached else None
+
+        text = extract_text(response.content)
+        self._store(url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "text": text
+        })
+        return text
+
+    def _fetch_or_none(self, url: str) -> Optional[str]:
+        # A page that fails to parse or cache only loses its own full text
+        try:
+            return self.fetch(url)
+        except Exception as e:
+            log.warning("Error extracting article text", extra={"url": url, "error": str(e)})
+            return None
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(urls))) as executor:
+            return dict(zip(urls, executor.map(self._fetch_or_none, urls)))
@@ -0,0 +1,62 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.1
+
+Exits with status 1 if any throughput dropped or latency grew by more
+than the threshold.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Optional
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = float(value)
+    return metrics
+
+
+def direction(metric: str) -> Optional[int]:
+    """+1 if higher is better, -1 if lower is better, None if not a performance metric"""
+    if metric.endswith("per_second"):
+        return 1
+    if "_ms." in metric or "_us." in metric or metric.endswith(".seconds"):
+        return -1
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a baseline")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change treated as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = flatten({k: v for k, v in json.load(f).items() if k != "meta"})
+    with open(args.current) as f:
+        current = flatten({k: v for k, v in json.load(f).items() if k != "meta"})
+
+    regressions = 0
+    for metric in sorted(baseline.keys() & current.keys()):
+        better = direction(metric)
+        if better is None or not baseline[metric]:
+            continue
+        change = (current[metric] - baseline[metric]) / baseline[metric]
+        regressed = change * better < -args.threshold
+        regressions += regressed
+        marker = "REGRESSION" if regressed else ""
+        print(f"{metric:60s} {baseline[metric]:12.3f} -> {current[metric]:12.3f} {change:+8.1%} {marker}")
+
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "market government research launch company report study players season energy climate "
+    "patients hospital court election results investors growth software device film music "
+    "scientists data policy league tournament vaccine treatment startup funding regulators"
+).split()
+
+
+def make_article(category: str, index: int, now: datetime, rng: random.Random) -> dict:
+    words = rng.choices(WORDS, k=rng.randint(60, 250))
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    content = " ".join(sentences)
+    return {
+        "source": {"id": None, "name": f"Source {index % 12}"},
+        "author": f"Reporter {index % 7}",
+        "title": f"{category.title()} headline {index}: {' '.join(rng.choices(WORDS, k=6))}",
+        "description": sentences[0],
+        # NewsAPI truncates content and appends the remaining length
+        "content": f"{content[:1500]} [+{max(0, len(content) - 1500) + 800} chars]",
+        "url": f"https://news.example.com/{category}/{index}",
+        "publishedAt": (now - timedelta(minutes=index)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    }
+
+
+class FakeNewsAPI:
+    """Local stand-in for the NewsAPI top-headlines endpoint.
+
+    Serves a fixed, seeded set of articles per category with NewsAPI's
+    paging, so collection runs are repeatable and never touch the network.
+    """
+
+    def __init__(self, articles_per_category: int = 100, seed: int = 0, host: str = "127.0.0.1"):
+        self.articles_per_category = articles_per_category
+        self.seed = seed
+        self.requests = 0
+        self.articles: Dict[str, List[dict]] = {}
+        self.now = datetime.now(timezone.utc)
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, 0), self._handler())
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v2/top-headlines"
+
+    def category_articles(self, category: str) -> List[dict]:
+        with self.lock:
+            if category not in self.articles:
+                rng = random.Random(f"{self.seed}-{category}")
+                self.articles[category] = [
+                    make_article(category, i, self.now, rng) for i in range(self.articles_per_category)
+                ]
+            return self.articles[category]
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with api.lock:
+                    api.requests += 1
+                params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                articles = api.category_articles(params.get("category", "general"))
+                page_size = int(params.get("pageSize", 20))
+                page = int(params.get("page", 1))
+                body = json.dumps({
+                    "status": "ok",
+                    "totalResults": len(articles),
+                    "articles": articles[(page - 1) * page_size:page * page_size]
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeNewsAPI":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
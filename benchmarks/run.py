@@ -0,0 +1,241 @@
+"""Offline end-to-end benchmarks.
+
+Runs the collection agent against a local fake NewsAPI, the processing
+agent with stand-in (or tiny) models, and the article search queries, all
+on an in-memory SQLite storage instead of a cluster. Results are written
+as JSON for ``python -m benchmarks.compare``.
+
+    python -m benchmarks.run --output bench.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.fake_newsapi import FakeNewsAPI
+from benchmarks.stub_models import StubClassifier, StubSummarizer, load_tiny_models
+
+CATEGORIES = ['business', 'technology', 'science', 'health', 'entertainment']
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean())
+    }
+
+
+class StageTimer:
+    """Accumulates wall time of agent methods while patched in"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def wrap(self, stage: str, method: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+                self.calls[stage] = self.calls.get(stage, 0) + 1
+        return timed
+
+    @contextmanager
+    def patch(self, cls, stages: Dict[str, str]):
+        """Time the named methods of cls, keyed by stage name"""
+        patches = [
+            mock.patch.object(cls, method, self.wrap(stage, getattr(cls, method)))
+            for stage, method in stages.items()
+        ]
+        for patch in patches:
+            patch.start()
+        try:
+            yield self
+        finally:
+            for patch in patches:
+                patch.stop()
+
+    def report(self) -> Dict[str, dict]:
+        return {
+            stage: {"seconds": round(seconds, 4), "calls": self.calls[stage]}
+            for stage, seconds in self.seconds.items()
+        }
+
+
+def configure_environment(api: FakeNewsAPI, workdir: str, articles_per_category: int, page_size: int):
+    """Point the agents at the fake NewsAPI and a scratch directory; must run before importing them"""
+    os.environ["newsapi_url"] = api.url
+    os.environ["news_api_key"] = "benchmark"
+    os.environ["newsapi_page_size"] = str(page_size)
+    os.environ["newsapi_max_pages"] = str(math.ceil(articles_per_category / page_size))
+    os.environ["collector_state_dir"] = os.path.join(workdir, "collector_state")
+    os.environ["near_duplicate_index"] = os.path.join(workdir, "near_duplicates.json")
+    os.environ["processing_checkpoint"] = os.path.join(workdir, "processing_checkpoint.json")
+    os.environ["fetch_full_text"] = "false"
+    os.environ["semantic_search"] = "false"
+    os.environ.pop("inference_server_url", None)
+    # crewai's default LLM wants a key at construction time, nothing here calls it
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+
+def bench_collection(storage, api: FakeNewsAPI) -> dict:
+    from data_collection_agent import DataCollectionAgent
+    from metrics import STAGE_SECONDS
+
+    agent = DataCollectionAgent(storage)
+    timer = StageTimer()
+    # index_articles consumes documents while pages are still being fetched, so
+    # its wall time includes fetch waits and MinHash; the collector's own index
+    # stage metric leaves those out
+    index_seconds, index_calls = STAGE_SECONDS.total(stage="index")
+    with timer.patch(DataCollectionAgent, {
+        "fetch": "fetch_page",
+        "validate": "format_article"
+    }):
+        start = time.perf_counter()
+        result = agent.collect_from_newsapi(CATEGORIES) or {"indexed": 0, "failed": []}
+        elapsed = time.perf_counter() - start
+
+    stages = timer.report()
+    seconds, calls = STAGE_SECONDS.total(stage="index")
+    stages["index"] = {"seconds": round(seconds - index_seconds, 4), "calls": calls - index_calls}
+
+    return {
+        "articles": result["indexed"],
+        "failed": len(result["failed"]),
+        "newsapi_requests": api.requests,
+        "seconds": round(elapsed, 4),
+        "articles_per_second": round(result["indexed"] / elapsed, 2) if elapsed else 0.0,
+        "stages": stages
+    }
+
+
+def bench_processing(storage, models: str, model_cost_ms: float) -> dict:
+    from data_processing_agent import DataProcessingAgent
+
+    if models == "tiny":
+        summarizer, classifier = load_tiny_models()
+    else:
+        summarizer, classifier = StubSummarizer(model_cost_ms), StubClassifier(model_cost_ms)
+
+    agent = DataProcessingAgent(storage, summarizer=summarizer, classifier=classifier)
+    timer = StageTimer()
+    processed = 0
+    with timer.patch(DataProcessingAgent, {
+        "fetch": "fetch_unprocessed",
+        "summarize": "summarize_tiered",
+        "classify": "classify_batch",
+        "embed": "embed_articles",
+        "update": "write_enrichments"
+    }):
+        start = time.perf_counter()
+        while True:
+            updated = agent.process_articles()
+            processed += updated
+            if not updated:
+                break
+        elapsed = time.perf_counter() - start
+
+    return {
+        "models": models,
+        "articles": processed,
+        "seconds": round(elapsed, 4),
+        "articles_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        "stages": timer.report()
+    }
+
+
+def bench_queries(storage, iterations: int) -> dict:
+    from storage import build_search_query, ui_query_shapes
+
+    fields = ["title", "source", "date", "category", "category_score", "summary", "url"]
+    results = {}
+    for name, params in ui_query_shapes(storage.facets()).items():
+        build_us = []
+        search_ms = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            build_search_query(size=20, fields=fields, **params)
+            build_us.append((time.perf_counter() - start) * 1e6)
+
+            start = time.perf_counter()
+            storage.search(size=20, fields=fields, **params)
+            search_ms.append((time.perf_counter() - start) * 1e3)
+
+        results[name] = {
+            "build_query_us": percentiles(build_us),
+            "search_ms": percentiles(search_ms)
+        }
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline collection, processing and query benchmarks")
+    parser.add_argument("--articles-per-category", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--models", choices=["stub", "tiny"], default="stub",
+                        help="stand-in models, or a tiny random BART through the real pipelines")
+    parser.add_argument("--model-cost-ms", type=float, default=0.0,
+                        help="simulated per-article inference time for the stand-in models")
+    parser.add_argument("--query-iterations", type=int, default=200)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    api = FakeNewsAPI(args.articles_per_category).start()
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(api, workdir, args.articles_per_category, args.page_size)
+        from storage import SQLiteStorage
+
+        storage = SQLiteStorage(":memory:")
+        try:
+            results = {
+                "meta": {
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "revision": git_revision(),
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "storage": storage.name,
+                    "args": vars(args)
+                },
+                "collection": bench_collection(storage, api),
+                "processing": bench_processing(storage, args.models, args.model_cost_ms),
+                "queries": bench_queries(storage, args.query_iterations)
+            }
+        finally:
+            storage.close()
+            api.stop()
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
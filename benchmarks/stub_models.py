@@ -0,0 +1,57 @@
+import hashlib
+import time
+from typing import List, Sequence, Union
+
+# Randomly initialized BART small enough to run on any CPU; exercises the
+# real transformers pipeline code paths without the cost of the real models
+TINY_MODEL = "sshleifer/bart-tiny-random"
+
+
+class StubSummarizer:
+    """Called like the summarization pipeline; returns the leading words of each text.
+
+    ``cost_ms`` adds a fixed per-text delay to model inference time.
+    """
+
+    tokenizer = None
+
+    def __init__(self, cost_ms: float = 0.0):
+        self.cost = cost_ms / 1000
+
+    def __call__(self, texts: Union[str, List[str]], max_length: int = 130, **kwargs) -> List[dict]:
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        if self.cost:
+            time.sleep(self.cost * len(texts))
+        return [{"summary_text": " ".join(text.split()[:max_length // 2])} for text in texts]
+
+
+class StubClassifier:
+    """Called like the zero-shot-classification pipeline; picks a label from a hash of the text"""
+
+    def __init__(self, cost_ms: float = 0.0):
+        self.cost = cost_ms / 1000
+
+    def _classify(self, text: str, candidate_labels: Sequence[str]) -> dict:
+        digest = int(hashlib.sha1(text.encode("utf-8")).hexdigest(), 16)
+        labels = list(candidate_labels)
+        top = digest % len(labels)
+        ordered = [labels[top]] + labels[:top] + labels[top + 1:]
+        scores = [0.6] + [0.4 / (len(labels) - 1)] * (len(labels) - 1) if len(labels) > 1 else [1.0]
+        return {"sequence": text, "labels": ordered, "scores": scores}
+
+    def __call__(self, texts: Union[str, List[str]], candidate_labels: Sequence[str] = (), **kwargs):
+        if isinstance(texts, str):
+            return self([texts], candidate_labels, **kwargs)[0]
+        if self.cost:
+            time.sleep(self.cost * len(texts))
+        return [self._classify(text, candidate_labels) for text in texts]
+
+
+def load_tiny_models():
+    """Real transformers pipelines around a tiny random model (downloaded once, then cached)"""
+    from transformers import pipeline
+
+    return (
+        pipeline("summarization", model=TINY_MODEL),
+        pipeline("zero-shot-classification", model=TINY_MODEL)
+    )
@@ -1,38 +1,241 @@
-import os
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, NotFoundError
+
+from index_management import MAPPINGS, READ_ALIAS, WRITE_ALIAS, has_legacy_index
+from storage import ElasticsearchStorage, build_search_query, create_es_client, facet_query, ui_query_shapes
 
 # Load environment variables
 load_dotenv()
 
-def check_index():
-    try:
-        # Initialize connection
-        es = Elasticsearch(
-            cloud_id="news_aggregator:dXMtY2VudHJhbDEuZ2NwLmNsb3VkLmVzLmlvJGU1NzU1MDM3OWM4YTQzZTZiZTRjNzQ3NmIwYTlkNmY0JDU1ZWU4ZDQyNTdkYTRhMmY4ZDE4MGZlY2Q4NzRlZTdl",
-            basic_auth=(os.getenv("elastic_username"), os.getenv("elastic_password")),
-            timeout=30
+# The article list page, as streamlit_app.py requests it
+LIST_FIELDS = ["title", "source", "date", "category", "category_score", "summary", "url"]
+PAGE_SIZE = 20
+
+TOP_COMPONENTS = 5
+# Partitions that no longer receive writes are worth merging above these
+MAX_SEGMENTS_PER_SHARD = 1
+MAX_DELETED_RATIO = 0.1
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2)
+    }
+
+
+def human_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def query_requests(storage: ElasticsearchStorage) -> Dict[str, Tuple[str, dict]]:
+    """The UI's article searches and facet aggregation, as (index, body)"""
+    requests = {
+        name: (
+            storage.search_indices(params.get("date_range")),
+            build_search_query(size=PAGE_SIZE, fields=LIST_FIELDS, **params)
         )
-        
-        # Check if index exists
-        if es.indices.exists(index="news"):
-            # Get document count
-            count = es.count(index="news")
-            print(f"Index 'news' exists with {count['count']} documents")
-            
-            # Get a sample document
-            sample = es.search(
-                index="news",
-                body={"size": 1}
+        for name, params in ui_query_shapes(storage.facets()).items()
+    }
+    requests["facets"] = (READ_ALIAS, facet_query())
+    return requests
+
+
+def profile_components(profile: dict) -> List[Tuple[str, float]]:
+    """Milliseconds per query, collector, aggregation and fetch component, summed
+    over shards and including children, slowest first"""
+    totals = defaultdict(float)
+
+    def walk(node: dict, kind: str):
+        name = node.get("type") or node.get("name")
+        description = (node.get("description") or node.get("reason") or "")[:120]
+        label = kind if name == kind else f"{kind} {name}"
+        totals[f"{label} {description}".strip()] += node.get("time_in_nanos", 0) / 1e6
+        for child in node.get("children", []):
+            walk(child, kind)
+
+    for shard in profile.get("shards", []):
+        for search in shard.get("searches", []):
+            for query in search.get("query", []):
+                walk(query, "query")
+            for collector in search.get("collector", []):
+                walk(collector, "collector")
+        for aggregation in shard.get("aggregations", []):
+            walk(aggregation, "aggregation")
+        if "fetch" in shard:
+            walk(shard["fetch"], "fetch")
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def profile_queries(es: Elasticsearch, iterations: int) -> Dict[str, dict]:
+    """Latency percentiles of each UI request, and its most expensive components from one profiled run"""
+    report = {}
+    for name, (index, body) in query_requests(ElasticsearchStorage(es)).items():
+        latencies = []
+        took = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            # Bypass the request cache, otherwise repeated facet requests measure a cache hit
+            res = es.search(index=index, body=body, ignore_unavailable=True, request_cache=False)
+            latencies.append((time.perf_counter() - start) * 1e3)
+            took.append(res["took"])
+
+        profiled = es.search(index=index, body=dict(body, profile=True), ignore_unavailable=True, request_cache=False)
+        report[name] = {
+            "index": index,
+            "latency_ms": percentiles(latencies),
+            "took_ms": percentiles(took),
+            "components": [
+                {"component": component, "ms": round(ms, 3)}
+                for component, ms in profile_components(profiled["profile"])[:TOP_COMPONENTS]
+            ]
+        }
+    return report
+
+
+def mapping_mismatches(properties: dict) -> List[str]:
+    """Fields whose mapping differs from the template the queries are written against"""
+    problems = []
+    for field, expected in MAPPINGS["properties"].items():
+        actual = properties.get(field)
+        if actual is None:
+            problems.append(f"{field} is not mapped (expected {expected['type']})")
+        elif actual.get("type") != expected["type"]:
+            problem = f"{field} is mapped as {actual.get('type')}, expected {expected['type']}"
+            if "keyword" in actual.get("fields", {}):
+                problem += f"; filters, sorts and aggregations on {field} need {field}.keyword"
+            problems.append(problem)
+    return problems
+
+
+def index_health(es: Elasticsearch) -> List[dict]:
+    """Segments, store size, field data and mapping problems of every index behind the read alias"""
+    stats = es.indices.stats(
+        index=READ_ALIAS,
+        metric="docs,store,segments,fielddata",
+        fielddata_fields="*",
+        level="shards"
+    )["indices"]
+    mappings = es.indices.get_mapping(index=READ_ALIAS)
+    try:
+        write_indices = set(es.indices.get_alias(name=WRITE_ALIAS))
+    except NotFoundError:
+        # No partitions (a legacy index), so assume everything is still written to
+        write_indices = set(stats)
+
+    report = []
+    for index in sorted(stats):
+        primaries = stats[index]["primaries"]
+        shards = max(1, len(stats[index].get("shards", {})))
+        docs = primaries["docs"]["count"]
+        deleted = primaries["docs"]["deleted"]
+        fielddata = {
+            field: usage["memory_size_in_bytes"]
+            for field, usage in primaries["fielddata"].get("fields", {}).items()
+            if usage["memory_size_in_bytes"]
+        }
+        report.append({
+            "index": index,
+            "written": index in write_indices,
+            "docs": docs,
+            "deleted_docs": deleted,
+            "store_bytes": primaries["store"]["size_in_bytes"],
+            "segments": primaries["segments"]["count"],
+            "shards": shards,
+            "fielddata_bytes": primaries["fielddata"]["memory_size_in_bytes"],
+            "fielddata_fields": fielddata,
+            "mapping_mismatches": mapping_mismatches(mappings[index]["mappings"].get("properties", {})),
+            "unmapped_in_template": sorted(
+                set(mappings[index]["mappings"].get("properties", {})) - set(MAPPINGS["properties"])
             )
-            if sample["hits"]["hits"]:
-                print("\nSample document:")
-                print(sample["hits"]["hits"][0]["_source"])
-        else:
-            print("Index 'news' does not exist")
-            
-    except Exception as e:
-        print(f"Error: {str(e)}")
+        })
+    return report
+
+
+def recommendations(es: Elasticsearch, queries: Dict[str, dict], indices: List[dict]) -> List[str]:
+    advice = []
+    if has_legacy_index(es):
+        advice.append(f"'{READ_ALIAS}' is a legacy index: run 'python index_management.py migrate' "
+                      "to move it into monthly partitions")
+
+    for index in indices:
+        name = index["index"]
+        deleted_ratio = index["deleted_docs"] / max(1, index["docs"] + index["deleted_docs"])
+        if not index["written"] and (
+            index["segments"] > MAX_SEGMENTS_PER_SHARD * index["shards"] or deleted_ratio > MAX_DELETED_RATIO
+        ):
+            advice.append(f"{name} no longer receives new articles and has {index['segments']} segments "
+                          f"({deleted_ratio:.0%} deleted docs): POST {name}/_forcemerge?max_num_segments=1")
+        if index["mapping_mismatches"]:
+            advice.append(f"{name} doesn't match the template ({'; '.join(index['mapping_mismatches'])}): "
+                          "mappings can't change in place, reindex it into a partition created from the template")
+        if index["fielddata_fields"]:
+            fields = ", ".join(f"{field} ({human_bytes(size)})" for field, size in index["fielddata_fields"].items())
+            advice.append(f"{name} holds text field data on the heap for {fields}: "
+                          "sort and aggregate on keyword fields instead")
+
+    for name, query in queries.items():
+        latency, took = query["latency_ms"]["p50"], query["took_ms"]["p50"]
+        if latency > 2 * took + 20:
+            advice.append(f"{name}: {latency:.0f}ms end to end but {took:.0f}ms in Elasticsearch, "
+                          "most of the time is spent in the network or client")
+    return advice
+
+
+def print_report(queries: Dict[str, dict], indices: List[dict], advice: List[str]):
+    total_docs = sum(index["docs"] for index in indices)
+    print(f"'{READ_ALIAS}' has {total_docs} documents in {len(indices)} indices\n")
+
+    print("Indices:")
+    for index in indices:
+        print(f"  {index['index']}{' (write)' if index['written'] else ''}: {index['docs']} docs, "
+              f"{index['deleted_docs']} deleted, {human_bytes(index['store_bytes'])}, "
+              f"{index['segments']} segments, field data {human_bytes(index['fielddata_bytes'])}")
+        for problem in index["mapping_mismatches"]:
+            print(f"    mapping: {problem}")
+        if index["unmapped_in_template"]:
+            print(f"    fields outside the template: {', '.join(index['unmapped_in_template'])}")
+
+    if queries:
+        print("\nQueries (ms):")
+        for name, query in queries.items():
+            latency, took = query["latency_ms"], query["took_ms"]
+            print(f"  {name}: p50 {latency['p50']} / p95 {latency['p95']} / p99 {latency['p99']} "
+                  f"end to end, p50 {took['p50']} in Elasticsearch")
+            for component in query["components"]:
+                print(f"    {component['ms']:10.3f}  {component['component']}")
+
+    print("\nRecommendations:")
+    for line in advice or ["none"]:
+        print(f"  - {line}")
+
 
 if __name__ == "__main__":
-    check_index()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Profile the UI's queries and report on the health of the news index")
+    parser.add_argument("--iterations", type=int, default=20, help="timed runs of each query")
+    parser.add_argument("--skip-queries", action="store_true", help="only report on the index layout")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    es = create_es_client()
+    indices = index_health(es)
+    queries = {} if args.skip_queries else profile_queries(es, args.iterations)
+    advice = recommendations(es, queries, indices)
+
+    if args.json:
+        print(json.dumps({"indices": indices, "queries": queries, "recommendations": advice}, indent=2))
+    else:
+        print_report(queries, indices, advice)
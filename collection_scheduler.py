@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable
+
+from data_collection_agent import CATEGORIES, DataCollectionAgent
+from metrics import get_logger
+from rate_limiting import TokenBucket
+
+log = get_logger("scheduler")
+
+
+@dataclass
+class CategorySchedule:
+    category: str
+    interval: float
+    next_due: float = 0.0
+    last_polled: float = 0.0
+    # Exponentially weighted new articles per hour
+    rate: float = 0.0
+
+
+class CollectionScheduler:
+    """Long-running collector that polls busy categories more often than quiet ones.
+
+    After every poll, a category's interval is set so that roughly
+    ``target_per_poll`` new articles are expected at the next poll, clamped
+    between ``min_interval`` and ``max_interval`` seconds. All NewsAPI
+    requests share one token bucket sized to the plan's daily quota.
+    """
+
+    def __init__(
+        self,
+        agent: DataCollectionAgent,
+        categories: Iterable[str] = CATEGORIES,
+        requests_per_day: int = 100,
+        burst: int = 10,
+        min_interval: float = 300,
+        max_interval: float = 3600,
+        target_per_poll: float = 5,
+        smoothing: float = 0.3,
+        state_path: str = None
+    ):
+        self.agent = agent
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_per_poll = target_per_poll
+        self.smoothing = smoothing
+        self.state_path = state_path
+
+        self.rate_limiter = TokenBucket(rate=requests_per_day / 86400, capacity=burst)
+        self.agent.rate_limiter = self.rate_limiter
+
+        now = time.time()
+        self.schedules: Dict[str, CategorySchedule] = {
+            category: CategorySchedule(category, interval=min_interval, next_due=now)
+            for category in categories
+        }
+        self.load_state()
+
+    def load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            saved = json.load(f)
+        for category, values in saved.items():
+            if category in self.schedules:
+                self.schedules[category] = CategorySchedule(**values)
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({category: asdict(schedule) for category, schedule in self.schedules.items()}, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def record_poll(self, schedule: CategorySchedule, new_articles: int, now: float):
+        """Update the category's arrival rate and derive its next polling interval"""
+        if schedule.last_polled:
+            hours = max((now - schedule.last_polled) / 3600, 1 / 3600)
+            observed = new_articles / hours
+            schedule.rate = self.smoothing * observed + (1 - self.smoothing) * schedule.rate
+
+        if schedule.rate > 0:
+            interval = self.target_per_poll / schedule.rate * 3600
+        else:
+            # Nothing new seen yet: back off gradually towards the maximum
+            interval = schedule.interval * 2
+        schedule.interval = min(self.max_interval, max(self.min_interval, interval))
+        schedule.last_polled = now
+        schedule.next_due = now + schedule.interval
+
+    def poll(self, schedule: CategorySchedule):
+        result = self.agent.collect_from_newsapi([schedule.category]) or {}
+        new_articles = result.get('indexed', 0)
+        self.record_poll(schedule, new_articles, time.time())
+        log.info("Polled category", extra={
+            "category": schedule.category,
+            "new_articles": new_articles,
+            "rate_per_hour": round(schedule.rate, 1),
+            "next_poll_minutes": round(schedule.interval / 60)
+        })
+
+    def run_forever(self):
+        log.info("Scheduling categories", extra={"categories": len(self.schedules)})
+        while True:
+            schedule = min(self.schedules.values(), key=lambda s: s.next_due)
+            delay = schedule.next_due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.poll(schedule)
+            self.save_state()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously collect news with adaptive per-category polling")
+    parser.add_argument("--requests-per-day", type=int, default=int(os.getenv("newsapi_requests_per_day", 100)),
+                        help="NewsAPI request quota to stay within")
+    parser.add_argument("--burst", type=int, default=int(os.getenv("newsapi_burst", 10)))
+    parser.add_argument("--min-interval", type=float, default=300, help="shortest polling interval in seconds")
+    parser.add_argument("--max-interval", type=float, default=3600, help="longest polling interval in seconds")
+    parser.add_argument("--target-per-poll", type=float, default=5,
+                        help="new articles per poll the intervals are tuned for")
+    args = parser.parse_args()
+
+    agent = DataCollectionAgent()
+    scheduler = CollectionScheduler(
+        agent,
+        requests_per_day=args.requests_per_day,
+        burst=args.burst,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        target_per_poll=args.target_per_poll,
+        state_path=os.path.join(os.getenv("collector_state_dir", "collector_state"), "schedule.json")
+    )
+    scheduler.run_forever()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import math
+import os
+import struct
+from typing import Dict, Optional
+
+HEADER = struct.Struct("<QIQ")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, stored as a flat bit array on disk"""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        # Double hashing gives num_hashes independent-enough positions from one digest
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        new = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] >> bit & 1:
+                self.bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position // 8] >> (position % 8) & 1 for position in self._positions(item))
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with open(path, "rb") as f:
+            num_bits, num_hashes, count = HEADER.unpack(f.read(HEADER.size))
+            bits = bytearray(f.read())
+        bloom = cls.__new__(cls)
+        bloom.num_bits, bloom.num_hashes, bloom.count, bloom.bits = num_bits, num_hashes, count, bits
+        return bloom
+
+
+class CollectionState:
+    """What the collector has already ingested: a seen-URL Bloom filter and per-category publishedAt watermarks"""
+
+    def __init__(self, directory: str, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.directory = directory
+        self.bloom_path = os.path.join(directory, "seen_urls.bloom")
+        self.watermarks_path = os.path.join(directory, "watermarks.json")
+
+        if os.path.exists(self.bloom_path):
+            self.seen_urls = BloomFilter.load(self.bloom_path)
+        else:
+            self.seen_urls = BloomFilter(capacity, error_rate)
+
+        self.watermarks: Dict[str, str] = {}
+        if os.path.exists(self.watermarks_path):
+            with open(self.watermarks_path) as f:
+                self.watermarks = json.load(f)
+
+    def is_new(self, category: str, url: str, published_at: Optional[str]) -> bool:
+        """False for URLs already ingested or articles no newer than the category watermark"""
+        if not url or url in self.seen_urls:
+            return False
+        watermark = self.watermarks.get(category)
+        # NewsAPI timestamps are uniform ISO 8601 UTC strings, so they compare as strings
+        return not (watermark and published_at and published_at <= watermark)
+
+    def mark_ingested(self, category: str, url: str, published_at: Optional[str], watermark_limit: Optional[str] = None):
+        """Record an ingested article; the watermark only advances to timestamps below ``watermark_limit``"""
+        self.seen_urls.add(url)
+        if published_at and published_at > self.watermarks.get(category, "") and \
+                (watermark_limit is None or published_at < watermark_limit):
+            self.watermarks[category] = published_at
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.seen_urls.save(self.bloom_path)
+        tmp_path = f"{self.watermarks_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.watermarks, f, indent=2)
+        os.replace(tmp_path, self.watermarks_path)
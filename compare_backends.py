@@ -0,0 +1,142 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import time
+from typing import Iterable, List, Optional
+
+from data_processing_agent import CATEGORIES, HYPOTHESIS_TEMPLATE
+from inference_backends import BACKENDS, SUMMARIZATION_MODEL, ZERO_SHOT_MODEL, load_pipeline
+
+
+def load_texts(path: str, limit: int) -> List[str]:
+    """Read article texts from a JSON lines file (with a 'content' field) or a plain text file"""
+    texts = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                text = json.loads(line).get("content", "")
+            except (ValueError, AttributeError):
+                text = line
+            if text:
+                texts.append(text)
+            if len(texts) >= limit:
+                break
+    return texts
+
+
+def benchmark_backend(backend: str, texts: List[str], batch_size: int) -> dict:
+    """Load one backend and time it over the texts; runs in its own process so RSS is comparable"""
+    if not texts:
+        raise ValueError("No article texts to benchmark")
+
+    start = time.perf_counter()
+    summarizer = load_pipeline("summarization", SUMMARIZATION_MODEL, backend)
+    classifier = load_pipeline("zero-shot-classification", ZERO_SHOT_MODEL, backend)
+    load_seconds = time.perf_counter() - start
+
+    summaries, summary_latencies = [], []
+    for text in texts:
+        start = time.perf_counter()
+        summaries.append(summarizer(text[:1024], max_length=130, min_length=30, do_sample=False, truncation=True)[0]["summary_text"])
+        summary_latencies.append(time.perf_counter() - start)
+
+    categories, classify_latencies = [], []
+    for text in texts:
+        start = time.perf_counter()
+        result = classifier(text[:512], candidate_labels=CATEGORIES, hypothesis_template=HYPOTHESIS_TEMPLATE)
+        categories.append((result["labels"][0], float(result["scores"][0])))
+        classify_latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    summarizer([text[:1024] for text in texts], max_length=130, min_length=30, do_sample=False, truncation=True, batch_size=batch_size)
+    batched_seconds = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "summarize_ms_p50": statistics.median(summary_latencies) * 1000,
+        "summarize_ms_max": max(summary_latencies) * 1000,
+        "classify_ms_p50": statistics.median(classify_latencies) * 1000,
+        "classify_ms_max": max(classify_latencies) * 1000,
+        "batched_articles_per_second": len(texts) / batched_seconds,
+        "summaries": summaries,
+        "categories": categories,
+    }
+
+
+def unigram_f1(candidate: str, reference: str) -> float:
+    """ROUGE-1 style F1 between two summaries"""
+    candidate_tokens = candidate.lower().split()
+    reference_tokens = reference.lower().split()
+    if not candidate_tokens or not reference_tokens:
+        return 0.0
+    overlap = sum(min(candidate_tokens.count(token), reference_tokens.count(token)) for token in set(candidate_tokens))
+    precision = overlap / len(candidate_tokens)
+    recall = overlap / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall) if overlap else 0.0
+
+
+def mean(values: Iterable[float]) -> Optional[float]:
+    """Mean of the values, or None when there are none to compare"""
+    values = list(values)
+    return statistics.mean(values) if values else None
+
+
+def compare(results: List[dict]) -> List[dict]:
+    """Score every backend against the first one (the fp32 PyTorch reference)"""
+    reference = results[0]
+    rows = []
+    for result in results:
+        rows.append({
+            **{key: value for key, value in result.items() if key not in ("summaries", "categories")},
+            "summary_rouge1_vs_reference": mean(
+                unigram_f1(a, b) for a, b in zip(result["summaries"], reference["summaries"])
+            ),
+            "category_agreement": mean(
+                a[0] == b[0] for a, b in zip(result["categories"], reference["categories"])
+            ),
+            "category_score_mae": mean(
+                abs(a[1] - b[1]) for a, b in zip(result["categories"], reference["categories"])
+            ),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare accuracy and latency of the inference backends")
+    parser.add_argument("input", help="JSON lines file with a 'content' field, or one article per line")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS,
+                        help="backends to compare; the first one is the accuracy reference")
+    parser.add_argument("--limit", type=int, default=50, help="number of articles to use")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    texts = load_texts(args.input, args.limit)
+    if not texts:
+        parser.error(f"no article texts found in {args.input}")
+    print(f"Comparing {', '.join(args.backends)} on {len(texts)} articles")
+
+    # A fresh process per backend keeps memory measurements independent
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in args.backends:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(benchmark_backend, (backend, texts, args.batch_size)))
+
+    rows = compare(results)
+    for row in rows:
+        print(f"\n{row['backend']}")
+        for key, value in row.items():
+            if key != "backend":
+                print(f"  {key}: {'n/a' if value is None else f'{value:.3f}'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
@@ -1,24 +1,52 @@
 from crewai import Agent
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from elasticsearch import Elasticsearch
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import Field, ConfigDict
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import hashlib
+import math
 import os
+import time
 from dotenv import load_dotenv
+from near_duplicates import NearDuplicateIndex, minhash
+from collection_state import CollectionState
+from rate_limiting import RateLimitError, TokenBucket
+from rollups import created_counts, daily_key
+from article_fetcher import ArticleFetcher, is_truncated
+from index_management import bulk_load, bulk_load_partitions, ensure_index_setup
+from storage import ElasticsearchStorage, Storage, open_storage
+from metrics import ARTICLES, NEWSAPI_REQUESTS, STAGE_SECONDS, get_logger, start_exporter, timed
 
 
 # Load environment variables
 load_dotenv()
 
+NEWSAPI_URL = os.getenv('newsapi_url', 'https://newsapi.org/v2/top-headlines')
+CATEGORIES = ['business', 'technology', 'science', 'health', 'entertainment']
+
+log = get_logger("collector")
+
+
 class DataCollectionAgent(Agent):
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    es: Elasticsearch = Field(default=None, exclude=True)
+    storage: Storage = Field(default=None, exclude=True)
+    es: Optional[Elasticsearch] = Field(default=None, exclude=True)
     headers: Dict[str, str] = Field(default=None, exclude=True)
     news_api_key: str = Field(default=None, exclude=True)
+    session: requests.Session = Field(default=None, exclude=True)
+    fetch_concurrency: int = Field(default=8, exclude=True)
+    page_size: int = Field(default=20, exclude=True)
+    max_pages: int = Field(default=5, exclude=True)
+    near_duplicates: NearDuplicateIndex = Field(default=None, exclude=True)
+    bulk_load_mode: bool = Field(default=False, exclude=True)
+    collection_state: CollectionState = Field(default=None, exclude=True)
+    rate_limiter: Optional[TokenBucket] = Field(default=None, exclude=True)
+    article_fetcher: Optional[ArticleFetcher] = Field(default=None, exclude=True)
     
-    def __init__(self):
+    def __init__(self, storage: Optional[Storage] = None):
         super().__init__(
             name="News Collection Agent",
             role="News Collector",
@@ -28,101 +56,290 @@ class DataCollectionAgent(Agent):
         )
         
         try:
-            # Get credentials from environment variables
-            elastic_username = os.getenv("elastic_username")
-            elastic_password = os.getenv("elastic_password")
-            
-            if not elastic_username or not elastic_password:
-                raise ValueError("Elasticsearch credentials not found in environment variables")
-            
-            print(f"Attempting to connect with username: {elastic_username}")
-            
-            # Initialize Elasticsearch with Cloud ID
-            self.es = Elasticsearch(
-                cloud_id="news_aggregator:dXMtY2VudHJhbDEuZ2NwLmNsb3VkLmVzLmlvJGU1NzU1MDM3OWM4YTQzZTZiZTRjNzQ3NmIwYTlkNmY0JDU1ZWU4ZDQyNTdkYTRhMmY4ZDE4MGZlY2Q4NzRlZTdl",
-                basic_auth=(elastic_username, elastic_password),
-                timeout=30,
-                retry_on_timeout=True,
-                max_retries=3
-            )
-            
-            # Test connection
-            info = self.es.info()
-            print(f"Successfully connected to Elasticsearch version: {info['version']['number']}")
-            
+            self.storage = storage or open_storage()
+            if isinstance(self.storage, ElasticsearchStorage):
+                self.es = self.storage.es
+
+                # Test connection
+                info = self.es.info()
+                log.info("Connected to Elasticsearch", extra={"version": info['version']['number']})
+
+                # Make sure the template, current partition and aliases exist before writing
+                ensure_index_setup(self.es)
+            else:
+                log.info("Using local storage", extra={"backend": self.storage.name})
+
         except Exception as e:
-            print(f"Error connecting to Elasticsearch: {str(e)}")
+            log.error("Error connecting to storage", extra={"error": str(e)})
             raise
         
         self.news_api_key = os.getenv("news_api_key")
         if not self.news_api_key:
             raise ValueError("NewsAPI key not found in environment variables")
-            
-        print(f"Elasticsearch connected: {self.es.info()}")
 
+        # Bulk load mode relaxes the current Elasticsearch partition during large ingests
+        self.bulk_load_mode = os.getenv("bulk_load_mode", "false").lower() == "true"
+
+        # NewsAPI fetch settings
+        self.fetch_concurrency = int(os.getenv("fetch_concurrency", self.fetch_concurrency))
+        self.page_size = int(os.getenv("newsapi_page_size", self.page_size))
+        self.max_pages = int(os.getenv("newsapi_max_pages", self.max_pages))
+
+        # Shared keep-alive session sized for the fetch thread pool
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.fetch_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Near-duplicate clusters survive across runs so syndicated copies join existing clusters
+        self.near_duplicates = NearDuplicateIndex(
+            os.getenv("near_duplicate_index", "near_duplicates.json"),
+            max_age_days=float(os.getenv("near_duplicate_max_age_days", 7))
+        )
+
+        # Seen URLs and per-category watermarks let steady-state runs skip everything already ingested
+        self.collection_state = CollectionState(os.getenv("collector_state_dir", "collector_state"))
+
+        # Optionally replace NewsAPI's truncated content with the text of the original page
+        if os.getenv("fetch_full_text", "false").lower() == "true":
+            self.article_fetcher = ArticleFetcher(
+                cache_dir=os.getenv("article_cache_dir", "article_cache"),
+                max_concurrency=int(os.getenv("full_text_concurrency", 16)),
+                per_host=int(os.getenv("full_text_per_host", 2))
+            )
+
+        # /metrics endpoint or textfile export, when configured
+        start_exporter()
+
+
+    @staticmethod
+    def document_id(url: str) -> str:
+        """Deterministic document ID derived from the article URL"""
+        return hashlib.sha1(url.strip().encode('utf-8')).hexdigest()
+
+    def format_article(self, article: dict, category: str) -> Optional[dict]:
+        """Validate a NewsAPI article and convert it to an index document"""
+        # Better content validation
+        title = (article.get('title') or '').strip()
+        content = (article.get('content') or article.get('description') or '').strip()
+        url = (article.get('url') or '').strip()
+
+        # Skip articles with insufficient content or no URL to identify them by
+        if not title or not content or len(content) < 100 or not url:
+            log.debug("Skipping article with insufficient content", extra={"title": title})
+            ARTICLES.inc(outcome="invalid")
+            return None
+
+        return {
+            'title': title,
+            'content': content,
+            'url': url,
+            'source': (article.get('source') or {}).get('name') or 'Unknown',
+            'date': article.get('publishedAt') or datetime.now().isoformat(),
+            'category': category.title(),
+            'author': article.get('author') or 'Unknown',
+            'description': article.get('description') or ''
+        }
 
-    def collect_from_newsapi(self):
+    def index_articles(self, docs: Iterable[dict]) -> Dict[str, object]:
+        """Upsert documents keyed by URL, returning success count and per-item failures"""
+        keys = {}
+        waited = 0.0
+
+        def keyed(docs):
+            # Documents arrive while pages are still being fetched, so track the
+            # time spent waiting on them to keep it out of the index stage
+            nonlocal waited
+            docs = iter(docs)
+            while True:
+                start = time.perf_counter()
+                doc = next(docs, None)
+                waited += time.perf_counter() - start
+                if doc is None:
+                    return
+                doc_id = self.document_id(doc['url'])
+                keys[doc_id] = daily_key(doc)
+                yield dict(doc, _id=doc_id)
+
+        start = time.perf_counter()
+        result = self.storage.bulk_upsert(keyed(docs))
+        STAGE_SECONDS.observe(time.perf_counter() - start - waited, stage="index")
+        ARTICLES.inc(result['indexed'], outcome="indexed")
+        ARTICLES.inc(len(result['failed']), outcome="failed")
+
+        # Only articles seen for the first time add to the daily volume rollup
         try:
-            # Define categories to fetch
-            categories = ['business', 'technology', 'science', 'health', 'entertainment']
-            
-            for category in categories:
-                url = 'https://newsapi.org/v2/top-headlines'
-                params = {
-                    'apiKey': self.news_api_key,
-                    'category': category,
-                    'language': 'en',
-                    'pageSize': 20,
-                    'country': 'us'  # Add country parameter for better results
-                }
-                
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                news_data = response.json()
-                
-                if news_data['status'] != 'ok':
-                    print(f"Error fetching {category} news: {news_data.get('message', 'Unknown error')}")
-                    continue
-                
-                for article in news_data['articles']:
+            self.storage.add_daily_counts(created_counts(keys, result['created']))
+        except Exception as e:
+            log.warning("Error updating daily counts", extra={"error": str(e)})
+        return result
+
+    def fetch_page(self, category: str, page: int) -> dict:
+        """Fetch one page of top headlines for a category"""
+        params = {
+            'apiKey': self.news_api_key,
+            'category': category,
+            'language': 'en',
+            'pageSize': self.page_size,
+            'page': page,
+            'country': 'us'  # Add country parameter for better results
+        }
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        with timed("fetch", category=category, page=page):
+            response = self.session.get(NEWSAPI_URL, params=params, timeout=30)
+        NEWSAPI_REQUESTS.inc(status=response.status_code)
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            if self.rate_limiter:
+                self.rate_limiter.backoff(retry_after)
+            raise RateLimitError(f"NewsAPI rate limit hit for {category}", retry_after)
+        response.raise_for_status()
+
+        if self.rate_limiter:
+            self.rate_limiter.reset_backoff()
+        return response.json()
+
+    def add_full_text(self, articles: List[dict]):
+        """Fetch the original pages of truncated articles concurrently and use their text as content"""
+        urls = [article['url'].strip() for article in articles if is_truncated(article.get('content'))]
+        texts = self.article_fetcher.fetch_all(urls)
+        for article in articles:
+            text = texts.get(article['url'].strip())
+            if text and len(text) > len(article.get('content') or ''):
+                article['content'] = text
+
+    def iter_documents(
+        self,
+        categories: Iterable[str] = CATEGORIES,
+        ingested: Optional[Dict[str, Tuple[str, str, Optional[str]]]] = None
+    ) -> Iterator[dict]:
+        """Fetch all categories and pages concurrently, yielding new valid documents as pages arrive.
+
+        Every yielded document is recorded in ``ingested`` as
+        ``{doc_id: (category, url, publishedAt)}``.
+        """
+        ingested = {} if ingested is None else ingested
+
+        with ThreadPoolExecutor(max_workers=self.fetch_concurrency) as executor:
+            pending = {
+                executor.submit(self.fetch_page, category, 1): (category, 1)
+                for category in categories
+            }
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    category, page = pending.pop(future)
                     try:
-                        # Better content validation
-                        title = article.get('title', '').strip()
-                        content = article.get('content', article.get('description', '')).strip()
-                        
-                        # Skip articles with insufficient or duplicate content
-                        if not title or not content or len(content) < 100:
-                            print(f"Skipping article due to insufficient content: {title}")
-                            continue
-                            
-                        # Format the article
-                        doc = {
-                            'title': title,
-                            'content': content,
-                            'url': article.get('url', ''),
-                            'source': article.get('source', {}).get('name', 'Unknown'),
-                            'date': article.get('publishedAt', datetime.now().isoformat()),
-                            'category': category.title(),
-                            'author': article.get('author', 'Unknown'),
-                            'description': article.get('description', '')
-                        }
-                        
-                        # Index the article
-                        self.es.index(index='news', document=doc)
-                        print(f"Indexed {category} article: {title}")
-                        
+                        news_data = future.result()
                     except Exception as e:
-                        print(f"Error processing article: {str(e)}")
+                        log.warning("Error fetching NewsAPI page", extra={"category": category, "page": page, "error": str(e)})
+                        continue
+
+                    if news_data['status'] != 'ok':
+                        log.warning("NewsAPI returned an error", extra={"category": category, "error": news_data.get('message', 'Unknown error')})
                         continue
-                        
+
+                    # Drop anything already ingested before doing any work on it
+                    new_articles = []
+                    for article in news_data['articles']:
+                        url = (article.get('url') or '').strip()
+                        if url and self.document_id(url) not in ingested and \
+                                self.collection_state.is_new(category, url, article.get('publishedAt')):
+                            new_articles.append(article)
+                    ARTICLES.inc(len(news_data['articles']) - len(new_articles), outcome="seen")
+
+                    # Queue the remaining pages once we know how many there are,
+                    # unless the first page has nothing new either
+                    if page == 1 and new_articles:
+                        total_pages = math.ceil(news_data.get('totalResults', 0) / self.page_size)
+                        for next_page in range(2, min(total_pages, self.max_pages) + 1):
+                            next_future = executor.submit(self.fetch_page, category, next_page)
+                            pending[next_future] = (category, next_page)
+
+                    if self.article_fetcher:
+                        try:
+                            self.add_full_text(new_articles)
+                        except Exception as e:
+                            # The NewsAPI snippets are still worth indexing
+                            log.warning("Error fetching full text", extra={"category": category, "page": page, "error": str(e)})
+
+                    for article in new_articles:
+                        try:
+                            with timed("validate"):
+                                doc = self.format_article(article, category)
+                                if doc:
+                                    doc_id = self.document_id(doc['url'])
+                                    doc['cluster_id'] = self.near_duplicates.assign(
+                                        doc_id,
+                                        minhash(f"{doc['title']} {doc['content']}")
+                                    )
+                            if doc:
+                                ingested[doc_id] = (category, doc['url'], article.get('publishedAt'))
+                                yield doc
+                        except Exception as e:
+                            log.warning("Error processing article", extra={"url": article.get('url'), "error": str(e)})
+                            continue
+
+    def record_ingested(self, ingested: Dict[str, Tuple[str, str, Optional[str]]], result: Dict[str, object]):
+        """Persist the collection state after an indexing run"""
+        # Only successfully indexed articles count as seen, failures are retried next run
+        failed_ids = {failure.get('_id') for failure in result['failed']}
+
+        # The watermark must stay below each category's oldest failure, or is_new
+        # would reject the retry; a failure without a timestamp holds it in place
+        watermark_limits = {}
+        for doc_id in failed_ids & ingested.keys():
+            category, _, published_at = ingested[doc_id]
+            watermark_limits[category] = min(watermark_limits.get(category, published_at or ''), published_at or '')
+
+        for doc_id, (category, url, published_at) in ingested.items():
+            if doc_id not in failed_ids:
+                self.collection_state.mark_ingested(category, url, published_at, watermark_limits.get(category))
+        self.collection_state.save()
+        self.near_duplicates.save()
+
+    def bulk_load_partitions(self, categories: Iterable[str]) -> str:
+        """Partitions this run can write to, from the oldest category watermark to now.
+
+        Articles at or below a category's watermark are skipped as already seen.
+        A category without one has no lower bound, and its older articles go to
+        partitions with the normal settings.
+        """
+        now = datetime.now(timezone.utc)
+        watermarks = [self.collection_state.watermarks.get(category) for category in categories]
+        start = min((datetime.fromisoformat(w.replace("Z", "+00:00")) for w in watermarks if w), default=now)
+        return bulk_load_partitions(self.es, start, now)
+
+    def collect_from_newsapi(self, categories: Iterable[str] = CATEGORIES):
+        try:
+            ingested = {}
+            documents = self.iter_documents(categories, ingested)
+
+            # Documents stream into the bulk indexer while later pages are still in flight
+            if self.bulk_load_mode and self.es is not None:
+                with bulk_load(self.es, self.bulk_load_partitions(categories)):
+                    result = self.index_articles(documents)
+            else:
+                result = self.index_articles(documents)
+
+            self.record_ingested(ingested, result)
+
+            log.info("Indexed articles", extra={"indexed": result['indexed'], "failed": len(result['failed'])})
+            return result
+
         except Exception as e:
-            print(f"Error in NewsAPI collection: {str(e)}")
+            log.error("Error in NewsAPI collection", extra={"error": str(e)}, exc_info=True)
     
     def run(self):
         """Execute the agent's news collection task"""
-        print("Starting news collection...")
+        log.info("Starting news collection")
         self.collect_from_newsapi()
-        print("News collection completed")
+        log.info("News collection completed")
         return "News collection task completed successfully"
 
 if __name__ == "__main__":
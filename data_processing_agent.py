@@ -1,22 +1,116 @@
 from crewai import Agent
-from elasticsearch import Elasticsearch
-from transformers import pipeline, Pipeline
+from elasticsearch import Elasticsearch, NotFoundError
+from transformers import Pipeline
 from pydantic import Field, ConfigDict
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import time
 from dotenv import load_dotenv
+from embedding_classifier import DEFAULT_EMBEDDING_MODEL, EmbeddingClassifier, TextEmbedder
+from index_management import READ_ALIAS
+from inference_backends import SUMMARIZATION_MODEL, ZERO_SHOT_MODEL, load_pipeline
+from inference_server import RemoteClassifier, RemoteModel, RemoteSummarizer
+from rate_limiting import TokenBucket
+from rollups import recategorized_counts
+from storage import VERSION_FIELDS, ElasticsearchStorage, Storage, create_es_client, open_storage
+from tiered_summarization import ComputeBudget, SummarizationPolicy, extractive_summary
+from metrics import ARTICLES, SUMMARIES, get_logger, start_exporter, timed
 
 # Load environment variables
 load_dotenv()
 
+CATEGORIES = ["Politics", "Technology", "Business", "Sports", "Entertainment", "Health", "Science"]
+HYPOTHESIS_TEMPLATE = "This text is about {}."
+MIN_CONTENT_LENGTH = 100
+
+# Backlog drain settings
+CHECKPOINT_PATH = os.getenv("processing_checkpoint", "processing_checkpoint.json")
+PIT_KEEP_ALIVE = "5m"
+
+# Only the fields inference reads are fetched, and only enrichment fields are written back
+SOURCE_FIELDS = ["title", "content", "category", "cluster_id", "date", "source"]
+ENRICHMENT_FIELDS = ("summary", "category", "category_score")
+EMBEDDING_FIELD = "embedding"
+
+# Summary tiers, stamped on each document. Extractive summaries chosen by the policy
+# are current; fallbacks (budget overflow or a BART failure) stay stale for --reenrich
+ABSTRACTIVE = "abstractive"
+EXTRACTIVE = "extractive"
+FALLBACK = "extractive-fallback"
+
+log = get_logger("processor")
+
+UNPROCESSED_QUERY = {
+    "bool": {
+        "must_not": {
+            "exists": {
+                "field": "summary"
+            }
+        }
+    }
+}
+
+
+def connect_elasticsearch() -> Elasticsearch:
+    try:
+        es = create_es_client()
+
+        # Test connection
+        info = es.info()
+        log.info("Connected to Elasticsearch", extra={"version": info['version']['number']})
+        return es
+        
+    except Exception as e:
+        log.error("Error connecting to Elasticsearch", extra={"error": str(e)})
+        raise
+
+
+def pipeline_name(model) -> str:
+    """Name of the model behind a transformers pipeline, or the class of a stand-in without one"""
+    return getattr(getattr(model, "model", None), "name_or_path", None) or type(model).__name__
+
+
+def summarizer_name(summarizer) -> str:
+    """Name of the summarization model, as stamped on enrichments"""
+    if isinstance(summarizer, RemoteModel):
+        return summarizer.model_name
+    return pipeline_name(summarizer) if summarizer else "none"
+
+
+def classifier_name(classifier) -> str:
+    """Name of the classification model, as stamped on enrichments"""
+    if isinstance(classifier, EmbeddingClassifier):
+        return f"embedding:{classifier.embedder.model_name}"
+    if isinstance(classifier, RemoteModel):
+        return classifier.model_name
+    return pipeline_name(classifier) if classifier else "none"
+
 
 class DataProcessingAgent(Agent):
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    es: Elasticsearch = Field(default=None, exclude=True)
-    summarizer: Optional[Pipeline] = Field(default=None, exclude=True)
-    classifier: Optional[Pipeline] = Field(default=None, exclude=True)
+    storage: Storage = Field(default=None, exclude=True)
+    es: Optional[Elasticsearch] = Field(default=None, exclude=True)
+    summarizer: Optional[Union[Pipeline, RemoteSummarizer]] = Field(default=None, exclude=True)
+    classifier: Optional[Union[Pipeline, EmbeddingClassifier, RemoteClassifier]] = Field(default=None, exclude=True)
+    batch_size: int = Field(default=8, exclude=True)
+    block_size: int = Field(default=64, exclude=True)
+    checkpoint_path: str = Field(default=CHECKPOINT_PATH, exclude=True)
+    pit_keep_alive: str = Field(default=PIT_KEEP_ALIVE, exclude=True)
+    summary_policy: SummarizationPolicy = Field(default=None, exclude=True)
+    summary_budget: ComputeBudget = Field(default=None, exclude=True)
+    inference_backend: str = Field(default="pytorch", exclude=True)
+    embedder: Optional[TextEmbedder] = Field(default=None, exclude=True)
+    versions: Dict[str, Dict[str, str]] = Field(default=None, exclude=True)
+    current_versions: Dict[str, List[str]] = Field(default=None, exclude=True)
+    reenrich_rate: float = Field(default=1.0, exclude=True)
+    reenrich_poll_seconds: float = Field(default=5.0, exclude=True)
 
-    def __init__(self):
+    def __init__(self, storage: Optional[Storage] = None, summarizer=None, classifier=None):
         super().__init__(
             name="Data Processing Agent",
             role="Data Processor",
@@ -25,140 +119,601 @@ class DataProcessingAgent(Agent):
             goal="Process and enrich news articles with AI"
         )
         
-        try:
-            # Get credentials from environment variables
-            elastic_username = os.getenv("elastic_username")
-            elastic_password = os.getenv("elastic_password")
-            
-            if not elastic_username or not elastic_password:
-                raise ValueError("Elasticsearch credentials not found in environment variables")
-            
-            print(f"Attempting to connect with username: {elastic_username}")
-            
-            # Initialize Elasticsearch with Cloud ID
-            self.es = Elasticsearch(
-                cloud_id="news_aggregator:dXMtY2VudHJhbDEuZ2NwLmNsb3VkLmVzLmlvJGU1NzU1MDM3OWM4YTQzZTZiZTRjNzQ3NmIwYTlkNmY0JDU1ZWU4ZDQyNTdkYTRhMmY4ZDE4MGZlY2Q4NzRlZTdl",
-                basic_auth=(elastic_username, elastic_password),
-                timeout=30,
-                retry_on_timeout=True,
-                max_retries=3
-            )
-            
-            # Test connection
-            info = self.es.info()
-            print(f"Successfully connected to Elasticsearch version: {info['version']['number']}")
-            
-        except Exception as e:
-            print(f"Error connecting to Elasticsearch: {str(e)}")
-            raise
+        if storage is None:
+            storage_backend = os.getenv("storage_backend", "elasticsearch")
+            es = connect_elasticsearch() if storage_backend == "elasticsearch" else None
+            storage = open_storage(storage_backend, es=es)
+        self.storage = storage
+        # The backlog drain walks a point in time, which only Elasticsearch has
+        if isinstance(storage, ElasticsearchStorage):
+            self.es = storage.es
         
+        server_url = os.getenv("inference_server_url")
+        self.inference_backend = os.getenv("inference_backend", self.inference_backend)
         try:
-            print("Loading NLP models...")
+            if summarizer is not None and classifier is not None:
+                # Models supplied by the caller, e.g. stand-ins for benchmarks
+                self.summarizer = summarizer
+                self.classifier = classifier
+            elif server_url:
+                # Share the models loaded once by inference_server.py instead of loading our own copy
+                self.summarizer = RemoteSummarizer(server_url)
+                self.classifier = RemoteClassifier(server_url)
+                # Also fails early when the server is down
+                log.info("Using inference server", extra={
+                    "url": server_url,
+                    "summarizer": self.summarizer.model_name,
+                    "classifier": self.classifier.model_name,
+                    "backend": self.summarizer.backend
+                })
+            else:
+                log.info("Loading NLP models")
 
-            self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-            self.classifier = pipeline("zero-shot-classification")
-            print("NLP models loaded successfully")
+                self.summarizer = load_pipeline("summarization", SUMMARIZATION_MODEL, self.inference_backend)
+                self.classifier = self.load_classifier(os.getenv("classifier_engine", "nli"), self.inference_backend)
+                log.info("NLP models loaded")
         except Exception as e:
-            print(f"Error loading NLP models: {str(e)}")
+            log.error("Error loading NLP models", extra={"error": str(e)})
             self.summarizer = None
             self.classifier = None
-        
-    def process_articles(self):
-        # Get unprocessed articles
-        results = self.es.search(
-            index="news",
-            body={
-                "query": {
-                    "bool": {
-                        "must_not": {
-                            "exists": {
-                                "field": "summary"
-                            }
-                        }
-                    }
-                },
-                "size": 10
-            }
+
+        # Batched inference settings
+        self.batch_size = int(os.getenv("processing_batch_size", self.batch_size))
+        self.block_size = int(os.getenv("processing_block_size", self.block_size))
+
+        # Tiered summarization: which articles get BART, and how much BART time a run may spend
+        self.summary_policy = SummarizationPolicy(
+            min_abstractive_length=int(os.getenv("summary_min_abstractive_length", 0)),
+            max_age_hours=float(os.getenv("summary_max_age_hours")) if os.getenv("summary_max_age_hours") else None,
+            extractive_categories=[c for c in os.getenv("summary_extractive_categories", "").split(",") if c]
         )
-        
-        for hit in results['hits']['hits']:
+        self.reset_budget()
+
+        # Article embeddings for semantic search, sharing the classifier's encoder when it has one
+        if os.getenv("semantic_search", "false").lower() == "true":
             try:
-                article = hit['_source']
-                print(f"\nProcessing: {article['title']}")
-                
-                # Skip articles with insufficient content
-                if not article.get('content') or len(article['content'].strip()) < 100:
-                    print(f"Skipping article due to insufficient content (length: {len(article.get('content', ''))}")
-                    article['summary'] = article.get('content', '')
-                    article['category'] = article.get('category', 'Uncategorized')
-                    article['category_score'] = 0.0
+                if isinstance(self.classifier, EmbeddingClassifier):
+                    self.embedder = self.classifier.embedder
                 else:
-                    # Generate summary with dynamic max_length
-                    try:
-                        if self.summarizer:
-                            content_length = len(article['content'])
-                            # Set max_length to half the content length, but keep it between 30 and 130
-                            max_length = min(max(30, content_length // 2), 130)
-                            min_length = min(max_length // 2, 30)
-                            
-                            summary = self.summarizer(
-                                article['content'][:1024], 
-                                max_length=max_length,
-                                min_length=min_length,
-                                do_sample=False
-                            )[0]['summary_text']
-                            article['summary'] = summary
-                            print(f"Generated summary: {summary[:100]}...")
-                        else:
-                            article['summary'] = article['content'][:200] + "..."
-                    except Exception as e:
-                        print(f"Error generating summary: {str(e)}")
-                        article['summary'] = article['content'][:200] + "..."
-                    
-                    # Categorize the article
-                    try:
-                        if self.classifier and len(article['content'].strip()) > 100:
-                            categories = ["Politics", "Technology", "Business", "Sports", "Entertainment", "Health", "Science"]
-                            result = self.classifier(
-                                article['content'][:512], 
-                                candidate_labels=categories,
-                                hypothesis_template="This text is about {}.",
-                                multi_label=False
-                            )
-                            article['category'] = result['labels'][0]
-                            article['category_score'] = float(result['scores'][0])
-                            print(f"Categorized as: {article['category']} (confidence: {article['category_score']:.2f})")
-                        else:
-                            article['category'] = article.get('category', 'Uncategorized')
-                            article['category_score'] = 0.0
-                    except Exception as e:
-                        print(f"Error categorizing article: {str(e)}")
-                        article['category'] = article.get('category', 'Uncategorized')
-                        article['category_score'] = 0.0
-                
-                # Update in Elasticsearch
-                self.es.update(
-                    index='news',
-                    id=hit['_id'],
-                    body={'doc': article}
-                )
-                
-                print(f"Successfully processed: {article['title']}")
-                
+                    self.embedder = TextEmbedder(os.getenv("embedding_model", DEFAULT_EMBEDDING_MODEL))
+            except Exception as e:
+                log.error("Error loading embedding model, articles won't be embedded", extra={"error": str(e)})
+
+        # Every enrichment is stamped with the versions of its tier, so a model or label
+        # change marks older ones stale, and so do extractive fallbacks
+        self.versions = self.enrichment_versions()
+        self.current_versions = {
+            field: sorted({self.versions[ABSTRACTIVE][field], self.versions[EXTRACTIVE][field]})
+            for field in VERSION_FIELDS
+        }
+
+        # Re-enrichment of stale articles, in articles per second
+        self.reenrich_rate = float(os.getenv("reenrich_rate", self.reenrich_rate))
+
+        # /metrics endpoint or textfile export, when configured
+        start_exporter()
+
+    def reset_budget(self):
+        """Start a new per-run abstractive summarization budget"""
+        seconds = os.getenv("summary_budget_seconds")
+        articles = os.getenv("summary_budget_articles")
+        self.summary_budget = ComputeBudget(
+            seconds=float(seconds) if seconds else None,
+            articles=int(articles) if articles else None
+        )
+
+    def enrichment_versions(self) -> Dict[str, Dict[str, str]]:
+        """Model and label-set versions of this agent's enrichments, per summary tier.
+
+        Set model_version to force a new version when a model changes
+        without changing its name.
+        """
+        abstractive = summarizer_name(self.summarizer)
+        # Quantized and ONNX models can summarize and classify differently from PyTorch
+        if isinstance(self.summarizer, RemoteModel):
+            backend = self.summarizer.backend
+        else:
+            backend = self.inference_backend
+        models = [f"classifier={classifier_name(self.classifier)}", f"backend={backend}"]
+        if self.embedder:
+            models.append(f"embedder={self.embedder.model_name}")
+        if os.getenv("model_version"):
+            models.append(f"release={os.getenv('model_version')}")
+
+        labels = json.dumps([CATEGORIES, HYPOTHESIS_TEMPLATE])
+        label_version = hashlib.sha1(labels.encode("utf-8")).hexdigest()[:12]
+        summarizers = {ABSTRACTIVE: abstractive, EXTRACTIVE: EXTRACTIVE, FALLBACK: FALLBACK}
+        return {
+            tier: {
+                "model_version": ";".join([f"summarizer={summarizer}"] + models),
+                "label_version": label_version
+            }
+            for tier, summarizer in summarizers.items()
+        }
+
+    @staticmethod
+    def load_classifier(engine: str, backend: str = "pytorch"):
+        """Load the configured classification engine, falling back to zero-shot NLI"""
+        if engine == "embedding":
+            try:
+                classifier = EmbeddingClassifier(TextEmbedder(os.getenv("embedding_model", DEFAULT_EMBEDDING_MODEL)))
+                # Label embeddings are computed once here and reused for every article
+                classifier.prepare(CATEGORIES, HYPOTHESIS_TEMPLATE)
+                return classifier
+            except Exception as e:
+                log.error("Error loading embedding classifier, falling back to zero-shot NLI", extra={"error": str(e)})
+        elif engine != "nli":
+            log.warning("Unknown classifier engine, using zero-shot NLI", extra={"engine": engine})
+        return load_pipeline("zero-shot-classification", ZERO_SHOT_MODEL, backend)
+
+    def fetch_unprocessed(self, size: int) -> List[dict]:
+        """Get a block of articles that have not been summarized yet"""
+        with timed("fetch_unprocessed"):
+            return self.storage.find_unprocessed(size, SOURCE_FIELDS)
+
+    def fetch_stale(self, size: int, search_after: Optional[list] = None) -> Tuple[List[dict], Optional[list]]:
+        """Get a block of articles enriched with other model or label versions, newest first"""
+        with timed("fetch_stale"):
+            return self.storage.find_stale(self.current_versions, size, SOURCE_FIELDS, search_after)
+
+    def length_buckets(self, articles: List[dict]) -> List[List[dict]]:
+        """Sort articles by token length and split them into batches of similar length"""
+        texts = [article['content'][:1024] for article in articles]
+        tokenizer = getattr(self.summarizer, 'tokenizer', None)
+        try:
+            lengths = [len(ids) for ids in tokenizer(texts, truncation=True, max_length=1024)['input_ids']]
+        except Exception:
+            # No tokenizer available, character length is a good enough proxy
+            lengths = [len(text) for text in texts]
+
+        ordered = [article for _, article in sorted(zip(lengths, articles), key=lambda pair: pair[0])]
+        return [ordered[i:i + self.batch_size] for i in range(0, len(ordered), self.batch_size)]
+
+    def summarize_batch(self, articles: List[dict]) -> List[Optional[str]]:
+        """Summarize a batch of similar-length articles, with None for articles that failed"""
+        if not self.summarizer:
+            return [None] * len(articles)
+
+        # Set max_length to half the shortest content length, but keep it between 30 and 130
+        content_length = min(len(article['content']) for article in articles)
+        max_length = min(max(30, content_length // 2), 130)
+        min_length = min(max_length // 2, 30)
+        texts = [article['content'][:1024] for article in articles]
+
+        try:
+            outputs = self.summarizer(
+                texts,
+                max_length=max_length,
+                min_length=min_length,
+                do_sample=False,
+                truncation=True,
+                batch_size=self.batch_size
+            )
+            return [output['summary_text'] for output in outputs]
+        except Exception as e:
+            log.warning("Batch summarization failed, retrying articles one by one", extra={"error": str(e)})
+
+        summaries = []
+        for article, text in zip(articles, texts):
+            try:
+                summaries.append(self.summarizer(
+                    text,
+                    max_length=max_length,
+                    min_length=min_length,
+                    do_sample=False,
+                    truncation=True
+                )[0]['summary_text'])
+            except Exception as e:
+                log.warning("Error generating summary", extra={"title": article.get('title'), "error": str(e)})
+                summaries.append(None)
+        return summaries
+
+    def summarize_tiered(self, articles: List[dict]) -> Tuple[List[str], List[str]]:
+        """Route a batch between BART and the extractive tier by policy and remaining budget,
+        returning each article's summary and the tier that produced it"""
+        chosen = [i for i, article in enumerate(articles) if self.summary_policy.use_abstractive(article)]
+        # Whatever doesn't fit in the run's budget drops to the cheap tier instead of waiting
+        abstractive = chosen[:self.summary_budget.take(len(chosen))]
+
+        summaries = [None] * len(articles)
+        tiers = [EXTRACTIVE] * len(articles)
+        for i in chosen:
+            tiers[i] = FALLBACK
+        with timed("summarize", articles=len(articles)):
+            if abstractive:
+                start = time.perf_counter()
+                for i, summary in zip(abstractive, self.summarize_batch([articles[i] for i in abstractive])):
+                    if summary is not None:
+                        summaries[i] = summary
+                        tiers[i] = ABSTRACTIVE
+                self.summary_budget.charge(time.perf_counter() - start, len(abstractive))
+
+            for i, article in enumerate(articles):
+                if summaries[i] is None:
+                    summaries[i] = extractive_summary(article['content'])
+        for tier in (ABSTRACTIVE, EXTRACTIVE, FALLBACK):
+            SUMMARIES.inc(tiers.count(tier), tier=tier)
+        return summaries, tiers
+
+    def classify_batch(self, articles: List[dict]) -> List[Tuple[str, float]]:
+        """Categorize a batch of articles, falling back per article on errors"""
+        fallback = [(article.get('category', 'Uncategorized'), 0.0) for article in articles]
+        if not self.classifier:
+            return fallback
+
+        texts = [article['content'][:512] for article in articles]
+        kwargs = {
+            "candidate_labels": CATEGORIES,
+            "hypothesis_template": HYPOTHESIS_TEMPLATE,
+            "multi_label": False
+        }
+
+        with timed("classify", articles=len(articles)):
+            try:
+                results = self.classifier(texts, batch_size=self.batch_size, **kwargs)
+                if isinstance(results, dict):
+                    results = [results]
+                return [(result['labels'][0], float(result['scores'][0])) for result in results]
             except Exception as e:
-                print(f"Error processing article {hit['_id']}: {str(e)}")
+                log.warning("Batch classification failed, retrying articles one by one", extra={"error": str(e)})
+
+            categories = []
+            for article, text, default in zip(articles, texts, fallback):
+                try:
+                    result = self.classifier(text, **kwargs)
+                    categories.append((result['labels'][0], float(result['scores'][0])))
+                except Exception as e:
+                    log.warning("Error categorizing article", extra={"title": article.get('title'), "error": str(e)})
+                    categories.append(default)
+            return categories
+
+    def enrich_articles(self, hits: List[dict]) -> Dict[str, dict]:
+        """Compute summary and category for a block of hits, keyed by document ID"""
+        enrichments = {}
+        articles = []
+
+        for hit in hits:
+            article = hit['_source']
+            # Skip articles with insufficient content
+            if not article.get('content') or len(article['content'].strip()) < MIN_CONTENT_LENGTH:
+                log.debug("Skipping article with insufficient content", extra={"length": len(article.get('content') or '')})
+                ARTICLES.inc(outcome="too_short")
+                enrichments[hit['_id']] = {
+                    'summary': article.get('content') or '',
+                    'category': article.get('category', 'Uncategorized'),
+                    'category_score': 0.0,
+                    **self.versions[EXTRACTIVE]
+                }
+            else:
+                articles.append(dict(article, _id=hit['_id']))
+
+        if not articles:
+            return enrichments
+
+        # Near-duplicates reuse the enrichment of their cluster representative,
+        # and only one member of each cluster in this block goes through the models
+        representatives = self.fetch_representatives({
+            article['cluster_id'] for article in articles
+            if article.get('cluster_id') not in (None, article['_id'])
+        })
+        to_infer = {}
+        copies = []
+        for article in articles:
+            cluster_id = article.get('cluster_id') or article['_id']
+            if cluster_id in representatives:
+                enrichments[article['_id']] = dict(representatives[cluster_id])
+            elif cluster_id in to_infer:
+                copies.append((article['_id'], cluster_id))
+            else:
+                to_infer[cluster_id] = article
+
+        cluster_enrichments = {}
+        for bucket in self.length_buckets(list(to_infer.values())):
+            summaries, tiers = self.summarize_tiered(bucket)
+            categories = self.classify_batch(bucket)
+            for article, summary, tier, (category, score) in zip(bucket, summaries, tiers, categories):
+                enrichment = {
+                    'summary': summary,
+                    'category': category,
+                    'category_score': score,
+                    **self.versions[tier]
+                }
+                enrichments[article['_id']] = enrichment
+                cluster_enrichments[article.get('cluster_id') or article['_id']] = enrichment
+
+        for doc_id, cluster_id in copies:
+            enrichments[doc_id] = dict(cluster_enrichments[cluster_id])
+
+        self.embed_articles(hits, enrichments)
+        return enrichments
+
+    def embed_articles(self, hits: List[dict], enrichments: Dict[str, dict]):
+        """Add a title-and-content embedding to each enrichment, encoded in batches"""
+        if not self.embedder:
+            return
+
+        hits = [hit for hit in hits if hit['_id'] in enrichments]
+        texts = [f"{hit['_source'].get('title') or ''}. {hit['_source'].get('content') or ''}" for hit in hits]
+        try:
+            with timed("embed", articles=len(texts)):
+                embeddings = self.embedder.encode(texts, batch_size=self.batch_size)
+        except Exception as e:
+            log.error("Error embedding articles", extra={"error": str(e)})
+            return
+
+        for hit, embedding in zip(hits, embeddings):
+            enrichments[hit['_id']][EMBEDDING_FIELD] = embedding.tolist()
+
+    def fetch_representatives(self, cluster_ids: set) -> Dict[str, dict]:
+        """Enrichments already stored for the given cluster representatives"""
+        if not cluster_ids:
+            return {}
+
+        try:
+            stored = self.storage.get_many(cluster_ids, ENRICHMENT_FIELDS + VERSION_FIELDS)
+        except Exception as e:
+            log.warning("Error fetching cluster representatives", extra={"error": str(e)})
+            return {}
+
+        return {
+            doc_id: {field: source.get(field) for field in ENRICHMENT_FIELDS + VERSION_FIELDS}
+            for doc_id, source in stored.items()
+            # Stale representatives are re-enriched themselves rather than copied
+            if source.get('summary') is not None
+            and all(source.get(field) in values for field, values in self.current_versions.items())
+        }
+
+    def write_enrichments(self, hits: List[dict], enrichments: Dict[str, dict]) -> int:
+        """Bulk partial-update the enrichment fields of processed hits, with the versions that produced them"""
+        with timed("update", articles=len(hits)):
+            updated = self.storage.update(hits, {
+                doc_id: {
+                    field: enrichment[field]
+                    for field in ENRICHMENT_FIELDS + (EMBEDDING_FIELD,) + VERSION_FIELDS
+                    if field in enrichment
+                }
+                for doc_id, enrichment in enrichments.items()
+            })
+        ARTICLES.inc(len(updated), outcome="enriched")
+
+        # Move reclassified articles between categories in the daily volume rollup
+        written = set(updated)
+        try:
+            self.storage.add_daily_counts(recategorized_counts(
+                (hit['_source'], enrichments[hit['_id']]['category'])
+                for hit in hits if hit['_id'] in written
+            ))
+        except Exception as e:
+            log.warning("Error updating daily counts", extra={"error": str(e)})
+        return len(updated)
+
+    def process_articles(self, reset: bool = True):
+        """Enrich one block of unprocessed articles; reset=False keeps spending the current budget"""
+        if reset:
+            self.reset_budget()
+        # Get unprocessed articles
+        hits = self.fetch_unprocessed(self.block_size)
+        if not hits:
+            return 0
+        enrichments = self.enrich_articles(hits)
+        updated = self.write_enrichments(hits, enrichments)
+        log.info("Processed articles", extra={"updated": updated, "fetched": len(hits)})
+        return updated
+
+    def checkpoint_file(self, slice_id: Optional[int] = None) -> str:
+        if slice_id is None:
+            return self.checkpoint_path
+        root, ext = os.path.splitext(self.checkpoint_path)
+        return f"{root}.{slice_id}{ext}"
+
+    @staticmethod
+    def load_checkpoint(path: str) -> dict:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def save_checkpoint(path: str, checkpoint: dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+    def open_backlog(self) -> str:
+        return self.es.open_point_in_time(index=READ_ALIAS, keep_alive=self.pit_keep_alive)['id']
+
+    def drain_slice(self, pit_id: str, slice_id: Optional[int] = None, max_slices: int = 1) -> Tuple[int, str]:
+        """Process one slice of the unprocessed backlog in a point in time, returning
+        the number processed and the latest point in time ID to close it with.
+
+        Raises NotFoundError if the point in time expires.
+        """
+        path = self.checkpoint_file(slice_id)
+        checkpoint = self.load_checkpoint(path)
+        search_after = None
+        processed = 0
+        if checkpoint.get('pit_id') == pit_id:
+            search_after = checkpoint.get('search_after')
+            processed = checkpoint.get('processed', 0)
+            log.info("Resuming backlog drain", extra={"processed": processed, "slice": slice_id})
+
+        while True:
+            body = {
+                "query": UNPROCESSED_QUERY,
+                "_source": SOURCE_FIELDS,
+                "size": self.block_size,
+                "pit": {"id": pit_id, "keep_alive": self.pit_keep_alive},
+                "sort": [{"_shard_doc": "asc"}],
+                "seq_no_primary_term": True
+            }
+            if max_slices > 1:
+                body["slice"] = {"id": slice_id, "max": max_slices}
+            if search_after:
+                body["search_after"] = search_after
+
+            results = self.es.search(body=body)
+            pit_id = results.get('pit_id', pit_id)
+            hits = results['hits']['hits']
+            if not hits:
+                break
+
+            enrichments = self.enrich_articles(hits)
+            processed += self.write_enrichments(hits, enrichments)
+            search_after = hits[-1]['sort']
+            self.save_checkpoint(path, {'pit_id': pit_id, 'search_after': search_after, 'processed': processed})
+            log.info("Backlog progress", extra={"processed": processed, "slice": slice_id})
+
+        if os.path.exists(path):
+            os.remove(path)
+        return processed, pit_id
+
+    def drain_backlog(self) -> int:
+        """Process the whole unprocessed backlog, resuming from the last checkpoint"""
+        self.reset_budget()
+        processed = 0
+        if self.es is None:
+            # Without a point in time, take blocks until nothing unprocessed is left
+            # or a block can't be written, so failures don't loop forever
+            while True:
+                hits = self.fetch_unprocessed(self.block_size)
+                updated = self.write_enrichments(hits, self.enrich_articles(hits)) if hits else 0
+                processed += updated
+                if not updated:
+                    return processed
+                log.info("Backlog progress", extra={"processed": processed})
+
+        pit_id = self.load_checkpoint(self.checkpoint_path).get('pit_id') or self.open_backlog()
+
+        while True:
+            try:
+                # Searches can return a new ID for the point in time, and only the latest one is closed
+                drained, pit_id = self.drain_slice(pit_id)
+                processed += drained
+                break
+            except NotFoundError:
+                # The point in time expired while we were stopped; articles processed
+                # before the interruption already have a summary, so a fresh walk
+                # over the remaining backlog picks up where we left off
+                log.warning("Point in time expired, opening a new one")
+                pit_id = self.open_backlog()
+
+        self.es.close_point_in_time(id=pit_id)
+        return processed
+
+    def reenrich(self) -> int:
+        """Re-enrich articles stamped with other model or label versions, newest first.
+
+        Runs at most reenrich_rate articles per second. New articles always go
+        first: a block of them is processed before every stale block and while
+        waiting on the rate limit, so re-enrichment can run alongside collection.
+        """
+        bucket = TokenBucket(rate=self.reenrich_rate, capacity=max(self.block_size, self.reenrich_rate))
+        search_after = None
+        reenriched = 0
+        # One budget covers the whole run, new and stale articles alike
+        self.reset_budget()
+        while True:
+            if self.process_articles(reset=False) >= self.block_size:
+                # More new articles are probably waiting
+                continue
+
+            wait = bucket.try_acquire(self.block_size)
+            if wait > 0:
+                time.sleep(min(wait, self.reenrich_poll_seconds))
                 continue
+
+            # The cursor only moves forward, so articles that fail to update are
+            # left for the next run instead of being retried in a loop
+            hits, search_after = self.fetch_stale(self.block_size, search_after)
+            if hits:
+                reenriched += self.write_enrichments(hits, self.enrich_articles(hits))
+                log.info("Re-enrichment progress", extra={"reenriched": reenriched, "versions": self.current_versions})
+            if search_after is None:
+                return reenriched
     
-    def run(self):
+    def run(self, drain: bool = False, reenrich: bool = False):
         """Execute the agent's processing task"""
         if not self.summarizer or not self.classifier:
-            print("Warning: NLP models not loaded. Will use basic text processing.")
+            log.warning("NLP models not loaded, using basic text processing")
         
-        print("\nStarting article processing...")
-        self.process_articles()
-        print("\nArticle processing completed")
+        log.info("Starting article processing")
+        if drain:
+            self.drain_backlog()
+        elif reenrich:
+            self.reenrich()
+        else:
+            self.process_articles()
+        log.info("Article processing completed")
         return "Processing task completed successfully"
 
-if __name__ == "__main__":
+def _drain_worker(pit_id: str, slice_id: int, max_slices: int) -> Optional[Tuple[int, str]]:
     agent = DataProcessingAgent()
-    agent.run()
+    try:
+        return agent.drain_slice(pit_id, slice_id, max_slices)
+    except NotFoundError:
+        return None
+
+
+def run_workers(num_workers: int) -> int:
+    """Drain the backlog with a pool of processes, each owning one slice of a shared point in time"""
+    if os.getenv("storage_backend", "elasticsearch") != "elasticsearch":
+        log.warning("Parallel workers need Elasticsearch, draining the backlog in this process")
+        return DataProcessingAgent().drain_backlog()
+
+    es = connect_elasticsearch()
+
+    # Reuse the checkpointed point in time so each worker can resume its own slice
+    checkpoint = DataProcessingAgent.load_checkpoint(CHECKPOINT_PATH)
+    pit_id = checkpoint.get('pit_id') if checkpoint.get('workers') == num_workers else None
+    processed = 0
+
+    # Spawn rather than fork so every worker initializes torch cleanly
+    context = multiprocessing.get_context("spawn")
+    while True:
+        if not pit_id:
+            pit_id = es.open_point_in_time(index=READ_ALIAS, keep_alive=PIT_KEEP_ALIVE)['id']
+            DataProcessingAgent.save_checkpoint(CHECKPOINT_PATH, {'pit_id': pit_id, 'workers': num_workers})
+
+        log.info("Starting processing workers", extra={"workers": num_workers})
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as executor:
+            results = list(executor.map(
+                _drain_worker,
+                [pit_id] * num_workers,
+                range(num_workers),
+                [num_workers] * num_workers
+            ))
+        processed += sum(result[0] for result in results if result is not None)
+
+        if all(result is not None for result in results):
+            break
+        log.warning("Point in time expired, restarting workers on a new one")
+        pit_id = None
+
+    # Each slice may end with its own latest ID for the shared point in time
+    for latest_id in sorted({result[1] for result in results}):
+        try:
+            es.close_point_in_time(id=latest_id)
+        except NotFoundError:
+            pass
+    os.remove(CHECKPOINT_PATH)
+    log.info("Workers finished", extra={"processed": processed})
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize and categorize collected news articles")
+    parser.add_argument("--drain", action="store_true", help="process the whole unprocessed backlog")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="drain the backlog with this many processes (0 uses a single process)")
+    parser.add_argument("--reenrich", action="store_true",
+                        help="re-enrich articles from older model or label versions, newest first, "
+                             "while still processing new articles")
+    args = parser.parse_args()
+
+    if args.workers:
+        run_workers(args.workers)
+    else:
+        agent = DataProcessingAgent()
+        agent.run(drain=args.drain, reenrich=args.reenrich)
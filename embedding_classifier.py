@@ -0,0 +1,93 @@
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+from typing import Dict, List, Sequence, Tuple, Union
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class TextEmbedder:
+    """Mean-pooled, L2-normalized sentence embeddings from a transformers encoder"""
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, max_length: int = 256):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+    @property
+    def dimensions(self) -> int:
+        return self.model.config.hidden_size
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        batches = []
+        for i in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                list(texts[i:i + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt"
+            )
+            with torch.no_grad():
+                hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            batches.append(pooled.numpy())
+
+        if not batches:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        embeddings = np.concatenate(batches).astype(np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-9)
+
+
+class EmbeddingClassifier:
+    """Category classifier scoring article embeddings against cached label embeddings.
+
+    Called like the zero-shot-classification pipeline and returns the same
+    ``{'sequence', 'labels', 'scores'}`` results, but needs one encoder pass
+    per article instead of one NLI pass per candidate label. Scores are always
+    a softmax across the labels, so ``multi_label`` is accepted but ignored.
+    """
+
+    def __init__(self, embedder: TextEmbedder, temperature: float = 0.05):
+        self.embedder = embedder
+        self.temperature = temperature
+        self.label_embeddings: Dict[Tuple[Tuple[str, ...], str], np.ndarray] = {}
+
+    def prepare(self, candidate_labels: Sequence[str], hypothesis_template: str = "This text is about {}.") -> np.ndarray:
+        """Encode and cache the label hypotheses"""
+        key = (tuple(candidate_labels), hypothesis_template)
+        if key not in self.label_embeddings:
+            hypotheses = [hypothesis_template.format(label) for label in candidate_labels]
+            self.label_embeddings[key] = self.embedder.encode(hypotheses)
+        return self.label_embeddings[key]
+
+    def __call__(
+        self,
+        sequences: Union[str, List[str]],
+        candidate_labels: Sequence[str],
+        hypothesis_template: str = "This text is about {}.",
+        multi_label: bool = False,
+        batch_size: int = 32
+    ):
+        single = isinstance(sequences, str)
+        texts = [sequences] if single else list(sequences)
+        labels = np.array(candidate_labels)
+
+        # One matrix multiply scores the whole batch against every label
+        similarities = self.embedder.encode(texts, batch_size) @ self.prepare(candidate_labels, hypothesis_template).T
+        logits = similarities / self.temperature
+        scores = np.exp(logits - logits.max(axis=1, keepdims=True))
+        scores /= scores.sum(axis=1, keepdims=True)
+
+        results = []
+        for text, row in zip(texts, scores):
+            order = np.argsort(-row)
+            results.append({
+                "sequence": text,
+                "labels": labels[order].tolist(),
+                "scores": row[order].tolist()
+            })
+        return results[0] if single else results
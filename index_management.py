@@ -0,0 +1,261 @@
+import argparse
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import Iterable, List, Union
+
+from elasticsearch import Elasticsearch, NotFoundError
+
+# Articles live in monthly partitions (news-YYYY.MM). Every partition joins
+# the read alias, and the write alias points at the current month.
+READ_ALIAS = "news"
+WRITE_ALIAS = "news-write"
+INDEX_PREFIX = "news-"
+TEMPLATE_NAME = "news"
+LEGACY_STAGING_INDEX = "news_legacy"
+# Daily article counts per (category, source). Deliberately outside the news-*
+# pattern so the template, read alias and roll-off never touch it
+ROLLUP_INDEX = "rollup-news-daily"
+# Output size of the embedding model (all-MiniLM-L6-v2)
+EMBEDDING_DIMS = 384
+
+MAPPINGS = {
+    "properties": {
+        "title": {"type": "text"},
+        "content": {"type": "text"},
+        "summary": {"type": "text"},
+        "description": {"type": "text"},
+        "url": {"type": "keyword"},
+        "source": {"type": "keyword"},
+        "date": {"type": "date"},
+        "category": {"type": "keyword"},
+        "category_score": {"type": "float"},
+        "author": {"type": "keyword"},
+        "cluster_id": {"type": "keyword"},
+        "model_version": {"type": "keyword"},
+        "label_version": {"type": "keyword"},
+        "embedding": {
+            "type": "dense_vector",
+            "dims": EMBEDDING_DIMS,
+            "index": True,
+            "similarity": "cosine"
+        }
+    }
+}
+
+ROLLUP_MAPPINGS = {
+    "properties": {
+        "day": {"type": "date", "format": "yyyy-MM-dd"},
+        "category": {"type": "keyword"},
+        "source": {"type": "keyword"},
+        "count": {"type": "long"}
+    }
+}
+
+SETTINGS = {
+    "number_of_shards": 1,
+    "number_of_replicas": 1,
+    "refresh_interval": "1s"
+}
+
+# Applied for the duration of large ingests, then reverted to SETTINGS
+BULK_LOAD_SETTINGS = {
+    "number_of_replicas": 0,
+    "refresh_interval": "-1"
+}
+
+
+def index_name(value: Union[str, date, datetime]) -> str:
+    """Monthly partition for an article date (ISO string, date or datetime)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return f"{INDEX_PREFIX}{value.year:04d}.{value.month:02d}"
+
+
+def indices_for_range(start: Union[date, datetime], end: Union[date, datetime]) -> List[str]:
+    """Partitions that can hold articles dated between start and end, inclusive"""
+    names = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        names.append(f"{INDEX_PREFIX}{year:04d}.{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return names
+
+
+def has_legacy_index(es: Elasticsearch) -> bool:
+    """True if 'news' is still a concrete index rather than the read alias"""
+    return es.indices.exists(index=READ_ALIAS) and not es.indices.exists_alias(name=READ_ALIAS)
+
+
+def ensure_template(es: Elasticsearch):
+    es.indices.put_index_template(
+        name=TEMPLATE_NAME,
+        index_patterns=[f"{INDEX_PREFIX}*"],
+        priority=100,
+        template={
+            "settings": SETTINGS,
+            "mappings": MAPPINGS,
+            "aliases": {READ_ALIAS: {}}
+        }
+    )
+
+
+def ensure_rollup_index(es: Elasticsearch):
+    if not es.indices.exists(index=ROLLUP_INDEX):
+        es.indices.create(
+            index=ROLLUP_INDEX,
+            settings={"number_of_shards": 1, "number_of_replicas": SETTINGS["number_of_replicas"]},
+            mappings=ROLLUP_MAPPINGS
+        )
+
+
+def ensure_index_setup(es: Elasticsearch, now: datetime = None) -> str:
+    """Install the template, create the current partition and point the write alias at it"""
+    if has_legacy_index(es):
+        raise RuntimeError(
+            f"Found a legacy '{READ_ALIAS}' index; run 'python index_management.py migrate' "
+            "to move it into monthly partitions"
+        )
+
+    ensure_template(es)
+    current = index_name(now or datetime.now(timezone.utc))
+    if not es.indices.exists(index=current):
+        es.indices.create(index=current)
+    # Partitions created before a field was added to the template pick it up here
+    es.indices.put_mapping(index=f"{INDEX_PREFIX}*", properties=MAPPINGS["properties"])
+    ensure_rollup_index(es)
+
+    try:
+        previous = list(es.indices.get_alias(name=WRITE_ALIAS))
+    except NotFoundError:
+        previous = []
+    if previous != [current]:
+        actions = [{"remove": {"index": name, "alias": WRITE_ALIAS}} for name in previous]
+        actions.append({"add": {"index": current, "alias": WRITE_ALIAS, "is_write_index": True}})
+        es.indices.update_aliases(actions=actions)
+    return current
+
+
+def migrate_legacy_index(es: Elasticsearch):
+    """Move documents from a concrete 'news' index into monthly partitions behind the aliases"""
+    if not has_legacy_index(es):
+        print(f"No legacy '{READ_ALIAS}' index found, nothing to migrate")
+        return
+
+    # The alias name is taken by the legacy index, so stage it elsewhere first
+    print(f"Copying '{READ_ALIAS}' to '{LEGACY_STAGING_INDEX}'...")
+    es.reindex(source={"index": READ_ALIAS}, dest={"index": LEGACY_STAGING_INDEX},
+               wait_for_completion=True, refresh=True)
+    es.indices.delete(index=READ_ALIAS)
+
+    ensure_index_setup(es)
+    print("Reindexing into monthly partitions...")
+    es.reindex(
+        source={"index": LEGACY_STAGING_INDEX},
+        dest={"index": WRITE_ALIAS},
+        script={
+            "lang": "painless",
+            "source": (
+                "String d = ctx._source.date;"
+                "if (d != null && d.length() >= 7) {"
+                f" ctx._index = '{INDEX_PREFIX}' + d.substring(0, 4) + '.' + d.substring(5, 7);"
+                "}"
+            )
+        },
+        wait_for_completion=True,
+        refresh=True
+    )
+    es.indices.delete(index=LEGACY_STAGING_INDEX)
+    print("Migration completed")
+
+
+def partitions(es: Elasticsearch) -> List[str]:
+    try:
+        return sorted(es.indices.get(index=f"{INDEX_PREFIX}*", expand_wildcards="open"))
+    except NotFoundError:
+        return []
+
+
+def ensure_partitions(es: Elasticsearch, names: Iterable[str]) -> List[str]:
+    """Create the named partitions that don't exist yet; settings can only be put on existing ones"""
+    names = sorted(set(names))
+    for name in names:
+        if name != WRITE_ALIAS and not es.indices.exists(index=name):
+            es.indices.create(index=name)
+    return names
+
+
+def bulk_load_partitions(es: Elasticsearch, start: Union[date, datetime], end: Union[date, datetime]) -> str:
+    """The partitions a load of articles dated between start and end writes to, for set_bulk_load"""
+    return ",".join(ensure_partitions(es, indices_for_range(start, end)))
+
+
+def set_bulk_load(es: Elasticsearch, enabled: bool, index: str = WRITE_ALIAS):
+    """Switch partitions between bulk-load and normal refresh/replica settings.
+
+    Defaults to the current partition only: dropping replicas on the whole
+    archive would force a full replica recovery every time they come back.
+    Backfills pass the partitions they write to, from bulk_load_partitions.
+    """
+    if enabled:
+        es.indices.put_settings(index=index, settings=BULK_LOAD_SETTINGS)
+    else:
+        es.indices.put_settings(index=index, settings={
+            "number_of_replicas": SETTINGS["number_of_replicas"],
+            "refresh_interval": SETTINGS["refresh_interval"]
+        })
+        es.indices.refresh(index=index)
+
+
+@contextmanager
+def bulk_load(es: Elasticsearch, index: str = WRITE_ALIAS):
+    set_bulk_load(es, True, index)
+    try:
+        yield
+    finally:
+        set_bulk_load(es, False, index)
+
+
+def roll_off(es: Elasticsearch, keep_months: int, now: datetime = None) -> List[str]:
+    """Delete partitions older than the last keep_months months"""
+    now = now or datetime.now(timezone.utc)
+    month_index = now.year * 12 + now.month - 1 - (keep_months - 1)
+    oldest_kept = f"{INDEX_PREFIX}{month_index // 12:04d}.{month_index % 12 + 1:02d}"
+    expired = [name for name in partitions(es) if name < oldest_kept]
+    if expired:
+        es.indices.delete(index=",".join(expired))
+    return expired
+
+
+if __name__ == "__main__":
+    from storage import create_es_client
+
+    parser = argparse.ArgumentParser(description="Manage the news index template, partitions and aliases")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("setup", help="install the template and roll the write alias to the current month")
+    subparsers.add_parser("migrate", help="move a legacy 'news' index into monthly partitions")
+    bulk_parser = subparsers.add_parser("bulk-load", help="toggle bulk-load settings on partitions")
+    bulk_parser.add_argument("state", choices=["on", "off"])
+    bulk_parser.add_argument("--index", default=WRITE_ALIAS,
+                             help=f"partitions to switch, e.g. {INDEX_PREFIX}2024.01 (default: the current one)")
+    bulk_parser.add_argument("--from", dest="start", type=date.fromisoformat,
+                             help="switch the partitions of articles dated from this day (YYYY-MM-DD) instead")
+    bulk_parser.add_argument("--to", dest="end", type=date.fromisoformat,
+                             help="last day of the --from range (default: today)")
+    roll_parser = subparsers.add_parser("roll-off", help="delete old partitions")
+    roll_parser.add_argument("--keep-months", type=int, required=True)
+    args = parser.parse_args()
+
+    es = create_es_client()
+    if args.command == "setup":
+        print(f"Write alias points at {ensure_index_setup(es)}")
+    elif args.command == "migrate":
+        migrate_legacy_index(es)
+    elif args.command == "bulk-load":
+        index = args.index
+        if args.start:
+            index = bulk_load_partitions(es, args.start, args.end or datetime.now(timezone.utc).date())
+        set_bulk_load(es, args.state == "on", index)
+        print(f"Bulk-load settings turned {args.state} on {index}")
+    elif args.command == "roll-off":
+        expired = roll_off(es, args.keep_months)
+        print(f"Deleted {len(expired)} partitions: {', '.join(expired) or 'none'}")
@@ -0,0 +1,83 @@
+import os
+import torch
+from transformers import (
+    AutoModelForSeq2SeqLM,
+    AutoModelForSequenceClassification,
+    AutoTokenizer,
+    pipeline,
+)
+
+from metrics import get_logger
+
+BACKENDS = ("pytorch", "quantized", "onnx")
+
+SUMMARIZATION_MODEL = "facebook/bart-large-cnn"
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+
+log = get_logger("inference")
+
+MODEL_CLASSES = {
+    "summarization": AutoModelForSeq2SeqLM,
+    "zero-shot-classification": AutoModelForSequenceClassification,
+}
+
+
+def artifact_dir(cache_dir: str, backend: str, model_name: str) -> str:
+    return os.path.join(cache_dir, backend, model_name.replace("/", "--"))
+
+
+def load_pipeline(task: str, model_name: str, backend: str = "pytorch", cache_dir: str = None):
+    """Load a transformers pipeline for a task on the given inference backend.
+
+    Converted models are cached under ``cache_dir`` so the export or
+    quantization cost is only paid on the first run.
+    """
+    cache_dir = cache_dir or os.getenv("model_cache_dir", "model_cache")
+    if backend == "pytorch":
+        return pipeline(task, model=model_name)
+    if backend == "quantized":
+        return _quantized_pipeline(task, model_name, cache_dir)
+    if backend == "onnx":
+        return _onnx_pipeline(task, model_name, cache_dir)
+    raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+
+def _quantized_pipeline(task: str, model_name: str, cache_dir: str):
+    """Dynamic int8 quantization of the Linear layers, cached as a pickled module"""
+    path = os.path.join(artifact_dir(cache_dir, "quantized", model_name), "model.pt")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if os.path.exists(path):
+        model = torch.load(path, weights_only=False)
+    else:
+        log.info("Quantizing model, this only happens once", extra={"model": model_name})
+        model = MODEL_CLASSES[task].from_pretrained(model_name)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(model, path)
+
+    model.eval()
+    return pipeline(task, model=model, tokenizer=tokenizer)
+
+
+def _onnx_pipeline(task: str, model_name: str, cache_dir: str):
+    """ONNX Runtime model exported through optimum, cached with save_pretrained"""
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+    except ImportError:
+        raise ImportError("The onnx backend requires optimum[onnxruntime], install it with: pip install optimum[onnxruntime]")
+
+    model_class = ORTModelForSeq2SeqLM if task == "summarization" else ORTModelForSequenceClassification
+    path = artifact_dir(cache_dir, "onnx", model_name)
+
+    if os.path.exists(path):
+        model = model_class.from_pretrained(path)
+        tokenizer = AutoTokenizer.from_pretrained(path)
+    else:
+        log.info("Exporting model to ONNX, this only happens once", extra={"model": model_name})
+        model = model_class.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+
+    return pipeline(task, model=model, tokenizer=tokenizer)
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Union
+
+import requests
+
+from metrics import get_logger
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+log = get_logger("inference_server")
+
+
+class DynamicBatcher:
+    """Coalesces concurrent requests for one model into batches.
+
+    A batch is dispatched once it holds ``max_batch_size`` texts or the
+    oldest request has waited ``max_wait_ms``. Requests with different
+    generation arguments are run as separate groups within a batch.
+    """
+
+    def __init__(self, run: Callable, max_batch_size: int = 16, max_wait_ms: float = 20):
+        self.run = run
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, texts: List[str], **kwargs) -> Future:
+        future = Future()
+        self.requests.put((texts, kwargs, future))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    request = self.requests.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            groups = {}
+            for request in batch:
+                key = json.dumps(request[1], sort_keys=True)
+                groups.setdefault(key, []).append(request)
+            for requests_in_group in groups.values():
+                try:
+                    self._run_group(requests_in_group)
+                except Exception as e:
+                    # Fail this group's requests instead of the batcher thread, which
+                    # would leave every waiting and future request hanging
+                    for _, _, future in requests_in_group:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def _run_group(self, group):
+        kwargs = group[0][1]
+        texts = [text for request in group for text in request[0]]
+        try:
+            results = self.run(texts, batch_size=self.max_batch_size, **kwargs)
+            if isinstance(results, dict):
+                results = [results]
+        except Exception:
+            # Isolate the failure so one bad text doesn't fail everyone's request
+            results = []
+            for text in texts:
+                try:
+                    result = self.run([text], **kwargs)
+                    results.append(result[0] if isinstance(result, list) else result)
+                except Exception as e:
+                    results.append({"error": str(e)})
+
+        offset = 0
+        for request_texts, _, future in group:
+            future.set_result(results[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+
+def make_handler(batchers: dict, models: Dict[str, str], backend: str):
+    """Request handler for the batchers; /health reports the model behind each endpoint
+    and the inference backend they run on"""
+
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def _respond(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._respond(200, {"status": "ok", "models": models, "backend": backend})
+            else:
+                self._respond(404, {"error": "not found"})
+
+        def do_POST(self):
+            batcher = batchers.get(self.path.strip("/"))
+            if batcher is None:
+                self._respond(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                texts = request.pop("texts")
+                results = batcher.submit(texts, **request).result()
+                self._respond(200, {"results": results})
+            except Exception as e:
+                self._respond(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return InferenceHandler
+
+
+class RemoteModel:
+    """Client for one model on the inference server, called like the local pipeline"""
+
+    # Batching is the server's job, so per-call batching arguments are dropped
+    IGNORED_ARGUMENTS = ("batch_size",)
+
+    def __init__(self, base_url: str, endpoint: str, session: requests.Session = None):
+        self.base_url = base_url.rstrip('/')
+        self.endpoint = endpoint
+        self.url = f"{self.base_url}/{endpoint}"
+        self.session = session or requests.Session()
+        self._health = None
+
+    def health(self) -> dict:
+        """The server's /health report, asked once"""
+        if self._health is None:
+            response = self.session.get(f"{self.base_url}/health", timeout=30)
+            response.raise_for_status()
+            self._health = response.json()
+        return self._health
+
+    @property
+    def model_name(self) -> str:
+        """Name of the model the server runs behind this endpoint"""
+        return self.health()["models"][self.endpoint]
+
+    @property
+    def backend(self) -> str:
+        """Inference backend the server runs its models on"""
+        return self.health()["backend"]
+
+    def _post(self, texts: List[str], kwargs: dict) -> List[dict]:
+        payload = {key: value for key, value in kwargs.items() if key not in self.IGNORED_ARGUMENTS}
+        payload["texts"] = texts
+        response = self.session.post(self.url, json=payload, timeout=600)
+        response.raise_for_status()
+        results = response.json()["results"]
+        errors = [result["error"] for result in results if "error" in result]
+        if errors:
+            raise RuntimeError(f"Inference server failed on {len(errors)} texts: {errors[0]}")
+        return results
+
+
+class RemoteSummarizer(RemoteModel):
+    def __init__(self, base_url: str = DEFAULT_URL, session: requests.Session = None):
+        super().__init__(base_url, "summarize", session)
+
+    def __call__(self, texts: Union[str, List[str]], **kwargs) -> List[dict]:
+        return self._post([texts] if isinstance(texts, str) else list(texts), kwargs)
+
+
+class RemoteClassifier(RemoteModel):
+    def __init__(self, base_url: str = DEFAULT_URL, session: requests.Session = None):
+        super().__init__(base_url, "classify", session)
+
+    def __call__(self, texts: Union[str, List[str]], **kwargs):
+        if isinstance(texts, str):
+            return self._post([texts], kwargs)[0]
+        return self._post(list(texts), kwargs)
+
+
+if __name__ == "__main__":
+    from data_processing_agent import DataProcessingAgent, classifier_name, summarizer_name
+    from inference_backends import SUMMARIZATION_MODEL, load_pipeline
+
+    parser = argparse.ArgumentParser(description="Serve the summarizer and classifier to local processing workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    backend = os.getenv("inference_backend", "pytorch")
+    log.info("Loading NLP models", extra={"backend": backend})
+    summarizer = load_pipeline("summarization", SUMMARIZATION_MODEL, backend)
+    classifier = DataProcessingAgent.load_classifier(os.getenv("classifier_engine", "nli"), backend)
+
+    batchers = {
+        "summarize": DynamicBatcher(summarizer, args.max_batch_size, args.max_wait_ms),
+        "classify": DynamicBatcher(classifier, args.max_batch_size, args.max_wait_ms),
+    }
+    models = {"summarize": summarizer_name(summarizer), "classify": classifier_name(classifier)}
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batchers, models, backend))
+    log.info("Inference server listening", extra={"url": f"http://{args.host}:{args.port}", "models": models})
+    server.serve_forever()
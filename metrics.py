@@ -0,0 +1,257 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("news_aggregator")
+except ImportError:
+    _tracer = None
+
+# Seconds; spans single NewsAPI calls and searches up to whole bulk runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, values: LabelValues, extra: Dict[str, str] = None) -> str:
+        pairs = list(zip(self.labels, values)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> str:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> str:
+        with self.lock:
+            return "".join(
+                f"{self.name}{self._format_labels(key)} {value}\n" for key, value in sorted(self.values.items())
+            )
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (last one is +Inf), sum and count
+        self.values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def total(self, **labels) -> Tuple[float, int]:
+        """Sum and count of the observations with these labels"""
+        with self.lock:
+            _, total, count = self.values.get(self._key(labels), (None, 0.0, 0))
+        return total, count
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': le})} {cumulative}\n")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {total}\n")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {count}\n")
+        return "".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "".join(
+            f"# HELP {metric.name} {metric.help_text}\n# TYPE {metric.name} {metric.kind}\n{metric.render()}"
+            for metric in metrics
+        )
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+
+STAGE_SECONDS = histogram(
+    "news_stage_seconds",
+    "Wall time of pipeline stages (fetch, validate, index, summarize, classify, embed, update, search, ...)",
+    ["stage"]
+)
+STAGE_ERRORS = counter("news_stage_errors_total", "Pipeline stage calls that raised", ["stage"])
+ARTICLES = counter("news_articles_total", "Articles by pipeline outcome", ["outcome"])
+NEWSAPI_REQUESTS = counter("news_newsapi_requests_total", "NewsAPI requests by HTTP status", ["status"])
+SUMMARIES = counter("news_summaries_total", "Summaries by tier (abstractive, extractive or extractive-fallback)", ["tier"])
+
+
+@contextmanager
+def timed(stage: str, **attributes) -> Iterator[None]:
+    """Record a stage's duration, and trace it as a span when OpenTelemetry is installed"""
+    with ExitStack() as stack:
+        if _tracer:
+            stack.enter_context(_tracer.start_as_current_span(stage, attributes=attributes))
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.inc(stage=stage)
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def write_textfile(path: str):
+    """Write the metrics for a node_exporter textfile collector, atomically"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+def _handler():
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+def start_exporter(port: Optional[int] = None, path: Optional[str] = None):
+    """Serve /metrics on metrics_port and/or write metrics_file at exit; safe to call repeatedly"""
+    global _exporter_started
+    port = port or (int(os.getenv("metrics_port")) if os.getenv("metrics_port") else None)
+    path = path or os.getenv("metrics_file")
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer((os.getenv("metrics_host", "127.0.0.1"), port), _handler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        except OSError as e:
+            # Another process on this machine already serves the port
+            get_logger("metrics").warning("Metrics endpoint not started", extra={"port": port, "error": str(e)})
+    if path:
+        atexit.register(write_textfile, path)
+
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record: key=value pairs, or a JSON object with log_format=json"""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        fields.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+
+        if self.json_lines:
+            return json.dumps(fields, default=str)
+        return " ".join(
+            f"{key}={value}" if isinstance(value, (int, float)) else f"{key}={json.dumps(str(value))}"
+            for key, value in fields.items()
+        )
+
+
+_logging_configured = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger writing structured lines to stderr at the level set by log_level"""
+    global _logging_configured
+    if not _logging_configured:
+        _logging_configured = True
+        handler = logging.StreamHandler()
+        handler.setFormatter(StructuredFormatter(os.getenv("log_format", "text") == "json"))
+        root = logging.getLogger("news_aggregator")
+        root.addHandler(handler)
+        root.setLevel(os.getenv("log_level", "INFO").upper())
+        root.propagate = False
+    return logging.getLogger(f"news_aggregator.{name}")
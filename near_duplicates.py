@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+NUM_PERMUTATIONS = 64
+# 16 bands of 4 rows put the LSH candidate threshold at a Jaccard similarity
+# of about 0.5; candidates are then checked against SIMILARITY_THRESHOLD
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+SIMILARITY_THRESHOLD = 0.7
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed so signatures stay comparable across runs and processes. The
+# multipliers and shingle hashes are 32-bit, so a * h fits in a uint64
+_rng = random.Random(1234)
+PERMUTATION_A = np.array([_rng.randrange(1, 1 << 32) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+PERMUTATION_B = np.array([_rng.randrange(0, (1 << 61) - 1) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+
+# Bumped whenever signatures are computed differently; older index files are discarded
+SIGNATURE_VERSION = 2
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# NewsAPI appends a "[+1234 chars]" marker to truncated content
+TRUNCATION_MARKER = re.compile(r"\[\+\d+ chars\]")
+
+
+def shingles(text: str, size: int = 3) -> set:
+    tokens = TOKEN_PATTERN.findall(TRUNCATION_MARKER.sub("", text).lower())
+    if len(tokens) < size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """MinHash signature of the word shingles in a text"""
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big")
+            for shingle in shingles(text)
+        ),
+        dtype=np.uint64
+    )
+    # Every shingle against every permutation at once: (shingles, permutations)
+    values = (np.outer(hashes, PERMUTATION_A) % MERSENNE_PRIME + PERMUTATION_B) % MERSENNE_PRIME
+    return tuple((values.min(axis=0) & MAX_HASH).tolist())
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERMUTATIONS
+
+
+class NearDuplicateIndex:
+    """In-memory LSH banding index of MinHash signatures, persisted as JSON.
+
+    Syndicated copies show up within days of each other, so signatures older
+    than ``max_age_days`` are dropped to keep the index and its file bounded.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = SIMILARITY_THRESHOLD,
+                 max_age_days: Optional[float] = 7):
+        self.path = path
+        self.threshold = threshold
+        self.max_age_days = max_age_days
+        self.signatures: Dict[str, Tuple[int, ...]] = {}
+        self.clusters: Dict[str, str] = {}
+        self.added: Dict[str, float] = {}
+        self.buckets: Dict[str, List[str]] = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def band_keys(signature: Tuple[int, ...]) -> List[str]:
+        return [
+            f"{band}:" + hashlib.blake2b(repr(signature[band * ROWS:(band + 1) * ROWS]).encode(), digest_size=8).hexdigest()
+            for band in range(BANDS)
+        ]
+
+    def find(self, signature: Tuple[int, ...]) -> Optional[str]:
+        """Return the cluster ID of the most similar indexed near-duplicate, if any"""
+        best = None
+        best_score = self.threshold
+        for key in self.band_keys(signature):
+            for doc_id in self.buckets.get(key, ()):
+                score = similarity(signature, self.signatures[doc_id])
+                if score >= best_score:
+                    best, best_score = doc_id, score
+        return self.clusters[best] if best else None
+
+    def add(self, doc_id: str, signature: Tuple[int, ...], cluster_id: str, added: Optional[float] = None):
+        self.signatures[doc_id] = signature
+        self.clusters[doc_id] = cluster_id
+        self.added[doc_id] = added or time.time()
+        for key in self.band_keys(signature):
+            self.buckets.setdefault(key, []).append(doc_id)
+        self.dirty = True
+
+    def assign(self, doc_id: str, signature: Tuple[int, ...]) -> str:
+        """Cluster ID for a document, starting a new cluster when it has no near-duplicate"""
+        if doc_id in self.clusters:
+            return self.clusters[doc_id]
+        cluster_id = self.find(signature) or doc_id
+        self.add(doc_id, signature, cluster_id)
+        return cluster_id
+
+    def prune(self):
+        """Forget signatures added more than max_age_days ago"""
+        if not self.max_age_days:
+            return
+        cutoff = time.time() - self.max_age_days * 86400
+        expired = [doc_id for doc_id, added in self.added.items() if added < cutoff]
+        if not expired:
+            return
+        for doc_id in expired:
+            del self.signatures[doc_id], self.clusters[doc_id], self.added[doc_id]
+        self.buckets = {}
+        for doc_id, signature in self.signatures.items():
+            for key in self.band_keys(signature):
+                self.buckets.setdefault(key, []).append(doc_id)
+        self.dirty = True
+
+    def load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        # Signatures from an older scheme can't be compared with new ones
+        if data.get("version") != SIGNATURE_VERSION:
+            return
+        for doc_id, (signature, cluster_id, added) in data["signatures"].items():
+            self.add(doc_id, tuple(signature), cluster_id, added)
+        self.prune()
+        self.dirty = False
+
+    def save(self):
+        self.prune()
+        if not self.path or not self.dirty:
+            return
+        data = {
+            "version": SIGNATURE_VERSION,
+            "signatures": {
+                doc_id: [self.signatures[doc_id], cluster_id, self.added[doc_id]]
+                for doc_id, cluster_id in self.clusters.items()
+            }
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
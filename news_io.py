@@ -0,0 +1,191 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Sequence
+
+from index_management import WRITE_ALIAS, bulk_load, ensure_index_setup, ensure_partitions
+from metrics import get_logger
+from rollups import created_counts, daily_key
+from storage import BACKENDS, ElasticsearchStorage, SQLiteStorage, Storage, open_storage
+
+# Column order of the export files; the document ID is always written
+COLUMNS = (
+    "title", "content", "summary", "description", "url", "source", "date", "category",
+    "category_score", "author", "cluster_id", "model_version", "label_version", "embedding"
+)
+
+log = get_logger("news_io")
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export and import require pyarrow, install it with: "
+                          "pip install pyarrow (or poetry install --extras parquet)")
+    return pa, pq
+
+
+def article_schema(fields: Optional[Sequence[str]] = None):
+    """Arrow schema of the export files, limited to ``fields`` when given"""
+    pa, _ = _pyarrow()
+    types = {
+        "category_score": pa.float64(),
+        "embedding": pa.list_(pa.float32())
+    }
+    columns = [name for name in COLUMNS if fields is None or name in fields]
+    return pa.schema([("id", pa.string())] + [(name, types.get(name, pa.string())) for name in columns])
+
+
+def export_articles(
+    storage: Storage,
+    directory: str,
+    fields: Optional[Sequence[str]] = None,
+    batch_size: int = 1000,
+    rows_per_file: int = 100_000,
+    compression: str = "zstd"
+) -> int:
+    """Stream every article into numbered Parquet files, holding one batch in memory at a time"""
+    pa, pq = _pyarrow()
+    schema = article_schema(fields)
+    os.makedirs(directory, exist_ok=True)
+
+    writer = None
+    file_rows = 0
+    files = 0
+    exported = 0
+    try:
+        for hits in storage.scan([name for name in schema.names if name != "id"], batch_size):
+            rows = [dict(hit["_source"], id=hit["_id"]) for hit in hits]
+            # A batch that crosses the file limit is split between two files
+            while rows:
+                if writer is None or file_rows >= rows_per_file:
+                    if writer is not None:
+                        writer.close()
+                    path = os.path.join(directory, f"part-{files:05d}.parquet")
+                    writer = pq.ParquetWriter(path, schema, compression=compression)
+                    files += 1
+                    file_rows = 0
+
+                chunk, rows = rows[:rows_per_file - file_rows], rows[rows_per_file - file_rows:]
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                file_rows += len(chunk)
+                exported += len(chunk)
+            log.info("Export progress", extra={"exported": exported, "files": files})
+    finally:
+        if writer is not None:
+            writer.close()
+    return exported
+
+
+def import_file(storage: Storage, path: str, batch_size: int = 1000) -> Dict[str, int]:
+    """Upsert the articles of one Parquet file and count the new ones in the daily rollup"""
+    _, pq = _pyarrow()
+    indexed = 0
+    failed = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        docs: List[dict] = []
+        for row in batch.to_pylist():
+            # Missing values are left out, a null summary would mark the article as enriched
+            doc = {key: value for key, value in row.items() if value is not None and key != "id"}
+            docs.append(dict(doc, _id=row["id"]))
+
+        keys = {doc["_id"]: daily_key(doc) for doc in docs}
+        result = storage.bulk_upsert(docs)
+        storage.add_daily_counts(created_counts(keys, result["created"]))
+        indexed += result["indexed"]
+        failed += len(result["failed"])
+
+    log.info("Imported file", extra={"path": path, "indexed": indexed, "failed": failed})
+    return {"indexed": indexed, "failed": failed}
+
+
+def import_articles(storage: Storage, paths: Sequence[str], workers: int = 4, batch_size: int = 1000) -> Dict[str, int]:
+    """Import Parquet files in parallel, one file per worker at a time"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda path: import_file(storage, path, batch_size), paths))
+    return {
+        "indexed": sum(result["indexed"] for result in results),
+        "failed": sum(result["failed"] for result in results)
+    }
+
+
+def import_partitions(es, paths: Sequence[str]) -> List[str]:
+    """Monthly partitions the articles in the files will be written to, created if missing"""
+    _, pq = _pyarrow()
+    names = set()
+    for path in paths:
+        parquet = pq.ParquetFile(path)
+        if "date" not in parquet.schema_arrow.names:
+            names.add(WRITE_ALIAS)
+            continue
+        for batch in parquet.iter_batches(columns=["date"]):
+            names.update(
+                ElasticsearchStorage.partition_for({"date": value} if value else {})
+                for value in batch.column(0).to_pylist()
+            )
+    return ensure_partitions(es, names)
+
+
+def parquet_files(paths: Sequence[str]) -> List[str]:
+    """Parquet files named directly or found in the given directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.parquet"))))
+        else:
+            files.append(path)
+    return files
+
+
+def storage_for(backend: Optional[str], sqlite_path: Optional[str]) -> Storage:
+    if sqlite_path:
+        return SQLiteStorage(sqlite_path)
+    return open_storage(backend)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export stored articles to Parquet files and import them back")
+    parser.add_argument("--backend", choices=BACKENDS, help="storage backend (defaults to storage_backend)")
+    parser.add_argument("--sqlite-path", help="SQLite database to use instead of sqlite_path")
+    parser.add_argument("--batch-size", type=int, default=1000, help="articles per read or bulk request")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="write every article to numbered Parquet files")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--fields", help=f"comma-separated columns to export (default: all of {', '.join(COLUMNS)})")
+    export_parser.add_argument("--rows-per-file", type=int, default=100_000)
+    export_parser.add_argument("--compression", default="zstd")
+
+    import_parser = subparsers.add_parser("import", help="upsert articles from Parquet files or directories")
+    import_parser.add_argument("paths", nargs="+")
+    import_parser.add_argument("--workers", type=int, default=4, help="files imported in parallel")
+    import_parser.add_argument("--bulk-load", action="store_true",
+                               help="relax refresh and replicas on the Elasticsearch partitions the files write to "
+                                    "while importing")
+    args = parser.parse_args()
+
+    storage = storage_for(args.backend, args.sqlite_path)
+    try:
+        if args.command == "export":
+            fields = [field.strip() for field in args.fields.split(",")] if args.fields else None
+            exported = export_articles(storage, args.directory, fields, args.batch_size,
+                                       args.rows_per_file, args.compression)
+            print(f"Exported {exported} articles to {args.directory}")
+        else:
+            files = parquet_files(args.paths)
+            is_es = isinstance(storage, ElasticsearchStorage)
+            loading = nullcontext()
+            if is_es:
+                ensure_index_setup(storage.es)
+                if args.bulk_load:
+                    # Imported articles go to the months they were published in, not just the current one
+                    loading = bulk_load(storage.es, ",".join(import_partitions(storage.es, files)))
+            with loading:
+                result = import_articles(storage, files, args.workers, args.batch_size)
+            print(f"Imported {result['indexed']} articles from {len(files)} files ({result['failed']} failed)")
+    finally:
+        storage.close()
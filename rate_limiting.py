@@ -0,0 +1,61 @@
+import threading
+import time
+from typing import Optional
+
+
+class RateLimitError(Exception):
+    """Raised when an API answers 429 Too Many Requests"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket with exponential backoff after rate-limit responses"""
+
+    def __init__(self, rate: float, capacity: float, max_backoff: float = 3600):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_backoff = max_backoff
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.backoff_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; otherwise return how many seconds to wait"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Block until tokens are available"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def backoff(self, retry_after: Optional[float] = None):
+        """Pause all acquisitions, doubling the pause on consecutive rate-limit responses"""
+        with self.lock:
+            self.backoff_seconds = min(self.max_backoff, max(1.0, self.backoff_seconds * 2))
+            pause = max(self.backoff_seconds, retry_after or 0)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+            self.tokens = 0
+
+    def reset_backoff(self):
+        with self.lock:
+            self.backoff_seconds = 0.0
@@ -0,0 +1,46 @@
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+# Rollup rows are grouped by any of these dimensions
+DIMENSIONS = ("day", "category", "source")
+
+DailyKey = Tuple[str, str, str]
+
+
+def daily_key(doc: dict, category: Optional[str] = None) -> Optional[DailyKey]:
+    """(day, category, source) a document is counted under, or None without a usable date"""
+    day = (doc.get('date') or '')[:10]
+    if len(day) != 10:
+        return None
+    return day, category or doc.get('category') or 'Uncategorized', doc.get('source') or 'Unknown'
+
+
+def created_counts(keys: Dict[str, Optional[DailyKey]], created_ids: Iterable[str]) -> Counter:
+    """Increments for the documents an upsert actually created"""
+    return Counter(keys[doc_id] for doc_id in created_ids if keys.get(doc_id))
+
+
+def recategorized_counts(changes: Iterable[Tuple[dict, str]]) -> Counter:
+    """Moves between category counts for (stored document, new category) pairs"""
+    counts = Counter()
+    for doc, category in changes:
+        old_key = daily_key(doc)
+        new_key = daily_key(doc, category)
+        if old_key and old_key != new_key:
+            counts[old_key] -= 1
+            counts[new_key] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Maintain the daily article counts behind the trends dashboard")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="rebuild the counts from every stored article (stop the agents first)")
+    args = parser.parse_args()
+
+    storage = open_storage()
+    if args.command == "backfill":
+        print(f"Rebuilt {storage.rebuild_daily_counts()} daily count rows")
@@ -0,0 +1,1150 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch, helpers
+
+from index_management import (
+    READ_ALIAS,
+    ROLLUP_INDEX,
+    WRITE_ALIAS,
+    ensure_rollup_index,
+    has_legacy_index,
+    index_name,
+    indices_for_range
+)
+from metrics import get_logger
+from rollups import DIMENSIONS
+
+# Load environment variables
+load_dotenv()
+
+CLOUD_ID = "news_aggregator:dXMtY2VudHJhbDEuZ2NwLmNsb3VkLmVzLmlvJGU1NzU1MDM3OWM4YTQzZTZiZTRjNzQ3NmIwYTlkNmY0JDU1ZWU4ZDQyNTdkYTRhMmY4ZDE4MGZlY2Q4NzRlZTdl"
+BACKENDS = ("elasticsearch", "sqlite")
+
+# Sort orders understood by every backend; relevance needs search text
+SORT_NEWEST = "newest"
+SORT_OLDEST = "oldest"
+SORT_RELEVANCE = "relevance"
+
+# Semantic search candidates: ANN candidates per shard, and results per ranking fused in hybrid mode
+NUM_CANDIDATES = 100
+HYBRID_CANDIDATES = 100
+RRF_RANK_CONSTANT = 60
+
+# How long a full scan's point in time stays open between batches
+SCAN_KEEP_ALIVE = "5m"
+
+# Stamped on enriched documents; documents with other values are re-enriched
+VERSION_FIELDS = ("model_version", "label_version")
+
+log = get_logger("storage")
+
+
+def create_es_client(username: Optional[str] = None, password: Optional[str] = None) -> Elasticsearch:
+    """Elasticsearch client used by every entry point.
+
+    Credentials default to the elastic_username/elastic_password environment
+    variables. Connections are pooled per node and request bodies are
+    compressed, which matters for bulk indexing over the internet.
+    """
+    username = username or os.getenv("elastic_username")
+    password = password or os.getenv("elastic_password")
+    if not username or not password:
+        raise ValueError("Elasticsearch credentials not found in environment variables")
+
+    return Elasticsearch(
+        cloud_id=os.getenv("elastic_cloud_id", CLOUD_ID),
+        basic_auth=(username, password),
+        request_timeout=30,
+        retry_on_timeout=True,
+        max_retries=3,
+        connections_per_node=int(os.getenv("elastic_connections_per_node", 10)),
+        http_compress=True
+    )
+
+
+def search_filters(
+    sources: Optional[Sequence[str]] = None,
+    categories: Optional[Sequence[str]] = None,
+    date_range: Optional[Sequence] = None
+) -> List[dict]:
+    """Elasticsearch filter clauses for the UI's source, category and date filters"""
+    filters = []
+    if sources:
+        filters.append({"terms": {"source": list(sources)}})
+
+    if categories:
+        filters.append({"terms": {"category": list(categories)}})
+
+    if date_range:
+        filters.append({
+            "range": {
+                "date": {
+                    "gte": date_range[0].isoformat(),
+                    "lte": date_range[1].isoformat()
+                }
+            }
+        })
+    return filters
+
+
+def build_search_query(
+    text: Optional[str] = None,
+    sources: Optional[Sequence[str]] = None,
+    categories: Optional[Sequence[str]] = None,
+    date_range: Optional[Sequence] = None,
+    sort: str = SORT_NEWEST,
+    size: int = 20,
+    fields: Optional[Sequence[str]] = None
+) -> dict:
+    """Elasticsearch request body for a filtered, sorted article search"""
+    must_conditions = []
+    if text:
+        must_conditions.append({
+            "multi_match": {
+                "query": text,
+                "fields": ["title^2", "content", "summary"]
+            }
+        })
+    must_conditions.extend(search_filters(sources, categories, date_range))
+
+    # Sort configuration, with the URL as a tiebreaker so search_after cursors are stable
+    sort_config = [{"date": {"order": "desc"}}]
+    if sort == SORT_OLDEST:
+        sort_config = [{"date": {"order": "asc"}}]
+    elif sort == SORT_RELEVANCE and text:
+        sort_config = ["_score"]
+    sort_config.append({"url": {"order": "asc"}})
+
+    body = {
+        "query": {"bool": {"must": must_conditions}} if must_conditions else {"match_all": {}},
+        "sort": sort_config,
+        "size": size
+    }
+    if fields is not None:
+        body["_source"] = list(fields)
+    return body
+
+
+def brute_force_knn(vector: Sequence[float], matrix: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows of a matrix of normalized embeddings closest to a vector by cosine similarity,
+    as (row indices, scores) best first"""
+    if not len(matrix) or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    query = np.asarray(vector, dtype=np.float32)
+    scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-9))
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top, scores[top]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[dict]], rank_constant: int = RRF_RANK_CONSTANT) -> List[dict]:
+    """Merge ranked hit lists, scoring each hit by the sum of 1 / (rank_constant + rank)"""
+    scores: Dict[str, float] = {}
+    hits: Dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            scores[hit['_id']] = scores.get(hit['_id'], 0.0) + 1.0 / (rank_constant + rank)
+            hits.setdefault(hit['_id'], hit)
+    ordered = sorted(scores, key=lambda doc_id: -scores[doc_id])
+    return [dict(hits[doc_id], _score=scores[doc_id]) for doc_id in ordered]
+
+
+def rollup_filters(
+    sources: Optional[Sequence[str]] = None,
+    categories: Optional[Sequence[str]] = None,
+    date_range: Optional[Sequence] = None
+) -> List[dict]:
+    """Elasticsearch filter clauses over the rollup index"""
+    filters = []
+    if sources:
+        filters.append({"terms": {"source": list(sources)}})
+    if categories:
+        filters.append({"terms": {"category": list(categories)}})
+    if date_range:
+        filters.append({"range": {"day": {"gte": date_range[0].isoformat(), "lte": date_range[1].isoformat()}}})
+    return filters
+
+
+def facet_query() -> dict:
+    return {
+        "size": 0,
+        "aggs": {
+            "sources": {"terms": {"field": "source", "size": 100}},
+            "categories": {"terms": {"field": "category", "size": 100}},
+            "min_date": {"min": {"field": "date"}},
+            "max_date": {"max": {"field": "date"}}
+        }
+    }
+
+
+def ui_query_shapes(facets: dict) -> Dict[str, dict]:
+    """The searches the UI issues, with every source and category selected as it does by default"""
+    feed = {"sources": facets["sources"], "categories": facets["categories"]}
+    if facets["min_date"] and facets["max_date"]:
+        feed["date_range"] = tuple(
+            datetime.fromisoformat(facets[key].replace("Z", "+00:00")).date() for key in ("min_date", "max_date")
+        )
+    return {
+        "feed_newest": dict(feed, sort=SORT_NEWEST),
+        "feed_oldest": dict(feed, sort=SORT_OLDEST),
+        "search_newest": dict(feed, text="market growth", sort=SORT_NEWEST),
+        "search_relevance": dict(feed, text="market growth", sort=SORT_RELEVANCE),
+        "search_unfiltered": {"text": "election results", "sort": SORT_RELEVANCE}
+    }
+
+
+class Storage(ABC):
+    """Article store used by the agents and the UI.
+
+    Documents are plain dicts; ``bulk_upsert`` takes them with their ID under
+    ``_id``, and searches return hits shaped like Elasticsearch hits
+    (``_id``, ``_index``, ``_source``).
+    """
+
+    name = None
+
+    @abstractmethod
+    def bulk_upsert(self, docs: Iterable[dict]) -> Dict[str, object]:
+        """Insert new documents and update existing ones, returning the success
+        count, per-item failures and the IDs of newly created documents.
+        Existing categories are kept unless the incoming document is already
+        enriched."""
+
+    @abstractmethod
+    def search(
+        self,
+        text: Optional[str] = None,
+        sources: Optional[Sequence[str]] = None,
+        categories: Optional[Sequence[str]] = None,
+        date_range: Optional[Sequence] = None,
+        sort: str = SORT_NEWEST,
+        size: int = 20,
+        fields: Optional[Sequence[str]] = None,
+        search_after: Optional[list] = None
+    ) -> Tuple[List[dict], Optional[list], int]:
+        """One page of matching hits, the cursor for the next page (or None) and the total"""
+
+    @abstractmethod
+    def knn_search(
+        self,
+        vector: Sequence[float],
+        size: int = 20,
+        offset: int = 0,
+        sources: Optional[Sequence[str]] = None,
+        categories: Optional[Sequence[str]] = None,
+        date_range: Optional[Sequence] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[dict], int]:
+        """Hits nearest to a query embedding among articles matching the filters,
+        and how many nearest neighbours were found in total"""
+
+    def hybrid_search(
+        self,
+        text: str,
+        vector: Sequence[float],
+        size: int = 20,
+        offset: int = 0,
+        sources: Optional[Sequence[str]] = None,
+        categories: Optional[Sequence[str]] = None,
+        date_range: Optional[Sequence] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[dict], int]:
+        """Keyword and vector rankings merged with reciprocal rank fusion"""
+        if fields is not None and 'url' not in fields:
+            fields = list(fields) + ['url']
+        keyword_hits, _, _ = self.search(
+            text, sources, categories, date_range, SORT_RELEVANCE, HYBRID_CANDIDATES, fields
+        )
+        vector_hits, _ = self.knn_search(vector, HYBRID_CANDIDATES, 0, sources, categories, date_range, fields)
+        fused = reciprocal_rank_fusion([keyword_hits, vector_hits])
+        return fused[offset:offset + size], len(fused)
+
+    @abstractmethod
+    def facets(self) -> dict:
+        """Sources and categories by article count, and the oldest and newest dates"""
+
+    @abstractmethod
+    def get(self, doc_id: str, fields: Optional[Sequence[str]] = None, index: Optional[str] = None) -> Optional[dict]:
+        """One document's source, or None if it doesn't exist"""
+
+    @abstractmethod
+    def get_many(self, doc_ids: Iterable[str], fields: Optional[Sequence[str]] = None) -> Dict[str, dict]:
+        """Sources of the given documents that exist, keyed by ID"""
+
+    @abstractmethod
+    def find_unprocessed(self, size: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        """Hits for articles that have no summary yet"""
+
+    @abstractmethod
+    def find_stale(
+        self,
+        versions: Dict[str, Sequence[str]],
+        size: int,
+        fields: Optional[Sequence[str]] = None,
+        search_after: Optional[list] = None
+    ) -> Tuple[List[dict], Optional[list]]:
+        """Enriched hits with a version field outside its accepted values in
+        ``versions``, newest first, and the cursor for the next block (or None)"""
+
+    @abstractmethod
+    def scan(self, fields: Optional[Sequence[str]] = None, batch_size: int = 1000) -> Iterator[List[dict]]:
+        """Every stored document as batches of hits, in no particular order"""
+
+    @abstractmethod
+    def update(self, hits: List[dict], docs: Dict[str, dict]) -> List[str]:
+        """Partial-update the given hits with the fields in ``docs``, keyed by document ID,
+        returning the IDs that were updated"""
+
+    @abstractmethod
+    def generation(self):
+        """A value that changes whenever documents are written, for cache keys"""
+
+    @abstractmethod
+    def add_daily_counts(self, counts: Dict[Tuple[str, str, str], int]):
+        """Add to the rollup's article counts, keyed by (day, category, source)"""
+
+    @abstractmethod
+    def daily_counts(
+        self,
+        group_by: Sequence[str] = DIMENSIONS,
+        sources: Optional[Sequence[str]] = None,
+        categories: Optional[Sequence[str]] = None,
+        date_range: Optional[Sequence] = None
+    ) -> List[dict]:
+        """Rollup rows summed over every dimension not in ``group_by``"""
+
+    @abstractmethod
+    def rebuild_daily_counts(self) -> int:
+        """Recompute the rollup from the stored articles, returning the number of rows"""
+
+    def close(self):
+        pass
+
+
+class ElasticsearchStorage(Storage):
+    """Articles in the monthly news partitions of an Elasticsearch cluster"""
+
+    name = "elasticsearch"
+
+    def __init__(
+        self,
+        es: Optional[Elasticsearch] = None,
+        bulk_chunk_size: int = 500,
+        bulk_max_chunk_bytes: int = 10 * 1024 * 1024
+    ):
+        self.es = es or create_es_client()
+        self.bulk_chunk_size = bulk_chunk_size
+        self.bulk_max_chunk_bytes = bulk_max_chunk_bytes
+        self._partitioned = None
+
+    @staticmethod
+    def partition_for(doc: dict) -> str:
+        """Monthly partition for a document, or the write alias if its date can't be parsed"""
+        try:
+            return index_name(doc['date'])
+        except (TypeError, ValueError, KeyError):
+            return WRITE_ALIAS
+
+    def locate(self, doc_ids: Sequence[str]) -> Dict[str, List[str]]:
+        """Partitions that already hold each of the given documents.
+
+        A search rather than mget, which can't resolve an alias spanning several
+        partitions; documents written since the last refresh are not found yet.
+        """
+        if not doc_ids:
+            return {}
+        body = {"query": {"ids": {"values": list(doc_ids)}}, "_source": False, "size": 2 * len(doc_ids)}
+        located: Dict[str, List[str]] = {}
+        for hit in self.es.search(index=READ_ALIAS, body=body)['hits']['hits']:
+            located.setdefault(hit['_id'], []).append(hit['_index'])
+        return located
+
+    def bulk_actions(self, docs: Iterable[dict], moved: Dict[str, List[str]]):
+        """Turn documents into bulk upsert actions.
+
+        The document ID comes from the URL but the partition from the date, so
+        a document whose date now falls in another month is recreated there
+        from its stored copy. The partitions it leaves are recorded in
+        ``moved``, for bulk_upsert to delete once the new copy is written.
+        """
+        docs = iter(docs)
+        while True:
+            chunk = [dict(doc) for doc in islice(docs, self.bulk_chunk_size)]
+            if not chunk:
+                return
+            located = self.locate([doc['_id'] for doc in chunk])
+
+            targets = {}
+            for doc in chunk:
+                indices = located.get(doc['_id'], [])
+                target = self.partition_for(doc)
+                if target == WRITE_ALIAS and indices:
+                    # Without a date there is no better place than where it already is
+                    target = indices[0]
+                targets[doc['_id']] = target
+                if any(index != target for index in indices):
+                    moved[doc['_id']] = [index for index in indices if index != target]
+            # Documents only found in other partitions are recreated from their stored copy
+            stored = self._sources({
+                doc_id: indices for doc_id, indices in moved.items()
+                if doc_id in targets and targets[doc_id] not in located[doc_id]
+            })
+
+            for doc in chunk:
+                doc_id = doc.pop('_id')
+                # Leave the category alone on existing documents, the processing
+                # agent may already have replaced it with a classified one, unless
+                # this document arrives already enriched
+                update = doc if 'summary' in doc else {k: v for k, v in doc.items() if k != 'category'}
+                yield {
+                    '_op_type': 'update',
+                    '_index': targets[doc_id],
+                    '_id': doc_id,
+                    'doc': update,
+                    'upsert': dict(stored[doc_id], **update) if doc_id in stored else doc
+                }
+
+    def _sources(self, old_copies: Dict[str, List[str]]) -> Dict[str, dict]:
+        """Stored sources of documents about to move to another partition"""
+        if not old_copies:
+            return {}
+        indices = sorted({index for located in old_copies.values() for index in located})
+        body = {"query": {"ids": {"values": list(old_copies)}}, "size": len(indices) * len(old_copies)}
+        results = self.es.search(index=",".join(indices), body=body)
+        return {hit['_id']: hit['_source'] for hit in results['hits']['hits']}
+
+    def bulk_upsert(self, docs: Iterable[dict]) -> Dict[str, object]:
+        indexed = 0
+        failures: List[dict] = []
+        created: List[str] = []
+        moved: Dict[str, List[str]] = {}
+        written = set()
+
+        for ok, item in helpers.streaming_bulk(
+            self.es,
+            self.bulk_actions(docs, moved),
+            chunk_size=self.bulk_chunk_size,
+            max_chunk_bytes=self.bulk_max_chunk_bytes,
+            raise_on_error=False,
+            raise_on_exception=False,
+            max_retries=3
+        ):
+            result = next(iter(item.values()))
+            if ok:
+                indexed += 1
+                written.add(result['_id'])
+                # A document moving partitions is created in the new one but isn't new
+                if result.get('result') == 'created' and result['_id'] not in moved:
+                    created.append(result['_id'])
+            else:
+                failures.append(result)
+                log.warning("Failed to index article", extra={"id": result.get('_id'), "error": result.get('error')})
+
+        self._delete_old_copies({doc_id: indices for doc_id, indices in moved.items() if doc_id in written})
+        return {'indexed': indexed, 'failed': failures, 'created': created}
+
+    def _delete_old_copies(self, moved: Dict[str, List[str]]):
+        """Delete the copies left behind in other partitions, only after the new copy was written"""
+        actions = (
+            {'_op_type': 'delete', '_index': index, '_id': doc_id}
+            for doc_id, indices in moved.items()
+            for index in indices
+        )
+        for ok, item in helpers.streaming_bulk(self.es, actions, raise_on_error=False, raise_on_exception=False):
+            result = next(iter(item.values()))
+            if not ok and result.get('status') != 404:
+                log.warning("Failed to delete moved article", extra={"id": result.get('_id'), "index": result.get('_index')})
+
+    def is_partitioned(self) -> bool:
+        if self._partitioned is None:
+            self._partitioned = not has_legacy_index(self.es)
+        return self._partitioned
+
+    def search_indices(self, date_range: Optional[Sequence]) -> str:
+        """Only search the monthly partitions that overlap the date range"""
+        if date_range and len(date_range) == 2 and self.is_partitioned():
+            return ",".join(indices_for_range(date_range[0], date_range[1]))
+        return READ_ALIAS
+
+    def search(self, text=None, sources=None, categories=None, date_range=None, sort=SORT_NEWEST,
+               size=20, fields=None, search_after=None):
+        body = build_search_query(text, sources, categories, date_range, sort, size, fields)
+        if search_after:
+            body["search_after"] = search_after
+
+        res = self.es.search(index=self.search_indices(date_range), body=body, ignore_unavailable=True)
+        hits = res["hits"]["hits"]
+        next_cursor = hits[-1]["sort"] if len(hits) == size else None
+        return hits, next_cursor, res["hits"]["total"]["value"]
+
+    def knn_search(self, vector, size=20, offset=0, sources=None, categories=None, date_range=None, fields=None):
+        k = offset + size
+        body = {
+            # Filters inside the kNN clause are applied while searching the graph,
+            # so filtered searches still return k neighbours
+            "knn": {
+                "field": "embedding",
+                "query_vector": [float(value) for value in vector],
+                "k": k,
+                "num_candidates": max(NUM_CANDIDATES, k),
+                "filter": search_filters(sources, categories, date_range)
+            },
+            "from": offset,
+            "size": size
+        }
+        if fields is not None:
+            body["_source"] = list(fields)
+
+        res = self.es.search(index=self.search_indices(date_range), body=body, ignore_unavailable=True)
+        return res["hits"]["hits"], res["hits"]["total"]["value"]
+
+    def facets(self) -> dict:
+        res = self.es.search(index=READ_ALIAS, body=facet_query())
+        aggs = res["aggregations"]
+        return {
+            "sources": [bucket["key"] for bucket in aggs["sources"]["buckets"]],
+            "categories": [bucket["key"] for bucket in aggs["categories"]["buckets"]],
+            "min_date": aggs["min_date"].get("value_as_string"),
+            "max_date": aggs["max_date"].get("value_as_string")
+        }
+
+    def get(self, doc_id, fields=None, index=None):
+        if index:
+            res = self.es.get(index=index, id=doc_id, source_includes=list(fields) if fields else None)
+            return res["_source"]
+        return self.get_many([doc_id], fields).get(doc_id)
+
+    def get_many(self, doc_ids, fields=None):
+        # A search rather than mget, which can't resolve an alias spanning several partitions
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return {}
+        body = {"query": {"ids": {"values": doc_ids}}, "size": len(doc_ids)}
+        if fields is not None:
+            body["_source"] = list(fields)
+        results = self.es.search(index=READ_ALIAS, body=body)
+        return {hit['_id']: hit['_source'] for hit in results['hits']['hits']}
+
+    def find_unprocessed(self, size, fields=None):
+        body = {
+            "query": {"bool": {"must_not": {"exists": {"field": "summary"}}}},
+            "size": size
+        }
+        if fields is not None:
+            body["_source"] = list(fields)
+        return self.es.search(index=READ_ALIAS, body=body)['hits']['hits']
+
+    def find_stale(self, versions, size, fields=None, search_after=None):
+        body = {
+            "query": {"bool": {
+                "filter": [{"exists": {"field": "summary"}}],
+                # Current only when every version field has an accepted value
+                "must_not": [{"bool": {"filter": [
+                    {"terms": {field: list(values)}} for field, values in versions.items()
+                ]}}]
+            }},
+            "sort": [{"date": {"order": "desc"}}, {"url": {"order": "asc"}}],
+            "size": size,
+            "seq_no_primary_term": True
+        }
+        if fields is not None:
+            body["_source"] = list(fields)
+        if search_after:
+            body["search_after"] = search_after
+
+        hits = self.es.search(index=READ_ALIAS, body=body)['hits']['hits']
+        return hits, hits[-1]['sort'] if len(hits) == size else None
+
+    def scan(self, fields=None, batch_size=1000):
+        # A point in time gives a consistent view while the collector keeps writing
+        pit_id = self.es.open_point_in_time(index=READ_ALIAS, keep_alive=SCAN_KEEP_ALIVE)['id']
+        try:
+            search_after = None
+            while True:
+                body = {
+                    "size": batch_size,
+                    "pit": {"id": pit_id, "keep_alive": SCAN_KEEP_ALIVE},
+                    "sort": [{"_shard_doc": "asc"}]
+                }
+                if fields is not None:
+                    body["_source"] = list(fields)
+                if search_after:
+                    body["search_after"] = search_after
+
+                results = self.es.search(body=body)
+                pit_id = results.get('pit_id', pit_id)
+                hits = results['hits']['hits']
+                if hits:
+                    yield hits
+                if len(hits) < batch_size:
+                    return
+                search_after = hits[-1]['sort']
+        finally:
+            self.es.close_point_in_time(id=pit_id)
+
+    def update(self, hits, docs):
+        actions = []
+        for hit in hits:
+            if hit['_id'] not in docs:
+                continue
+            action = {
+                '_op_type': 'update',
+                '_index': hit['_index'],
+                '_id': hit['_id'],
+                'doc': docs[hit['_id']]
+            }
+            # Only apply the update if nobody else has written the document since we read it
+            if '_seq_no' in hit:
+                action['if_seq_no'] = hit['_seq_no']
+                action['if_primary_term'] = hit['_primary_term']
+            actions.append(action)
+
+        updated = []
+        for ok, item in helpers.streaming_bulk(
+            self.es,
+            actions,
+            raise_on_error=False,
+            raise_on_exception=False,
+            max_retries=3
+        ):
+            if ok:
+                updated.append(item['update']['_id'])
+            else:
+                result = item['update']
+                if result.get('status') == 409:
+                    log.debug("Article already updated by another worker, skipping", extra={"id": result.get('_id')})
+                else:
+                    log.warning("Error updating article", extra={"id": result.get('_id'), "error": result.get('error')})
+        return updated
+
+    def generation(self):
+        stats = self.es.indices.stats(index=READ_ALIAS, metric="docs,indexing")
+        primaries = stats["_all"]["primaries"]
+        return (
+            primaries["docs"]["count"],
+            primaries["indexing"]["index_total"],
+            primaries["indexing"]["delete_total"]
+        )
+
+    def add_daily_counts(self, counts):
+        actions = [
+            {
+                '_op_type': 'update',
+                '_index': ROLLUP_INDEX,
+                '_id': "|".join(key),
+                'script': {'source': 'ctx._source.count += params.n', 'params': {'n': n}},
+                'upsert': {'day': key[0], 'category': key[1], 'source': key[2], 'count': n},
+                # Collectors and processors increment the same rows concurrently
+                'retry_on_conflict': 5
+            }
+            for key, n in counts.items() if n
+        ]
+        if actions:
+            _, errors = helpers.bulk(self.es, actions, raise_on_error=False, raise_on_exception=False)
+            for error in errors:
+                log.warning("Failed to update daily counts", extra={"error": error})
+
+    def _composite(self, index: str, sources: List[dict], query: dict, sub_aggs: Optional[dict] = None):
+        """Page through a composite aggregation, yielding its buckets"""
+        composite = {"size": 1000, "sources": sources}
+        while True:
+            aggregation = {"composite": composite}
+            if sub_aggs:
+                aggregation["aggs"] = sub_aggs
+            res = self.es.search(index=index, body={"size": 0, "query": query, "aggs": {"rows": aggregation}})
+            rows = res["aggregations"]["rows"]
+            yield from rows["buckets"]
+            if "after_key" not in rows or not rows["buckets"]:
+                return
+            composite["after"] = rows["after_key"]
+
+    def daily_counts(self, group_by=DIMENSIONS, sources=None, categories=None, date_range=None):
+        composite_sources = [
+            {dimension: {"date_histogram": {"field": "day", "calendar_interval": "day", "format": "yyyy-MM-dd"}}}
+            if dimension == "day" else {dimension: {"terms": {"field": dimension}}}
+            for dimension in group_by
+        ]
+        query = {"bool": {"filter": rollup_filters(sources, categories, date_range)}}
+        return [
+            dict(bucket["key"], count=int(bucket["count"]["value"]))
+            for bucket in self._composite(ROLLUP_INDEX, composite_sources, query, {"count": {"sum": {"field": "count"}}})
+        ]
+
+    def rebuild_daily_counts(self):
+        composite_sources = [
+            {"day": {"date_histogram": {"field": "date", "calendar_interval": "day", "format": "yyyy-MM-dd"}}},
+            {"category": {"terms": {"field": "category", "missing_bucket": True}}},
+            {"source": {"terms": {"field": "source", "missing_bucket": True}}}
+        ]
+        def actions():
+            for bucket in self._composite(READ_ALIAS, composite_sources, {"match_all": {}}):
+                key = (
+                    bucket["key"]["day"],
+                    bucket["key"]["category"] or 'Uncategorized',
+                    bucket["key"]["source"] or 'Unknown'
+                )
+                yield {
+                    '_index': ROLLUP_INDEX,
+                    '_id': "|".join(key),
+                    '_source': {'day': key[0], 'category': key[1], 'source': key[2], 'count': bucket["doc_count"]}
+                }
+
+        self.es.indices.delete(index=ROLLUP_INDEX, ignore_unavailable=True)
+        ensure_rollup_index(self.es)
+        rows, _ = helpers.bulk(self.es, actions(), chunk_size=1000, refresh=True)
+        return rows
+
+    def close(self):
+        self.es.close()
+
+
+SQLITE_TABLE = "articles"
+SQLITE_COLUMNS = (
+    "title", "content", "summary", "description", "url", "source",
+    "date", "category", "category_score", "author", "cluster_id", "embedding"
+) + VERSION_FIELDS
+# Stored as float32 blobs and returned as lists of floats
+SQLITE_VECTOR_COLUMNS = ("embedding",)
+# Columns added after the first schema, created on databases that predate them
+SQLITE_ADDED_COLUMNS = {"embedding": "BLOB", "model_version": "TEXT", "label_version": "TEXT"}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    pk INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT,
+    content TEXT,
+    summary TEXT,
+    description TEXT,
+    url TEXT,
+    source TEXT,
+    date TEXT,
+    category TEXT,
+    category_score REAL,
+    author TEXT,
+    cluster_id TEXT,
+    embedding BLOB,
+    model_version TEXT,
+    label_version TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS articles_date ON articles (date, url);
+CREATE INDEX IF NOT EXISTS articles_source ON articles (source);
+CREATE INDEX IF NOT EXISTS articles_category ON articles (category);
+CREATE INDEX IF NOT EXISTS articles_unprocessed ON articles (pk) WHERE summary IS NULL;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, content, summary, content='articles', content_rowid='pk'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, content, summary)
+    VALUES (new.pk, new.title, new.content, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, content, summary)
+    VALUES ('delete', old.pk, old.title, old.content, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE OF title, content, summary ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, content, summary)
+    VALUES ('delete', old.pk, old.title, old.content, old.summary);
+    INSERT INTO articles_fts (rowid, title, content, summary)
+    VALUES (new.pk, new.title, new.content, new.summary);
+END;
+
+CREATE TABLE IF NOT EXISTS daily_counts (
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    source TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, category, source)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+# Field weights for bm25(), in FTS column order; mirrors title^2 in the Elasticsearch query
+FTS_WEIGHTS = (2.0, 1.0, 1.0)
+
+
+def fts_query(text: str) -> str:
+    """FTS5 MATCH expression that matches any of the words, like multi_match"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " OR ".join(f'"{term}"' for term in terms if term)
+
+
+class SQLiteStorage(Storage):
+    """Articles in a local SQLite database with an FTS5 full-text index.
+
+    For single-node and edge deployments that don't need a cluster. Fields
+    outside the fixed columns are kept in a JSON ``extra`` column.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "news.db", bulk_chunk_size: int = 500):
+        self.path = path
+        self.bulk_chunk_size = bulk_chunk_size
+        # One connection shared across threads, serialized by a lock;
+        # WAL lets other processes read while the collector writes
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.conn:
+            self.conn.executescript(SQLITE_SCHEMA)
+            # Databases created before a column was added get it here
+            existing = {row['name'] for row in self.conn.execute("PRAGMA table_info(articles)")}
+            for name, column_type in SQLITE_ADDED_COLUMNS.items():
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE articles ADD COLUMN {name} {column_type}")
+        # Embedding matrix for brute-force kNN, reloaded when the generation changes
+        self._vectors = None
+
+    def _bump_generation(self):
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+    @staticmethod
+    def _split(doc: dict) -> Tuple[Dict[str, object], Dict[str, object]]:
+        columns = {k: v for k, v in doc.items() if k in SQLITE_COLUMNS}
+        extra = {k: v for k, v in doc.items() if k not in SQLITE_COLUMNS}
+        for name in SQLITE_VECTOR_COLUMNS:
+            if columns.get(name) is not None:
+                columns[name] = np.asarray(columns[name], dtype=np.float32).tobytes()
+        return columns, extra
+
+    def _upsert(self, doc: dict) -> bool:
+        """Upsert one document, returning whether it was created"""
+        doc = dict(doc)
+        doc_id = doc.pop('_id')
+        exists = self.conn.execute("SELECT 1 FROM articles WHERE id = ?", (doc_id,)).fetchone() is not None
+        columns, extra = self._split(doc)
+        names = list(columns)
+        # Same rule as the Elasticsearch upsert: keep a classified category
+        updated = [name for name in names if name != 'category' or 'summary' in doc]
+        assignments = [f"{name} = excluded.{name}" for name in updated]
+        assignments.append("extra = json_patch(coalesce(articles.extra, '{}'), excluded.extra)")
+        self.conn.execute(
+            f"INSERT INTO articles (id, {', '.join(names + ['extra'])}) "
+            f"VALUES ({', '.join('?' * (len(names) + 2))}) "
+            f"ON CONFLICT (id) DO UPDATE SET {', '.join(assignments)}",
+            [doc_id] + [columns[name] for name in names] + [json.dumps(extra)]
+        )
+        return not exists
+
+    def bulk_upsert(self, docs):
+        indexed = 0
+        failures: List[dict] = []
+        created: List[str] = []
+        chunk = []
+
+        def flush():
+            nonlocal indexed
+            with self.lock, self.conn:
+                for doc in chunk:
+                    try:
+                        if self._upsert(doc):
+                            created.append(doc['_id'])
+                        indexed += 1
+                    except (sqlite3.Error, TypeError, ValueError) as e:
+                        failures.append({'_id': doc.get('_id'), 'error': str(e)})
+                        log.warning("Failed to index article", extra={"id": doc.get('_id'), "error": str(e)})
+                self._bump_generation()
+            chunk.clear()
+
+        for doc in docs:
+            chunk.append(doc)
+            if len(chunk) >= self.bulk_chunk_size:
+                flush()
+        if chunk:
+            flush()
+
+        return {'indexed': indexed, 'failed': failures, 'created': created}
+
+    @staticmethod
+    def _source(row: sqlite3.Row, fields: Optional[Sequence[str]]) -> dict:
+        source = {name: row[name] for name in SQLITE_COLUMNS if name in row.keys() and row[name] is not None}
+        for name in SQLITE_VECTOR_COLUMNS:
+            if name in source:
+                source[name] = np.frombuffer(source[name], dtype=np.float32).tolist()
+        if 'extra' in row.keys() and row['extra']:
+            source.update(json.loads(row['extra']))
+        if fields is not None:
+            source = {k: v for k, v in source.items() if k in fields}
+        return source
+
+    def _hit(self, row: sqlite3.Row, fields: Optional[Sequence[str]]) -> dict:
+        return {'_id': row['id'], '_index': SQLITE_TABLE, '_source': self._source(row, fields)}
+
+    @staticmethod
+    def _filters(sources, categories, date_range, date_column: str = "date") -> Tuple[List[str], List[object]]:
+        conditions = []
+        params: List[object] = []
+        if sources:
+            conditions.append(f"source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+        if categories:
+            conditions.append(f"category IN ({', '.join('?' * len(categories))})")
+            params.extend(categories)
+        if date_range:
+            # Stored dates are full timestamps, so the end day is included by
+            # comparing against the start of the following day
+            conditions.append(f"{date_column} >= ? AND {date_column} < ?")
+            params.extend([date_range[0].isoformat(), (date_range[1] + timedelta(days=1)).isoformat()])
+        return conditions, params
+
+    def search(self, text=None, sources=None, categories=None, date_range=None, sort=SORT_NEWEST,
+               size=20, fields=None, search_after=None):
+        conditions, params = self._filters(sources, categories, date_range)
+        if text and fts_query(text):
+            conditions.insert(0, "articles_fts MATCH ?")
+            params.insert(0, fts_query(text))
+        else:
+            text = None
+
+        if text:
+            weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+            matched = (
+                f"SELECT articles.*, bm25(articles_fts, {weights}) AS score "
+                "FROM articles_fts JOIN articles ON articles.pk = articles_fts.rowid"
+            )
+        else:
+            matched = "SELECT articles.*, 0.0 AS score FROM articles"
+        if conditions:
+            matched += " WHERE " + " AND ".join(conditions)
+
+        with self.lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM ({matched})", params).fetchone()[0]
+
+        # Keyset pagination on (sort key, url), the same cursor shape as search_after
+        if sort == SORT_RELEVANCE and text:
+            # bm25() is lower for better matches
+            key, order, compare = "score", "ASC", ">"
+        elif sort == SORT_OLDEST:
+            key, order, compare = "date", "ASC", ">"
+        else:
+            key, order, compare = "date", "DESC", "<"
+
+        page_query = f"SELECT * FROM ({matched})"
+        page_params = list(params)
+        if search_after:
+            page_query += f" WHERE ({key} {compare} ? OR ({key} = ? AND url > ?))"
+            page_params.extend([search_after[0], search_after[0], search_after[1]])
+        page_query += f" ORDER BY {key} {order}, url ASC LIMIT ?"
+        page_params.append(size)
+
+        with self.lock:
+            rows = self.conn.execute(page_query, page_params).fetchall()
+
+        hits = []
+        for row in rows:
+            hit = self._hit(row, fields)
+            hit['sort'] = [row[key], row['url']]
+            hits.append(hit)
+        next_cursor = hits[-1]['sort'] if len(hits) == size else None
+        return hits, next_cursor, total
+
+    def _embedding_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        generation = self.generation()
+        if self._vectors is None or self._vectors[0] != generation:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT pk, embedding FROM articles WHERE embedding IS NOT NULL ORDER BY pk"
+                ).fetchall()
+            keys = np.array([row['pk'] for row in rows], dtype=np.int64)
+            matrix = np.stack([np.frombuffer(row['embedding'], dtype=np.float32) for row in rows]) \
+                if rows else np.zeros((0, 0), dtype=np.float32)
+            self._vectors = (generation, keys, matrix)
+        return self._vectors[1], self._vectors[2]
+
+    def knn_search(self, vector, size=20, offset=0, sources=None, categories=None, date_range=None, fields=None):
+        # No ANN index in SQLite: score every matching embedding with NumPy
+        keys, matrix = self._embedding_matrix()
+        conditions, params = self._filters(sources, categories, date_range)
+        if conditions:
+            with self.lock:
+                allowed = [row[0] for row in self.conn.execute(
+                    f"SELECT pk FROM articles WHERE {' AND '.join(conditions)}", params
+                )]
+            mask = np.isin(keys, np.array(allowed, dtype=np.int64))
+            keys, matrix = keys[mask], matrix[mask]
+
+        top, scores = brute_force_knn(vector, matrix, offset + size)
+        page = [(int(keys[i]), float(score)) for i, score in zip(top[offset:], scores[offset:])]
+        if not page:
+            return [], len(keys)
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM articles WHERE pk IN ({', '.join('?' * len(page))})",
+                [pk for pk, _ in page]
+            ).fetchall()
+        by_key = {row['pk']: row for row in rows}
+        hits = []
+        for pk, score in page:
+            if pk in by_key:
+                hits.append(dict(self._hit(by_key[pk], fields), _score=score))
+        return hits, len(keys)
+
+    def facets(self):
+        with self.lock:
+            sources = self.conn.execute(
+                "SELECT source FROM articles WHERE source IS NOT NULL "
+                "GROUP BY source ORDER BY COUNT(*) DESC LIMIT 100"
+            ).fetchall()
+            categories = self.conn.execute(
+                "SELECT category FROM articles WHERE category IS NOT NULL "
+                "GROUP BY category ORDER BY COUNT(*) DESC LIMIT 100"
+            ).fetchall()
+            min_date, max_date = self.conn.execute("SELECT MIN(date), MAX(date) FROM articles").fetchone()
+        return {
+            "sources": [row[0] for row in sources],
+            "categories": [row[0] for row in categories],
+            "min_date": min_date,
+            "max_date": max_date
+        }
+
+    def get(self, doc_id, fields=None, index=None):
+        return self.get_many([doc_id], fields).get(doc_id)
+
+    def get_many(self, doc_ids, fields=None):
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM articles WHERE id IN ({', '.join('?' * len(doc_ids))})",
+                doc_ids
+            ).fetchall()
+        return {row['id']: self._source(row, fields) for row in rows}
+
+    def find_unprocessed(self, size, fields=None):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM articles WHERE summary IS NULL ORDER BY pk LIMIT ?",
+                (size,)
+            ).fetchall()
+        return [self._hit(row, fields) for row in rows]
+
+    def find_stale(self, versions, size, fields=None, search_after=None):
+        conditions = [
+            "summary IS NOT NULL",
+            "(" + " OR ".join(
+                f"{field} IS NULL OR {field} NOT IN ({', '.join('?' * len(values))})"
+                for field, values in versions.items()
+            ) + ")"
+        ]
+        params: List[object] = [value for values in versions.values() for value in values]
+        if search_after:
+            conditions.append("(date < ? OR (date = ? AND url > ?))")
+            params.extend([search_after[0], search_after[0], search_after[1]])
+        params.append(size)
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM articles WHERE {' AND '.join(conditions)} ORDER BY date DESC, url ASC LIMIT ?",
+                params
+            ).fetchall()
+
+        hits = []
+        for row in rows:
+            hit = self._hit(row, fields)
+            hit['sort'] = [row['date'], row['url']]
+            hits.append(hit)
+        return hits, hits[-1]['sort'] if len(hits) == size else None
+
+    def scan(self, fields=None, batch_size=1000):
+        last_pk = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT * FROM articles WHERE pk > ? ORDER BY pk LIMIT ?",
+                    (last_pk, batch_size)
+                ).fetchall()
+            if rows:
+                yield [self._hit(row, fields) for row in rows]
+            if len(rows) < batch_size:
+                return
+            last_pk = rows[-1]['pk']
+
+    def update(self, hits, docs):
+        updated = []
+        with self.lock, self.conn:
+            for hit in hits:
+                if hit['_id'] not in docs:
+                    continue
+                columns, extra = self._split(docs[hit['_id']])
+                assignments = [f"{name} = ?" for name in columns]
+                assignments.append("extra = json_patch(coalesce(extra, '{}'), ?)")
+                cursor = self.conn.execute(
+                    f"UPDATE articles SET {', '.join(assignments)} WHERE id = ?",
+                    list(columns.values()) + [json.dumps(extra), hit['_id']]
+                )
+                if cursor.rowcount:
+                    updated.append(hit['_id'])
+            self._bump_generation()
+        return updated
+
+    def generation(self):
+        with self.lock:
+            return self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def add_daily_counts(self, counts):
+        rows = [key + (n,) for key, n in counts.items() if n]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO daily_counts (day, category, source, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, category, source) DO UPDATE SET count = count + excluded.count",
+                rows
+            )
+
+    def daily_counts(self, group_by=DIMENSIONS, sources=None, categories=None, date_range=None):
+        conditions, params = self._filters(sources, categories, date_range, date_column="day")
+        query = f"SELECT {', '.join(list(group_by) + ['SUM(count) AS count'])} FROM daily_counts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if group_by:
+            query += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(query, params)]
+
+    def rebuild_daily_counts(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM daily_counts")
+            cursor = self.conn.execute(
+                "INSERT INTO daily_counts (day, category, source, count) "
+                "SELECT substr(date, 1, 10), coalesce(category, 'Uncategorized'), coalesce(source, 'Unknown'), COUNT(*) "
+                "FROM articles WHERE length(date) >= 10 GROUP BY 1, 2, 3"
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_storage(backend: Optional[str] = None, es: Optional[Elasticsearch] = None) -> Storage:
+    """Storage backend selected by the storage_backend environment variable"""
+    backend = (backend or os.getenv("storage_backend", "elasticsearch")).lower()
+    bulk_chunk_size = int(os.getenv("bulk_chunk_size", 500))
+
+    if backend == "sqlite":
+        return SQLiteStorage(os.getenv("sqlite_path", "news.db"), bulk_chunk_size=bulk_chunk_size)
+    if backend != "elasticsearch":
+        raise ValueError(f"Unknown storage backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    return ElasticsearchStorage(
+        es,
+        bulk_chunk_size=bulk_chunk_size,
+        bulk_max_chunk_bytes=int(os.getenv("bulk_max_chunk_bytes", 10 * 1024 * 1024))
+    )
@@ -0,0 +1,99 @@
+import argparse
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, List
+
+from data_collection_agent import CATEGORIES, DataCollectionAgent
+from data_processing_agent import DataProcessingAgent
+from metrics import get_logger
+
+_DONE = object()
+
+log = get_logger("pipeline")
+
+
+class StreamingPipeline:
+    """Collects, enriches and indexes articles in one pass.
+
+    A producer thread fetches and validates articles into a bounded queue,
+    so fetching pauses whenever inference falls behind. The consumer groups
+    queued articles into blocks, runs them through the processing agent's
+    batched inference, and streams the enriched documents to the bulk
+    indexer, so every article is written exactly once.
+    """
+
+    def __init__(
+        self,
+        collector: DataCollectionAgent,
+        processor: DataProcessingAgent,
+        queue_size: int = 256,
+        block_timeout: float = 2.0
+    ):
+        self.collector = collector
+        self.processor = processor
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.block_timeout = block_timeout
+        self.errors: List[Exception] = []
+
+    def _produce(self, categories: Iterable[str], ingested: dict):
+        try:
+            for doc in self.collector.iter_documents(categories, ingested):
+                # Blocks while the queue is full, applying backpressure to the fetchers
+                self.queue.put(doc)
+        except Exception as e:
+            log.error("Error collecting articles", extra={"error": str(e)})
+            self.errors.append(e)
+        finally:
+            self.queue.put(_DONE)
+
+    def _blocks(self) -> Iterator[List[dict]]:
+        """Group queued documents into blocks of up to the processor's block size"""
+        done = False
+        while not done:
+            block = [self.queue.get()]
+            if block[0] is _DONE:
+                return
+            deadline = time.monotonic() + self.block_timeout
+            while len(block) < self.processor.block_size:
+                try:
+                    doc = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if doc is _DONE:
+                    done = True
+                    break
+                block.append(doc)
+            yield block
+
+    def _enriched_documents(self) -> Iterator[dict]:
+        for block in self._blocks():
+            hits = [{'_id': self.collector.document_id(doc['url']), '_source': doc} for doc in block]
+            enrichments = self.processor.enrich_articles(hits)
+            for hit in hits:
+                if hit['_id'] in enrichments:
+                    hit['_source'].update(enrichments[hit['_id']])
+                yield hit['_source']
+
+    def run(self, categories: Iterable[str] = CATEGORIES) -> dict:
+        self.processor.reset_budget()
+        ingested = {}
+        producer = threading.Thread(target=self._produce, args=(categories, ingested), daemon=True)
+        producer.start()
+
+        result = self.collector.index_articles(self._enriched_documents())
+        producer.join()
+
+        self.collector.record_ingested(ingested, result)
+        log.info("Indexed enriched articles", extra={"indexed": result['indexed'], "failed": len(result['failed'])})
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect, enrich and index articles in a single streaming pass")
+    parser.add_argument("--queue-size", type=int, default=256, help="maximum articles waiting for inference")
+    parser.add_argument("--categories", nargs="+", default=CATEGORIES)
+    args = parser.parse_args()
+
+    pipeline = StreamingPipeline(DataCollectionAgent(), DataProcessingAgent(), queue_size=args.queue_size)
+    pipeline.run(args.categories)
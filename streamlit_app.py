@@ -1,9 +1,20 @@
 import streamlit as st
-from elasticsearch import Elasticsearch, NotFoundError
-from datetime import datetime
+from datetime import date, datetime
 import pandas as pd
+import hashlib
+import json
 import os
 from dotenv import load_dotenv
+from index_management import ensure_index_setup
+from metrics import get_logger, start_exporter, timed
+from storage import (
+    SORT_NEWEST,
+    SORT_OLDEST,
+    SORT_RELEVANCE,
+    ElasticsearchStorage,
+    create_es_client,
+    open_storage
+)
 
 # Must be the first Streamlit command
 st.set_page_config(
@@ -20,51 +31,39 @@ if 'initialized' not in st.session_state:
 # Load environment variables
 load_dotenv()
 
-# Initialize Elasticsearch client with better error handling
+log = get_logger("app")
+
+# Initialize the article storage with better error handling
 @st.cache_resource(show_spinner=False)
-def init_elasticsearch():
+def init_storage():
+    # /metrics endpoint or textfile export, when configured
+    start_exporter()
+
+    if os.getenv("storage_backend", "elasticsearch") == "sqlite":
+        return open_storage("sqlite")
+
     try:
         # Get cloud configuration from secrets
-        elastic_username = st.secrets["elastic_username"]
-        elastic_password = st.secrets["elastic_password"]
-        
-        # Initialize Elasticsearch with Cloud ID
-        es = Elasticsearch(
-            cloud_id="news_aggregator:dXMtY2VudHJhbDEuZ2NwLmNsb3VkLmVzLmlvJGU1NzU1MDM3OWM4YTQzZTZiZTRjNzQ3NmIwYTlkNmY0JDU1ZWU4ZDQyNTdkYTRhMmY4ZDE4MGZlY2Q4NzRlZTdl",
-            basic_auth=(elastic_username, elastic_password)
-        )
+        es = create_es_client(st.secrets["elastic_username"], st.secrets["elastic_password"])
 
         # Test connection
         if not es.ping():
             st.error("⚠️ Could not connect to Elasticsearch. Please check your configuration.")
             st.stop()
 
-        # Ensure index exists
-        if not es.indices.exists(index="news"):
-            es.indices.create(
-                index="news",
-                mappings={
-                    "properties": {
-                        "title": {"type": "text"},
-                        "content": {"type": "text"},
-                        "summary": {"type": "text"},
-                        "url": {"type": "keyword"},
-                        "source": {"type": "keyword"},
-                        "date": {"type": "date"},
-                        "category": {"type": "keyword"},
-                        "category_score": {"type": "float"},
-                        "author": {"type": "keyword"}
-                    }
-                }
-            )
-
-        return es
+        # Ensure the index template, partitions and aliases exist
+        try:
+            ensure_index_setup(es)
+        except RuntimeError as e:
+            st.warning(f"⚠️ {str(e)}")
+
+        return ElasticsearchStorage(es)
     except Exception as e:
         st.error(f"⚠️ Error connecting to Elasticsearch: {str(e)}")
         st.stop()
 
-# Initialize Elasticsearch
-es = init_elasticsearch()
+# Initialize storage
+storage = init_storage()
 
 # Custom CSS with improved visibility and dark theme compatibility
 st.markdown("""
@@ -157,29 +156,41 @@ st.caption('Your personalized news feed')
 # Sidebar filters
 st.sidebar.title("📊 Filters")
 
+# Page selection
+VIEWS = ["📰 Articles", "📈 Trends"]
+view = st.sidebar.radio("View", options=VIEWS, horizontal=True, label_visibility="collapsed")
+
 # Search
 search_query = st.sidebar.text_input("🔍 Search articles")
 
-# Get unique sources and categories from Elasticsearch
-def get_unique_values(field):
-    try:
-        res = es.search(
-            index="news",
-            body={
-                "size": 0,
-                "aggs": {
-                    "unique_values": {
-                        "terms": {"field": f"{field}.keyword", "size": 100}
-                    }
-                }
-            }
-        )
-        return [bucket["key"] for bucket in res["aggregations"]["unique_values"]["buckets"]]
-    except Exception:
-        return []
+# Semantic and hybrid search match on meaning using the article embeddings
+SEARCH_MODES = ["Keyword", "Semantic", "Hybrid"]
+SEMANTIC_SEARCH = os.getenv("semantic_search", "false").lower() == "true"
+search_mode = "Keyword"
+if SEMANTIC_SEARCH:
+    search_mode = st.sidebar.radio("🧠 Search mode", options=SEARCH_MODES, horizontal=True)
+
+# Facets change only when articles are written, so they are cached across sessions
+# and keyed on the index's write generation
+FACET_TTL_SECONDS = 300
+INDEX_STATE_TTL_SECONDS = 10
+
+@st.cache_data(ttl=INDEX_STATE_TTL_SECONDS, show_spinner=False)
+def get_index_generation():
+    return storage.generation()
 
-sources = get_unique_values("source")
-categories = get_unique_values("category")
+# Get unique sources, categories and the date bounds in a single request
+@st.cache_data(ttl=FACET_TTL_SECONDS, show_spinner=False)
+def load_facets(generation):
+    return storage.facets()
+
+try:
+    facets = load_facets(get_index_generation())
+except Exception:
+    facets = {"sources": [], "categories": [], "min_date": None, "max_date": None}
+
+sources = facets["sources"]
+categories = facets["categories"]
 
 # Filters
 source_filter = st.sidebar.multiselect(
@@ -197,18 +208,8 @@ category_filter = st.sidebar.multiselect(
 # Date range filter
 st.sidebar.subheader("📅 Date Range")
 try:
-    dates = es.search(
-        index="news",
-        body={
-            "size": 0,
-            "aggs": {
-                "min_date": {"min": {"field": "date"}},
-                "max_date": {"max": {"field": "date"}}
-            }
-        }
-    )
-    min_date = datetime.fromisoformat(dates["aggregations"]["min_date"]["value_as_string"].replace("Z", "+00:00"))
-    max_date = datetime.fromisoformat(dates["aggregations"]["max_date"]["value_as_string"].replace("Z", "+00:00"))
+    min_date = datetime.fromisoformat(facets["min_date"].replace("Z", "+00:00"))
+    max_date = datetime.fromisoformat(facets["max_date"].replace("Z", "+00:00"))
     date_range = st.sidebar.date_input(
         "Select date range",
         value=(min_date.date(), max_date.date()),
@@ -219,63 +220,157 @@ except Exception:
     date_range = None
 
 # Sort options
+SORT_OPTIONS = {
+    "Newest First": SORT_NEWEST,
+    "Oldest First": SORT_OLDEST,
+    "Relevance": SORT_RELEVANCE
+}
+
 sort_by = st.sidebar.selectbox(
     "🔀 Sort by",
-    options=["Newest First", "Oldest First", "Relevance"]
+    options=list(SORT_OPTIONS)
 )
 
-def fetch_articles():
+# The trends dashboard reads the daily rollup, so its cost doesn't grow with the article index
+ROLLUP_TTL_SECONDS = 60
+
+@st.cache_data(ttl=ROLLUP_TTL_SECONDS, show_spinner=False)
+def load_daily_counts(group_by, sources, categories, date_filter):
+    return pd.DataFrame(storage.daily_counts(list(group_by), sources, categories, date_filter))
+
+def show_trends():
+    st.header("📈 Article Volume")
+    date_filter = tuple(date_range) if date_range and len(date_range) == 2 else None
     try:
-        # Build query
-        must_conditions = []
-        if search_query:
-            must_conditions.append({
-                "multi_match": {
-                    "query": search_query,
-                    "fields": ["title^2", "content", "summary"]
-                }
-            })
-        
-        if source_filter:
-            must_conditions.append({"terms": {"source.keyword": source_filter}})
-        
-        if category_filter:
-            must_conditions.append({"terms": {"category.keyword": category_filter}})
-        
-        if date_range:
-            must_conditions.append({
-                "range": {
-                    "date": {
-                        "gte": date_range[0].isoformat(),
-                        "lte": date_range[1].isoformat()
-                    }
-                }
-            })
-
-        # Sort configuration
-        sort_config = [{"date": {"order": "desc"}}]
-        if sort_by == "Oldest First":
-            sort_config = [{"date": {"order": "asc"}}]
-        elif sort_by == "Relevance" and search_query:
-            sort_config = ["_score"]
-
-        query = {
-            "query": {"bool": {"must": must_conditions}} if must_conditions else {"match_all": {}},
-            "sort": sort_config,
-            "size": 50
-        }
-
-        res = es.search(index="news", body=query)
-        return [hit["_source"] for hit in res["hits"]["hits"]]
+        by_day = load_daily_counts(("day", "category"), source_filter, category_filter, date_filter)
+        by_source = load_daily_counts(("source",), source_filter, category_filter, date_filter)
     except Exception as e:
+        st.error(f"Error loading article volume: {str(e)}")
+        return
+
+    if by_day.empty:
+        st.info("No article counts yet. Collect some articles, or rebuild the counts with `python rollups.py backfill`.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Articles", int(by_day["count"].sum()))
+    with col2:
+        st.metric("Days", by_day["day"].nunique())
+    with col3:
+        st.metric("Sources", len(by_source))
+
+    st.subheader("Articles per day by category")
+    by_day["day"] = pd.to_datetime(by_day["day"])
+    st.line_chart(by_day.pivot_table(index="day", columns="category", values="count", aggfunc="sum", fill_value=0))
+
+    st.subheader("Top sources")
+    st.bar_chart(by_source.set_index("source")["count"].nlargest(20))
+
+if view == "📈 Trends":
+    show_trends()
+    st.stop()
+
+# Feed pages carry only the list-view fields; article bodies are fetched on demand
+PAGE_SIZE = 20
+PAGE_TTL_SECONDS = 60
+CONTENT_TTL_SECONDS = 3600
+LIST_FIELDS = ["title", "source", "date", "category", "category_score", "summary", "url"]
+# Semantic results are ranked neighbours rather than matches, so only the top ones are paged through
+SEMANTIC_MAX_RESULTS = 100
+QUERY_EMBEDDING_TTL_SECONDS = 3600
+
+def search_params(search_query, source_filter, category_filter, date_range, sort_by, search_mode):
+    return {
+        "text": search_query or None,
+        "sources": source_filter,
+        "categories": category_filter,
+        "date_range": [day.isoformat() for day in date_range] if date_range and len(date_range) == 2 else None,
+        "sort": SORT_OPTIONS[sort_by],
+        "mode": search_mode
+    }
+
+@st.cache_resource(show_spinner=False)
+def load_embedder():
+    from embedding_classifier import DEFAULT_EMBEDDING_MODEL, TextEmbedder
+    return TextEmbedder(os.getenv("embedding_model", DEFAULT_EMBEDDING_MODEL))
+
+# The same searches recur across reruns and sessions, so the encoder runs once per distinct query
+@st.cache_data(ttl=QUERY_EMBEDDING_TTL_SECONDS, max_entries=1000, show_spinner=False)
+def embed_query(text):
+    with timed("embed_query"):
+        return load_embedder().encode([text])[0].tolist()
+
+def fetch_semantic_page(params, cursor):
+    offset = json.loads(cursor) if cursor else 0
+    vector = embed_query(params["text"])
+    filters = {key: params[key] for key in ("sources", "categories", "date_range")}
+    with timed("search", mode=params["mode"]):
+        if params["mode"] == "Semantic":
+            hits, total = storage.knn_search(vector, PAGE_SIZE, offset, fields=LIST_FIELDS, **filters)
+        else:
+            hits, total = storage.hybrid_search(params["text"], vector, PAGE_SIZE, offset, fields=LIST_FIELDS, **filters)
+
+    total = min(total, SEMANTIC_MAX_RESULTS)
+    articles = [dict(hit["_source"], _id=hit["_id"], _index=hit["_index"]) for hit in hits]
+    more = len(hits) == PAGE_SIZE and offset + PAGE_SIZE < total
+    return articles, json.dumps(offset + PAGE_SIZE) if more else None, total
+
+@st.cache_data(ttl=PAGE_TTL_SECONDS, show_spinner=False)
+def fetch_page(query_signature, cursor, generation):
+    params = json.loads(query_signature)
+    if params["date_range"]:
+        params["date_range"] = [date.fromisoformat(day) for day in params["date_range"]]
+    if params["mode"] != "Keyword" and params["text"]:
+        return fetch_semantic_page(params, cursor)
+    del params["mode"]
+
+    with timed("search", mode="Keyword"):
+        hits, next_cursor, total = storage.search(
+            **params,
+            size=PAGE_SIZE,
+            fields=LIST_FIELDS,
+            search_after=json.loads(cursor) if cursor else None
+        )
+    articles = [dict(hit["_source"], _id=hit["_id"], _index=hit["_index"]) for hit in hits]
+    return articles, json.dumps(next_cursor) if next_cursor else None, total
+
+@st.cache_data(ttl=CONTENT_TTL_SECONDS, show_spinner=False)
+def fetch_content(index, doc_id):
+    source = storage.get(doc_id, ["content"], index=index) or {}
+    return source.get("content", "")
+
+def fetch_articles(query_signature, cursor):
+    try:
+        try:
+            generation = get_index_generation()
+        except Exception:
+            generation = None
+        return fetch_page(query_signature, cursor, generation)
+    except Exception as e:
+        log.error("Error fetching articles", extra={"error": str(e)})
         st.error(f"Error fetching articles: {str(e)}")
-        return []
+        return [], None, 0
+
+# Each distinct query keeps its own list of page cursors
+query_signature = json.dumps(
+    search_params(search_query, source_filter, category_filter, date_range, sort_by, search_mode),
+    sort_keys=True
+)
+feed_key = hashlib.sha1(query_signature.encode("utf-8")).hexdigest()
+if st.session_state.get("feed_key") != feed_key:
+    st.session_state.feed_key = feed_key
+    st.session_state.feed_cursors = [None]
+if "opened_articles" not in st.session_state:
+    st.session_state.opened_articles = set()
 
 # Fetch and display articles
-articles = fetch_articles()
+page = len(st.session_state.feed_cursors) - 1
+articles, next_cursor, total = fetch_articles(query_signature, st.session_state.feed_cursors[-1])
 
 # For article count
-st.text(f"📚 Showing {len(articles)} articles")
+first = page * PAGE_SIZE + 1 if articles else 0
+st.text(f"📚 Showing {first}-{page * PAGE_SIZE + len(articles)} of {total} articles")
 
 # For article display
 for article in articles:
@@ -296,13 +391,30 @@ for article in articles:
         if 'summary' in article:
             st.info(article["summary"])
         
-        # Full article
+        # Full article, only fetched once the reader asks for it
         with st.expander("📖 Read Full Article"):
-            st.write(article["content"])
+            opened = article["_id"] in st.session_state.opened_articles
+            if opened or st.button("Load full text", key=f"load-{article['_id']}"):
+                st.session_state.opened_articles.add(article["_id"])
+                try:
+                    st.write(fetch_content(article["_index"], article["_id"]))
+                except Exception as e:
+                    st.error(f"Error loading article: {str(e)}")
             if 'url' in article:
                 st.link_button("🔗 Read original article", article['url'])
         
         st.divider()
 
+# Pagination
+col_prev, col_next = st.columns(2)
+with col_prev:
+    if st.button("⬅️ Previous", disabled=page == 0):
+        st.session_state.feed_cursors.pop()
+        st.rerun()
+with col_next:
+    if st.button("Next ➡️", disabled=next_cursor is None):
+        st.session_state.feed_cursors.append(next_cursor)
+        st.rerun()
+
 # Footer
 st.caption("Made with ❤️ using Streamlit and Elasticsearch")
\ No newline at end of file
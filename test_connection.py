@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
+from storage import create_es_client
 
 # Load environment variables
 load_dotenv()
@@ -12,11 +12,7 @@ def test_connection():
         print("Password: [hidden]")
         
         # Initialize connection
-        es = Elasticsearch(
-            cloud_id="news_aggregator:dXMtY2VudHJhbDEuZ2NwLmNsb3VkLmVzLmlvJGU1NzU1MDM3OWM4YTQzZTZiZTRjNzQ3NmIwYTlkNmY0JDU1ZWU4ZDQyNTdkYTRhMmY4ZDE4MGZlY2Q4NzRlZTdl",
-            basic_auth=(os.getenv("elastic_username"), os.getenv("elastic_password")),
-            timeout=30
-        )
+        es = create_es_client()
         
         # Test connection
         info = es.info()
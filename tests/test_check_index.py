@@ -0,0 +1,38 @@
+import pytest
+
+from check_index import percentiles, profile_components
+
+
+def test_profile_components_sums_shards_and_children():
+    term = {"type": "TermQuery", "description": "title:bank", "time_in_nanos": 1_000_000}
+    shard = {
+        "searches": [{
+            "query": [{
+                "type": "BooleanQuery",
+                "description": "title:bank content:bank",
+                "time_in_nanos": 3_000_000,
+                "children": [term]
+            }],
+            "collector": [{"name": "TopDocsCollector", "reason": "search_top_hits", "time_in_nanos": 500_000}]
+        }],
+        "aggregations": [{"type": "StringTermsAggregator", "description": "sources", "time_in_nanos": 2_000_000}],
+        "fetch": {"type": "fetch", "description": "", "time_in_nanos": 4_000_000}
+    }
+    components = profile_components({"shards": [shard, shard]})
+
+    assert components == [
+        ("fetch", 8.0),
+        ("query BooleanQuery title:bank content:bank", 6.0),
+        ("aggregation StringTermsAggregator sources", 4.0),
+        ("query TermQuery title:bank", 2.0),
+        ("collector TopDocsCollector search_top_hits", 1.0)
+    ]
+
+
+def test_profile_components_of_empty_profile():
+    assert profile_components({}) == []
+
+
+def test_percentiles():
+    result = percentiles(list(range(1, 101)))
+    assert result["p50"] == pytest.approx(50.5)
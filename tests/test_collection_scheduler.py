@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import pytest
+
+from collection_scheduler import CategorySchedule, CollectionScheduler
+
+
+def make_scheduler(**kwargs):
+    return CollectionScheduler(SimpleNamespace(rate_limiter=None), categories=["business"], **kwargs)
+
+
+def test_scheduler_shares_its_bucket_with_the_agent():
+    scheduler = make_scheduler(requests_per_day=86400, burst=5)
+    assert scheduler.agent.rate_limiter is scheduler.rate_limiter
+    assert scheduler.rate_limiter.rate == pytest.approx(1)
+
+
+def test_busy_categories_are_polled_more_often():
+    scheduler = make_scheduler(min_interval=60, max_interval=3600, target_per_poll=5, smoothing=1.0)
+    schedule = CategorySchedule("business", interval=600, last_polled=0.1)
+
+    # 20 new articles in an hour: 5 more are expected in 15 minutes
+    scheduler.record_poll(schedule, 20, 0.1 + 3600)
+    assert schedule.rate == pytest.approx(20)
+    assert schedule.interval == pytest.approx(900)
+    assert schedule.next_due == pytest.approx(0.1 + 3600 + 900)
+
+
+def test_quiet_categories_back_off_to_the_maximum():
+    scheduler = make_scheduler(min_interval=300, max_interval=1000)
+    schedule = CategorySchedule("business", interval=300)
+
+    scheduler.record_poll(schedule, 0, 1000.0)
+    assert schedule.interval == 600
+    scheduler.record_poll(schedule, 0, 2000.0)
+    assert schedule.interval == 1000
+
+
+def test_schedules_survive_restarts(tmp_path):
+    path = str(tmp_path / "schedule.json")
+    scheduler = make_scheduler(state_path=path)
+    scheduler.record_poll(scheduler.schedules["business"], 3, 1000.0)
+    scheduler.save_state()
+
+    restored = make_scheduler(state_path=path)
+    assert restored.schedules["business"] == scheduler.schedules["business"]
@@ -0,0 +1,58 @@
+from collection_state import BloomFilter, CollectionState
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f"https://example.com/{i}" for i in range(1000)]
+    for url in urls:
+        bloom.add(url)
+    assert all(url in bloom for url in urls)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"https://example.com/{i}")
+    false_positives = sum(f"https://other.org/{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_filter_round_trip(tmp_path):
+    bloom = BloomFilter(capacity=100)
+    bloom.add("https://example.com/a")
+    bloom.save(str(tmp_path / "seen.bloom"))
+
+    loaded = BloomFilter.load(str(tmp_path / "seen.bloom"))
+    assert "https://example.com/a" in loaded
+    assert loaded.count == 1
+
+
+def test_is_new_skips_seen_urls_and_old_articles(tmp_path):
+    state = CollectionState(str(tmp_path), capacity=100)
+    state.mark_ingested("Business", "https://example.com/a", "2024-01-02T00:00:00Z")
+
+    assert not state.is_new("Business", "https://example.com/a", "2024-01-03T00:00:00Z")
+    assert not state.is_new("Business", "https://example.com/b", "2024-01-01T00:00:00Z")
+    assert state.is_new("Business", "https://example.com/b", "2024-01-03T00:00:00Z")
+    # Watermarks are per category
+    assert state.is_new("Sports", "https://example.com/b", "2024-01-01T00:00:00Z")
+
+
+def test_watermark_stays_below_limit(tmp_path):
+    state = CollectionState(str(tmp_path), capacity=100)
+    state.mark_ingested("Business", "https://example.com/a", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z")
+    state.mark_ingested("Business", "https://example.com/c", "2024-01-03T00:00:00Z", "2024-01-02T00:00:00Z")
+
+    assert state.watermarks["Business"] == "2024-01-01T00:00:00Z"
+    # A failed article from January 2nd is still new on the next run
+    assert state.is_new("Business", "https://example.com/b", "2024-01-02T00:00:00Z")
+
+
+def test_state_round_trip(tmp_path):
+    state = CollectionState(str(tmp_path), capacity=100)
+    state.mark_ingested("Business", "https://example.com/a", "2024-01-02T00:00:00Z")
+    state.save()
+
+    loaded = CollectionState(str(tmp_path), capacity=100)
+    assert loaded.watermarks == {"Business": "2024-01-02T00:00:00Z"}
+    assert not loaded.is_new("Business", "https://example.com/a", None)
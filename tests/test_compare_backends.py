@@ -0,0 +1,35 @@
+import pytest
+
+from compare_backends import benchmark_backend, compare, load_texts, unigram_f1
+
+
+def result(backend, summaries, categories):
+    return {"backend": backend, "load_seconds": 1.0, "summaries": summaries, "categories": categories}
+
+
+def test_compare_scores_against_the_first_backend():
+    reference = result("pytorch", ["rates rise again"], [("Business", 0.9)])
+    quantized = result("quantized", ["rates rise"], [("Business", 0.7)])
+    rows = compare([reference, quantized])
+
+    assert rows[0]["summary_rouge1_vs_reference"] == pytest.approx(1.0)
+    assert rows[1]["summary_rouge1_vs_reference"] == pytest.approx(unigram_f1("rates rise", "rates rise again"))
+    assert rows[1]["category_agreement"] == pytest.approx(1.0)
+    assert rows[1]["category_score_mae"] == pytest.approx(0.2)
+
+
+def test_compare_without_articles_reports_none():
+    row, = compare([result("pytorch", [], [])])
+    assert row["summary_rouge1_vs_reference"] is None
+    assert row["category_agreement"] is None
+
+
+def test_benchmark_needs_texts():
+    with pytest.raises(ValueError, match="No article texts"):
+        benchmark_backend("pytorch", [], batch_size=8)
+
+
+def test_load_texts_skips_empty_articles(tmp_path):
+    path = tmp_path / "articles.jsonl"
+    path.write_text('{"content": "first"}\n{"content": ""}\n\nplain text line\n')
+    assert load_texts(str(path), limit=10) == ["first", "plain text line"]
@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from article_fetcher import ArticleFetcher
+from data_collection_agent import DataCollectionAgent
+from storage import SQLiteStorage
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path):
+    monkeypatch.setenv("news_api_key", "test")
+    monkeypatch.setenv("collector_state_dir", str(tmp_path / "state"))
+    monkeypatch.setenv("near_duplicate_index", str(tmp_path / "near_duplicates.json"))
+    storage = SQLiteStorage(":memory:")
+    yield DataCollectionAgent(storage)
+    storage.close()
+
+
+def test_record_ingested_retries_failures(agent):
+    ingested = {
+        "a": ("Business", "https://example.com/a", "2024-01-01T00:00:00Z"),
+        "b": ("Business", "https://example.com/b", "2024-01-02T00:00:00Z"),
+        "c": ("Business", "https://example.com/c", "2024-01-03T00:00:00Z"),
+        "d": ("Science", "https://example.com/d", "2024-01-04T00:00:00Z")
+    }
+    agent.record_ingested(ingested, {"indexed": 3, "failed": [{"_id": "b"}]})
+
+    state = agent.collection_state
+    assert not state.is_new("Business", "https://example.com/a", "2024-01-01T00:00:00Z")
+    assert not state.is_new("Business", "https://example.com/c", "2024-01-03T00:00:00Z")
+    # The failed article is still new, the other category's watermark is not held back
+    assert state.is_new("Business", "https://example.com/b", "2024-01-02T00:00:00Z")
+    assert state.watermarks == {"Business": "2024-01-01T00:00:00Z", "Science": "2024-01-04T00:00:00Z"}
+
+
+def test_failure_without_timestamp_holds_the_watermark(agent):
+    agent.collection_state.watermarks["Business"] = "2024-01-01T00:00:00Z"
+    ingested = {
+        "a": ("Business", "https://example.com/a", None),
+        "b": ("Business", "https://example.com/b", "2024-01-05T00:00:00Z")
+    }
+    agent.record_ingested(ingested, {"indexed": 1, "failed": [{"_id": "a"}]})
+
+    assert agent.collection_state.watermarks["Business"] == "2024-01-01T00:00:00Z"
+    assert agent.collection_state.is_new("Business", "https://example.com/a", None)
+
+
+def test_bulk_load_partitions_start_at_the_oldest_watermark(agent, monkeypatch):
+    # The health watermark is not in this run, and technology has none yet
+    ranges = []
+    monkeypatch.setattr("data_collection_agent.bulk_load_partitions", lambda es, start, end: ranges.append((start, end)))
+    agent.collection_state.watermarks.update({
+        "business": "2024-01-20T00:00:00Z",
+        "science": "2023-12-31T23:00:00Z",
+        "health": "2023-06-01T00:00:00Z"
+    })
+    agent.bulk_load_partitions(["business", "science", "technology"])
+
+    (start, end), = ranges
+    assert start == datetime(2023, 12, 31, 23, tzinfo=timezone.utc)
+    assert end.date() == datetime.now(timezone.utc).date()
+
+
+def newsapi_page(*urls):
+    return {"status": "ok", "totalResults": len(urls), "articles": [{
+        "url": url,
+        "title": f"Title of {url}",
+        "content": "Some truncated article content, " * 5 + "[+1234 chars]",
+        "publishedAt": "2024-01-01T00:00:00Z"
+    } for url in urls]}
+
+
+def test_full_text_errors_fall_back_to_the_snippet(agent, monkeypatch, tmp_path):
+    monkeypatch.setattr(agent, "fetch_page", lambda category, page: newsapi_page("https://example.com/a"))
+    agent.article_fetcher = ArticleFetcher(cache_dir=str(tmp_path / "cache"))
+
+    def fail(urls):
+        raise RuntimeError("fetcher down")
+
+    monkeypatch.setattr(agent.article_fetcher, "fetch_all", fail)
+    docs = list(agent.iter_documents(["business"]))
+
+    assert [doc["url"] for doc in docs] == ["https://example.com/a"]
+    assert docs[0]["content"].endswith("[+1234 chars]")
+
+
+def test_one_failing_page_only_loses_its_own_full_text(monkeypatch, tmp_path):
+    fetcher = ArticleFetcher(cache_dir=str(tmp_path))
+
+    def fetch(url):
+        if url.endswith("bad"):
+            raise ValueError("unparseable page")
+        return f"text of {url}"
+
+    monkeypatch.setattr(fetcher, "fetch", fetch)
+    assert fetcher.fetch_all(["https://example.com/ok", "https://example.com/bad"]) == {
+        "https://example.com/ok": "text of https://example.com/ok",
+        "https://example.com/bad": None
+    }
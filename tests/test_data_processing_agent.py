@@ -0,0 +1,196 @@
+from types import SimpleNamespace
+
+import pytest
+
+import data_processing_agent
+from data_processing_agent import ABSTRACTIVE, EXTRACTIVE, FALLBACK, DataProcessingAgent
+from storage import SQLiteStorage
+
+CONTENT = "The central bank raised interest rates by a quarter point on Wednesday, citing persistent inflation. " * 3
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        self.texts.extend(texts)
+        return [{"summary_text": f"summary {len(self.texts) - len(texts) + i}"} for i in range(len(texts))]
+
+
+class FakeClassifier:
+    def __call__(self, texts, **kwargs):
+        if isinstance(texts, str):
+            return {"labels": ["Business"], "scores": [0.9]}
+        return [{"labels": ["Business"], "scores": [0.9]} for _ in texts]
+
+
+@pytest.fixture
+def storage():
+    storage = SQLiteStorage(":memory:")
+    yield storage
+    storage.close()
+
+
+def make_agent(monkeypatch, storage):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+    def no_models(*args, **kwargs):
+        raise OSError("no models in tests")
+    monkeypatch.setattr(data_processing_agent, "load_pipeline", no_models)
+
+    agent = DataProcessingAgent(storage)
+    agent.summarizer = FakeSummarizer()
+    agent.classifier = FakeClassifier()
+    return agent
+
+
+def hit(doc_id, cluster_id=None, content=CONTENT):
+    return {"_id": doc_id, "_index": "news", "_source": {"title": doc_id, "content": content, "cluster_id": cluster_id}}
+
+
+def test_one_member_per_cluster_is_inferred(monkeypatch, storage):
+    agent = make_agent(monkeypatch, storage)
+    enrichments = agent.enrich_articles([hit("a", "a"), hit("b", "a"), hit("c", "c")])
+
+    assert len(agent.summarizer.texts) == 2
+    assert enrichments["b"] == enrichments["a"]
+    assert enrichments["c"]["summary"] != enrichments["a"]["summary"]
+
+
+def store_representative(storage, enrichment, **versions):
+    storage.bulk_upsert([dict(enrichment, _id="rep", url="https://example.com/rep", content=CONTENT, **versions)])
+
+
+def test_stored_representative_is_reused(monkeypatch, storage):
+    enrichment = {"summary": "stored summary", "category": "Science", "category_score": 0.8}
+    agent = make_agent(monkeypatch, storage)
+    store_representative(storage, enrichment, **agent.versions[ABSTRACTIVE])
+    enrichments = agent.enrich_articles([hit("copy", "rep")])
+
+    assert agent.summarizer.texts == []
+    assert enrichments["copy"] == dict(enrichment, **agent.versions[ABSTRACTIVE])
+
+
+def test_stale_representative_is_not_reused(monkeypatch, storage):
+    enrichment = {"summary": "stored summary", "category": "Science", "category_score": 0.8}
+    agent = make_agent(monkeypatch, storage)
+    store_representative(storage, enrichment, **dict(agent.versions[ABSTRACTIVE], model_version="old"))
+    enrichments = agent.enrich_articles([hit("copy", "rep")])
+
+    assert len(agent.summarizer.texts) == 1
+    assert enrichments["copy"]["summary"] != "stored summary"
+
+
+def test_fallback_representative_is_not_reused(monkeypatch, storage):
+    enrichment = {"summary": "stored summary", "category": "Science", "category_score": 0.8}
+    agent = make_agent(monkeypatch, storage)
+    store_representative(storage, enrichment, **agent.versions[FALLBACK])
+    agent.enrich_articles([hit("copy", "rep")])
+
+    assert len(agent.summarizer.texts) == 1
+
+
+def test_written_enrichments_are_stamped_with_versions(monkeypatch, storage):
+    storage.bulk_upsert([{"_id": "a", "url": "https://example.com/a", "title": "a", "content": CONTENT}])
+    agent = make_agent(monkeypatch, storage)
+    hits = storage.find_unprocessed(10)
+    agent.write_enrichments(hits, agent.enrich_articles(hits))
+
+    assert storage.get("a")["model_version"] == agent.versions[ABSTRACTIVE]["model_version"]
+    assert storage.find_stale(agent.current_versions, 10) == ([], None)
+    assert len(storage.find_stale(dict(agent.current_versions, label_version=["new"]), 10)[0]) == 1
+
+
+def test_short_articles_skip_inference(monkeypatch, storage):
+    agent = make_agent(monkeypatch, storage)
+    enrichments = agent.enrich_articles([hit("short", content="Too short")])
+
+    assert agent.summarizer.texts == []
+    assert enrichments["short"]["summary"] == "Too short"
+    assert enrichments["short"]["category_score"] == pytest.approx(0.0)
+
+
+def test_budget_overflow_drops_to_extractive(monkeypatch, storage):
+    monkeypatch.setenv("summary_budget_articles", "1")
+    agent = make_agent(monkeypatch, storage)
+    enrichments = agent.enrich_articles([hit("a"), hit("b"), hit("c")])
+
+    assert len(agent.summarizer.texts) == 1
+    assert sorted(e["summary"].startswith("summary") for e in enrichments.values()) == [False, False, True]
+    # Overflowed articles are stamped as a fallback, so re-enrichment picks them up later
+    fallbacks = [e for e in enrichments.values() if not e["summary"].startswith("summary")]
+    assert all(e["model_version"] == agent.versions[FALLBACK]["model_version"] for e in fallbacks)
+    assert fallbacks[0]["model_version"] not in agent.current_versions["model_version"]
+
+
+def test_policy_routes_excluded_categories_to_extractive(monkeypatch, storage):
+    monkeypatch.setenv("summary_extractive_categories", "Sports")
+    agent = make_agent(monkeypatch, storage)
+    sports = hit("a")
+    sports["_source"]["category"] = "Sports"
+    enrichments = agent.enrich_articles([sports, hit("b")])
+
+    assert len(agent.summarizer.texts) == 1
+    assert not enrichments["a"]["summary"].startswith("summary")
+    assert enrichments["b"]["summary"].startswith("summary")
+    # Extractive by policy is current, not a fallback to upgrade
+    assert enrichments["a"]["model_version"] == agent.versions[EXTRACTIVE]["model_version"]
+    assert enrichments["a"]["model_version"] in agent.current_versions["model_version"]
+
+
+def test_reenrich_shares_one_budget_with_new_articles(monkeypatch, storage):
+    monkeypatch.setenv("summary_budget_articles", "1")
+    agent = make_agent(monkeypatch, storage)
+    stale = dict(agent.versions[ABSTRACTIVE], model_version="old", summary="old summary")
+    storage.bulk_upsert([
+        {"_id": "new", "url": "https://example.com/new", "title": "new", "content": CONTENT},
+        dict(stale, _id="a", url="https://example.com/a", title="a", content=CONTENT),
+        dict(stale, _id="b", url="https://example.com/b", title="b", content=CONTENT)
+    ])
+
+    assert agent.reenrich() == 2
+    # The new article spends the budget, the stale ones fall back until the next run
+    assert len(agent.summarizer.texts) == 1
+    assert storage.get("a")["model_version"] == agent.versions[FALLBACK]["model_version"]
+
+
+def test_versions_name_the_loaded_models_and_backend(monkeypatch, storage):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("inference_backend", "onnx")
+    summarizer = FakeSummarizer()
+    summarizer.model = SimpleNamespace(name_or_path="sshleifer/distilbart-cnn-12-6")
+    agent = DataProcessingAgent(storage, summarizer=summarizer, classifier=FakeClassifier())
+
+    assert agent.versions[ABSTRACTIVE]["model_version"] == \
+        "summarizer=sshleifer/distilbart-cnn-12-6;classifier=FakeClassifier;backend=onnx"
+    assert agent.versions[EXTRACTIVE]["model_version"] == "summarizer=extractive;classifier=FakeClassifier;backend=onnx"
+
+
+class FakePitElasticsearch:
+    """A point in time whose ID changes on the first search, like Elasticsearch may do"""
+
+    def __init__(self, hits):
+        self.hits = hits
+        self.closed = []
+
+    def open_point_in_time(self, index, keep_alive):
+        return {"id": "pit-1"}
+
+    def search(self, body):
+        hits = [] if "search_after" in body else self.hits
+        return {"pit_id": "pit-2", "hits": {"hits": hits}}
+
+    def close_point_in_time(self, id):
+        self.closed.append(id)
+
+
+def test_drain_backlog_closes_the_latest_point_in_time(monkeypatch, storage, tmp_path):
+    agent = make_agent(monkeypatch, storage)
+    agent.checkpoint_path = str(tmp_path / "checkpoint.json")
+    agent.es = FakePitElasticsearch([dict(hit("a"), sort=[1])])
+    agent.drain_backlog()
+
+    assert agent.es.closed == ["pit-2"]
+    assert len(agent.summarizer.texts) == 1
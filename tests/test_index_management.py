@@ -0,0 +1,46 @@
+from datetime import date
+
+from index_management import BULK_LOAD_SETTINGS, bulk_load, bulk_load_partitions, index_name, indices_for_range
+
+
+class FakeIndices:
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.settings = {}
+
+    def exists(self, index):
+        return index in self.existing
+
+    def create(self, index):
+        self.existing.add(index)
+
+    def put_settings(self, index, settings):
+        for name in index.split(","):
+            self.settings[name] = settings
+
+    def refresh(self, index):
+        pass
+
+
+class FakeElasticsearch:
+    def __init__(self, existing=()):
+        self.indices = FakeIndices(existing)
+
+
+def test_index_name_and_range():
+    assert index_name("2024-03-05T12:00:00Z") == "news-2024.03"
+    assert indices_for_range(date(2023, 11, 20), date(2024, 1, 1)) == ["news-2023.11", "news-2023.12", "news-2024.01"]
+
+
+def test_bulk_load_partitions_creates_missing_partitions():
+    es = FakeElasticsearch(["news-2024.01"])
+    assert bulk_load_partitions(es, date(2023, 12, 15), date(2024, 1, 10)) == "news-2023.12,news-2024.01"
+    assert es.indices.existing == {"news-2023.12", "news-2024.01"}
+
+
+def test_bulk_load_restores_only_the_given_partitions():
+    es = FakeElasticsearch(["news-2023.12", "news-2024.01"])
+    with bulk_load(es, "news-2023.12"):
+        assert es.indices.settings == {"news-2023.12": BULK_LOAD_SETTINGS}
+    assert es.indices.settings["news-2023.12"]["number_of_replicas"] != BULK_LOAD_SETTINGS["number_of_replicas"]
+    assert "news-2024.01" not in es.indices.settings
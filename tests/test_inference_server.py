@@ -0,0 +1,92 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from inference_server import DynamicBatcher, RemoteClassifier, RemoteSummarizer, make_handler
+
+
+class RecordingModel:
+    """Upper-cases texts and records every call; texts containing "bad" fail"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, **kwargs):
+        self.calls.append((list(texts), kwargs))
+        if any("bad" in text for text in texts):
+            raise ValueError("bad text")
+        return [{"text": text.upper()} for text in texts]
+
+
+def test_concurrent_requests_share_a_batch():
+    model = RecordingModel()
+    batcher = DynamicBatcher(model, max_batch_size=4, max_wait_ms=500)
+    futures = [batcher.submit(["a", "b"]), batcher.submit(["c"]), batcher.submit(["d"])]
+
+    assert [future.result(timeout=5) for future in futures] == [
+        [{"text": "A"}, {"text": "B"}], [{"text": "C"}], [{"text": "D"}]
+    ]
+    assert model.calls == [(["a", "b", "c", "d"], {"batch_size": 4})]
+
+
+def test_requests_with_other_arguments_run_as_separate_groups():
+    model = RecordingModel()
+    batcher = DynamicBatcher(model, max_batch_size=3, max_wait_ms=500)
+    short = batcher.submit(["a"], max_length=30)
+    long = batcher.submit(["b"], max_length=130)
+    other = batcher.submit(["c"], max_length=30)
+
+    assert short.result(timeout=5) == [{"text": "A"}]
+    assert long.result(timeout=5) == [{"text": "B"}]
+    assert other.result(timeout=5) == [{"text": "C"}]
+    assert sorted((texts, kwargs["max_length"]) for texts, kwargs in model.calls) == [(["a", "c"], 30), (["b"], 130)]
+
+
+def test_a_failing_text_only_fails_itself():
+    batcher = DynamicBatcher(RecordingModel(), max_batch_size=3, max_wait_ms=500)
+    good = batcher.submit(["a"])
+    bad = batcher.submit(["bad", "b"])
+
+    assert good.result(timeout=5) == [{"text": "A"}]
+    assert bad.result(timeout=5) == [{"error": "bad text"}, {"text": "B"}]
+
+
+def test_a_failing_group_does_not_stop_the_batcher():
+    outputs = [None, [{"text": "B"}]]
+    batcher = DynamicBatcher(lambda texts, **kwargs: outputs.pop(0), max_wait_ms=10)
+
+    # A result that can't be split between the requests fails only that group
+    with pytest.raises(TypeError):
+        batcher.submit(["a"]).result(timeout=5)
+    assert batcher.submit(["b"]).result(timeout=5) == [{"text": "B"}]
+
+
+MODELS = {"summarize": "test-summarizer", "classify": "test-classifier"}
+
+
+@pytest.fixture
+def server_url():
+    model = RecordingModel()
+    batchers = {
+        "summarize": DynamicBatcher(lambda texts, **kwargs: [{"summary_text": result["text"]} for result in model(texts)]),
+        "classify": DynamicBatcher(model)
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(batchers, MODELS, "onnx"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_remote_models_call_the_server(server_url):
+    summarizer = RemoteSummarizer(server_url)
+    classifier = RemoteClassifier(server_url)
+
+    assert summarizer(["a", "b"], max_length=30, batch_size=8) == [{"summary_text": "A"}, {"summary_text": "B"}]
+    assert classifier("c") == {"text": "C"}
+    with pytest.raises(RuntimeError, match="1 texts"):
+        classifier(["bad", "d"])
+    assert summarizer.model_name == "test-summarizer"
+    assert classifier.model_name == "test-classifier"
+    assert summarizer.backend == "onnx"
@@ -0,0 +1,62 @@
+import time
+
+from near_duplicates import NUM_PERMUTATIONS, NearDuplicateIndex, minhash, similarity
+
+STORY = (
+    "The central bank raised interest rates by a quarter point on Wednesday, "
+    "citing persistent inflation in services and a tight labour market, and "
+    "signalled that further increases remain possible later this year."
+)
+SYNDICATED = STORY + " Reporting by the business desk."
+UNRELATED = (
+    "The home side won the cup final on penalties after a goalless draw, "
+    "with the goalkeeper saving two spot kicks in front of a record crowd."
+)
+
+
+def test_minhash_is_deterministic():
+    signature = minhash(STORY)
+    assert len(signature) == NUM_PERMUTATIONS
+    assert signature == minhash(STORY)
+    assert all(0 <= value < 1 << 32 for value in signature)
+
+
+def test_similarity_estimates_overlap():
+    assert similarity(minhash(STORY), minhash(STORY)) == 1.0
+    assert similarity(minhash(STORY), minhash(SYNDICATED)) > 0.7
+    assert similarity(minhash(STORY), minhash(UNRELATED)) < 0.2
+
+
+def test_index_clusters_near_duplicates():
+    index = NearDuplicateIndex()
+    assert index.assign("a", minhash(STORY)) == "a"
+    assert index.assign("b", minhash(SYNDICATED)) == "a"
+    assert index.assign("c", minhash(UNRELATED)) == "c"
+    # Already indexed documents keep their cluster
+    assert index.assign("b", minhash(UNRELATED)) == "a"
+
+
+def test_prune_forgets_old_signatures():
+    index = NearDuplicateIndex(max_age_days=1)
+    index.add("old", minhash(STORY), "old", added=time.time() - 2 * 86400)
+    index.add("new", minhash(UNRELATED), "new")
+    index.prune()
+
+    assert set(index.signatures) == {"new"}
+    assert index.find(minhash(SYNDICATED)) is None
+
+
+def test_index_round_trip(tmp_path):
+    path = str(tmp_path / "signatures.json")
+    index = NearDuplicateIndex(path)
+    index.assign("a", minhash(STORY))
+    index.save()
+
+    loaded = NearDuplicateIndex(path)
+    assert loaded.find(minhash(SYNDICATED)) == "a"
+
+
+def test_index_ignores_files_from_other_signature_versions(tmp_path):
+    path = tmp_path / "signatures.json"
+    path.write_text('{"signatures": {"a": [[1, 2, 3], "a"]}}')
+    assert NearDuplicateIndex(str(path)).signatures == {}
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from news_io import export_articles, import_articles, import_partitions, parquet_files
+from storage import SQLiteStorage
+
+pytest.importorskip("pyarrow")
+
+
+def article(i, **fields):
+    return dict({
+        "_id": f"doc-{i}",
+        "url": f"https://example.com/{i}",
+        "title": f"Article {i}",
+        "content": "Some article content",
+        "source": "Reuters",
+        "date": f"2024-01-{i:02d}T12:00:00Z"
+    }, **fields)
+
+
+@pytest.fixture
+def source():
+    storage = SQLiteStorage(":memory:")
+    storage.bulk_upsert([
+        article(1, summary="A summary", category="Business", category_score=0.9, embedding=[0.6, 0.8]),
+        article(2),
+        article(3),
+        article(4),
+        article(5)
+    ])
+    yield storage
+    storage.close()
+
+
+def test_export_import_round_trip(source, tmp_path):
+    assert export_articles(source, str(tmp_path), batch_size=2, rows_per_file=2) == 5
+    files = parquet_files([str(tmp_path)])
+    assert len(files) == 3
+
+    target = SQLiteStorage(":memory:")
+    assert import_articles(target, files, workers=2, batch_size=2) == {"indexed": 5, "failed": 0}
+
+    enriched = target.get("doc-1")
+    assert enriched["summary"] == "A summary"
+    assert enriched["category_score"] == pytest.approx(0.9)
+    assert enriched["embedding"] == pytest.approx([0.6, 0.8])
+    # Unenriched articles come back unenriched rather than with a null summary
+    assert sorted(hit["_id"] for hit in target.find_unprocessed(10)) == ["doc-2", "doc-3", "doc-4", "doc-5"]
+    assert sum(row["count"] for row in target.daily_counts()) == 5
+    target.close()
+
+
+def test_export_limits_columns_to_fields(source, tmp_path):
+    import pyarrow.parquet as pq
+
+    export_articles(source, str(tmp_path), fields=["title", "url"])
+    table = pq.read_table(parquet_files([str(tmp_path)])[0])
+    assert table.column_names == ["id", "title", "url"]
+    assert table.num_rows == 5
+
+
+def test_export_splits_batches_at_the_file_limit(source, tmp_path):
+    import pyarrow.parquet as pq
+
+    export_articles(source, str(tmp_path), batch_size=3, rows_per_file=2)
+    assert [pq.ParquetFile(path).metadata.num_rows for path in parquet_files([str(tmp_path)])] == [2, 2, 1]
+
+
+class FakeIndices:
+    def __init__(self, existing):
+        self.existing = set(existing)
+        self.created = []
+
+    def exists(self, index):
+        return index in self.existing
+
+    def create(self, index):
+        self.created.append(index)
+
+
+def test_import_partitions_creates_missing_partitions(source, tmp_path):
+    export_articles(source, str(tmp_path))
+    es = SimpleNamespace(indices=FakeIndices(["news-2023.12"]))
+
+    assert import_partitions(es, parquet_files([str(tmp_path)])) == ["news-2024.01"]
+    assert es.indices.created == ["news-2024.01"]
+
+
+def test_import_partitions_of_files_without_dates(source, tmp_path):
+    export_articles(source, str(tmp_path), fields=["title"])
+    es = SimpleNamespace(indices=FakeIndices([]))
+
+    assert import_partitions(es, parquet_files([str(tmp_path)])) == ["news-write"]
+    assert es.indices.created == []
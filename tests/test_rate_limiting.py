@@ -0,0 +1,51 @@
+import pytest
+
+import rate_limiting
+from rate_limiting import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiting.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_starts_full_and_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    for _ in range(4):
+        assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock[0] += 1
+    assert bucket.try_acquire(2) == 0
+    assert bucket.try_acquire() > 0
+
+
+def test_bucket_never_exceeds_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    clock[0] += 100
+    assert bucket.try_acquire(3) == 0
+    assert bucket.try_acquire() == pytest.approx(1)
+
+
+def test_backoff_doubles_and_honours_retry_after(clock):
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.backoff()
+    assert bucket.try_acquire() == pytest.approx(1)
+
+    bucket.backoff()
+    assert bucket.try_acquire() == pytest.approx(2)
+
+    bucket.backoff(retry_after=30)
+    assert bucket.try_acquire() == pytest.approx(30)
+
+
+def test_reset_backoff(clock):
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.backoff()
+    bucket.backoff()
+    bucket.reset_backoff()
+    clock[0] += 2
+    bucket.backoff()
+    assert bucket.try_acquire() == pytest.approx(1)
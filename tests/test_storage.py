@@ -0,0 +1,323 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from storage import (
+    SORT_OLDEST, SORT_RELEVANCE, ElasticsearchStorage, SQLiteStorage, Storage, brute_force_knn,
+    reciprocal_rank_fusion
+)
+
+
+def article(i, **fields):
+    return dict({
+        "_id": f"doc-{i}",
+        "url": f"https://example.com/{i}",
+        "title": f"Article {i}",
+        "content": "Some article content",
+        "source": "Reuters",
+        "category": "Business",
+        "date": f"2024-01-{i:02d}T12:00:00Z"
+    }, **fields)
+
+
+@pytest.fixture
+def storage():
+    storage = SQLiteStorage(":memory:")
+    yield storage
+    storage.close()
+
+
+def ids(hits):
+    return [hit["_id"] for hit in hits]
+
+
+def test_backend_missing_a_method_cannot_be_created():
+    class Incomplete(Storage):
+        def get(self, doc_id, fields=None, index=None):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_bulk_upsert_reports_created_documents(storage):
+    result = storage.bulk_upsert([article(1), article(2)])
+    assert result["indexed"] == 2
+    assert sorted(result["created"]) == ["doc-1", "doc-2"]
+
+    result = storage.bulk_upsert([article(2, title="Updated"), article(3)])
+    assert result["created"] == ["doc-3"]
+    assert storage.get("doc-2")["title"] == "Updated"
+
+
+def test_upsert_keeps_classified_category(storage):
+    storage.bulk_upsert([article(1, summary="A summary", category="Technology")])
+    storage.bulk_upsert([article(1, category="Business")])
+    assert storage.get("doc-1")["category"] == "Technology"
+
+
+def test_search_matches_any_word(storage):
+    storage.bulk_upsert([
+        article(1, title="Central bank raises rates"),
+        article(2, title="Football final tonight"),
+        article(3, title="Bank earnings beat forecasts")
+    ])
+    hits, _, total = storage.search("bank", sort=SORT_RELEVANCE)
+    assert total == 2
+    assert set(ids(hits)) == {"doc-1", "doc-3"}
+
+
+def test_search_filters_by_source_and_category(storage):
+    storage.bulk_upsert([
+        article(1),
+        article(2, source="BBC"),
+        article(3, category="Sports")
+    ])
+    hits, _, total = storage.search(sources=["Reuters"], categories=["Business"])
+    assert total == 1
+    assert ids(hits) == ["doc-1"]
+
+
+def test_date_range_includes_the_end_day(storage):
+    storage.bulk_upsert([article(i) for i in range(1, 8)])
+    hits, _, total = storage.search(date_range=(date(2024, 1, 3), date(2024, 1, 5)))
+    assert total == 3
+    assert ids(hits) == ["doc-5", "doc-4", "doc-3"]
+
+
+def test_cursor_walks_every_page_once(storage):
+    storage.bulk_upsert([article(i) for i in range(1, 10)])
+    # Two articles on the same day, ordered by url as the tie-breaker
+    storage.bulk_upsert([article(10, date="2024-01-05T12:00:00Z")])
+
+    seen = []
+    cursor = None
+    while True:
+        hits, cursor, total = storage.search(size=3, search_after=cursor)
+        seen.extend(ids(hits))
+        if cursor is None:
+            break
+    assert total == 10
+    assert len(seen) == len(set(seen)) == 10
+    assert seen[:3] == ["doc-9", "doc-8", "doc-7"]
+
+
+def test_cursor_oldest_first(storage):
+    storage.bulk_upsert([article(i) for i in range(1, 6)])
+    hits, cursor, _ = storage.search(sort=SORT_OLDEST, size=2)
+    assert ids(hits) == ["doc-1", "doc-2"]
+    hits, _, _ = storage.search(sort=SORT_OLDEST, size=2, search_after=cursor)
+    assert ids(hits) == ["doc-3", "doc-4"]
+
+
+def test_find_unprocessed_and_update(storage):
+    storage.bulk_upsert([article(1), article(2, summary="s")])
+    hits = storage.find_unprocessed(10)
+    assert ids(hits) == ["doc-1"]
+
+    storage.update(hits, {"doc-1": {"summary": "new", "category": "Science"}})
+    assert storage.find_unprocessed(10) == []
+    assert storage.get("doc-1")["category"] == "Science"
+
+
+def test_find_stale(storage):
+    storage.bulk_upsert([
+        article(1),
+        article(2, summary="s", model_version="current", label_version="labels"),
+        article(3, summary="s", model_version="old", label_version="labels"),
+        article(4, summary="s")
+    ])
+    versions = {"model_version": ["current"], "label_version": ["labels"]}
+    hits, cursor = storage.find_stale(versions, 10)
+    assert ids(hits) == ["doc-4", "doc-3"]
+    assert cursor is None
+
+    hits, cursor = storage.find_stale(versions, 1)
+    assert ids(hits) == ["doc-4"]
+    hits, cursor = storage.find_stale(versions, 1, search_after=cursor)
+    assert ids(hits) == ["doc-3"]
+
+    # Any of the accepted values is current
+    hits, _ = storage.find_stale({"model_version": ["current", "old"], "label_version": ["labels"]}, 10)
+    assert ids(hits) == ["doc-4"]
+
+
+def test_brute_force_knn_orders_by_cosine_similarity():
+    matrix = np.array([[1, 0], [0, 1], [0.6, 0.8]], dtype=np.float32)
+    top, scores = brute_force_knn([0, 2], matrix, 2)
+    assert top.tolist() == [1, 2]
+    assert scores == pytest.approx([1.0, 0.8])
+
+
+def test_brute_force_knn_handles_empty_matrix():
+    top, scores = brute_force_knn([1, 0], np.zeros((0, 2), dtype=np.float32), 5)
+    assert len(top) == len(scores) == 0
+
+
+def test_reciprocal_rank_fusion_rewards_hits_in_both_rankings():
+    keyword = [{"_id": "a"}, {"_id": "b"}, {"_id": "c"}]
+    vector = [{"_id": "c"}, {"_id": "d"}]
+    fused = reciprocal_rank_fusion([keyword, vector], rank_constant=60)
+    # b and d tie at rank 2 and keep the order they were first seen in
+    assert ids(fused) == ["c", "a", "b", "d"]
+    assert fused[0]["_score"] == pytest.approx(1 / 63 + 1 / 61)
+
+
+class FakeIndices:
+    def __init__(self, legacy: bool = False):
+        self.legacy = legacy
+
+    def exists(self, index):
+        return True
+
+    def exists_alias(self, name):
+        return not self.legacy
+
+
+class FakeElasticsearch:
+    """Just enough of the client for ElasticsearchStorage: documents are kept
+    per (index, ID) with a sequence number, ID lookups are answered from them,
+    and other searches are recorded and answered from the queued ``responses``"""
+
+    def __init__(self, legacy: bool = False):
+        self.indices = FakeIndices(legacy)
+        self.docs = {}
+        self.searches = []
+        self.responses = []
+
+    def search(self, index=None, body=None, **kwargs):
+        if "ids" in body.get("query", {}):
+            return {"hits": {"hits": self.lookup(index.split(","), body["query"]["ids"]["values"])}}
+        self.searches.append(dict(body, index=index))
+        hits = self.responses.pop(0) if self.responses else []
+        return {"hits": {"hits": hits, "total": {"value": len(hits)}}}
+
+    def lookup(self, indices, doc_ids):
+        return [
+            {"_index": index, "_id": doc_id, "_source": source}
+            for (index, doc_id), (source, _) in self.docs.items()
+            if doc_id in doc_ids and (index in indices or "news" in indices)
+        ]
+
+    def bulk(self, actions):
+        """Apply update and delete actions like the bulk API, as (ok, item) pairs like helpers.streaming_bulk"""
+        for action in actions:
+            key = (action["_index"], action["_id"])
+            if action["_op_type"] == "delete":
+                yield self.docs.pop(key, None) is not None, {"delete": {"_id": action["_id"], "status": 200}}
+            elif key in self.docs:
+                source, seq_no = self.docs[key]
+                if action.get("if_seq_no", seq_no) != seq_no:
+                    yield False, {"update": {"_id": action["_id"], "status": 409, "error": "version conflict"}}
+                    continue
+                self.docs[key] = (dict(source, **action["doc"]), seq_no + 1)
+                yield True, {"update": {"_id": action["_id"], "status": 200, "result": "updated"}}
+            elif "upsert" in action:
+                self.docs[key] = (dict(action["upsert"]), 0)
+                yield True, {"update": {"_id": action["_id"], "status": 201, "result": "created"}}
+            else:
+                yield False, {"update": {"_id": action["_id"], "status": 404, "error": "document missing"}}
+
+
+@pytest.fixture
+def es(monkeypatch):
+    monkeypatch.setattr("storage.helpers.streaming_bulk", lambda client, actions, **kwargs: client.bulk(actions))
+    return FakeElasticsearch()
+
+
+def test_es_bulk_upsert_routes_articles_to_monthly_partitions(es):
+    storage = ElasticsearchStorage(es)
+    undated = article(2)
+    del undated["date"]
+    result = storage.bulk_upsert([article(1, date="2024-03-05T12:00:00Z"), undated])
+
+    assert sorted(result["created"]) == ["doc-1", "doc-2"]
+    assert set(es.docs) == {("news-2024.03", "doc-1"), ("news-write", "doc-2")}
+
+
+def test_es_bulk_upsert_keeps_classified_category(es):
+    storage = ElasticsearchStorage(es)
+    storage.bulk_upsert([article(1, summary="s", category="Technology")])
+    storage.bulk_upsert([article(1, title="Updated", category="Business")])
+
+    source, _ = es.docs[("news-2024.01", "doc-1")]
+    assert source["title"] == "Updated"
+    assert source["category"] == "Technology"
+
+
+def test_es_bulk_upsert_moves_articles_whose_month_changed(es):
+    storage = ElasticsearchStorage(es)
+    storage.bulk_upsert([article(1, date="2024-01-31T23:00:00Z")])
+    storage.update(
+        [{"_id": "doc-1", "_index": "news-2024.01"}],
+        {"doc-1": {"summary": "A summary", "category": "Science"}}
+    )
+    result = storage.bulk_upsert([article(1, date="2024-02-01T01:00:00Z", title="Corrected")])
+
+    # One copy, in the new month, still enriched, and not counted as a new article
+    assert list(es.docs) == [("news-2024.02", "doc-1")]
+    source, _ = es.docs[("news-2024.02", "doc-1")]
+    assert source["title"] == "Corrected"
+    assert source["date"] == "2024-02-01T01:00:00Z"
+    assert (source["summary"], source["category"]) == ("A summary", "Science")
+    assert result["created"] == []
+
+
+def test_es_bulk_upsert_keeps_undated_articles_where_they_are(es):
+    storage = ElasticsearchStorage(es)
+    storage.bulk_upsert([article(1)])
+    undated = article(1, title="Updated")
+    del undated["date"]
+    storage.bulk_upsert([undated])
+
+    assert list(es.docs) == [("news-2024.01", "doc-1")]
+    assert es.docs[("news-2024.01", "doc-1")][0]["title"] == "Updated"
+
+
+def test_es_update_skips_documents_written_since_they_were_read(es):
+    storage = ElasticsearchStorage(es)
+    storage.bulk_upsert([article(1), article(2)])
+    hits = [
+        {"_id": "doc-1", "_index": "news-2024.01", "_seq_no": 0, "_primary_term": 1},
+        {"_id": "doc-2", "_index": "news-2024.01", "_seq_no": 0, "_primary_term": 1}
+    ]
+    storage.bulk_upsert([article(2, title="Changed by another worker")])
+
+    assert storage.update(hits, {"doc-1": {"summary": "a"}, "doc-2": {"summary": "b"}}) == ["doc-1"]
+    assert es.docs[("news-2024.01", "doc-1")][0]["summary"] == "a"
+    assert "summary" not in es.docs[("news-2024.01", "doc-2")][0]
+
+
+def test_es_search_indices_cover_only_the_date_range(es):
+    storage = ElasticsearchStorage(es)
+    assert storage.search_indices((date(2023, 12, 20), date(2024, 2, 1))) == \
+        "news-2023.12,news-2024.01,news-2024.02"
+    assert storage.search_indices(None) == "news"
+
+    legacy = ElasticsearchStorage(FakeElasticsearch(legacy=True))
+    assert legacy.search_indices((date(2024, 1, 1), date(2024, 1, 31))) == "news"
+
+
+def test_es_search_pages_with_search_after(es):
+    storage = ElasticsearchStorage(es)
+    es.responses.append([{"_id": f"doc-{i}", "sort": [i, f"url-{i}"]} for i in range(2)])
+    hits, cursor, total = storage.search("bank", date_range=(date(2024, 1, 1), date(2024, 1, 31)),
+                                         size=2, search_after=[5, "url-5"])
+
+    assert cursor == [1, "url-1"]
+    assert es.searches[0]["index"] == "news-2024.01"
+    assert es.searches[0]["search_after"] == [5, "url-5"]
+
+
+def test_es_find_stale_excludes_only_fully_current_articles(es):
+    storage = ElasticsearchStorage(es)
+    es.responses.append([{"_id": "doc-1", "sort": ["2024-01-01", "url-1"]}])
+    hits, cursor = storage.find_stale({"model_version": ["current", "extractive"], "label_version": ["labels"]}, 1)
+
+    assert cursor == ["2024-01-01", "url-1"]
+    query = es.searches[0]["query"]["bool"]
+    assert query["filter"] == [{"exists": {"field": "summary"}}]
+    assert query["must_not"] == [{"bool": {"filter": [
+        {"terms": {"model_version": ["current", "extractive"]}}, {"terms": {"label_version": ["labels"]}}
+    ]}}]
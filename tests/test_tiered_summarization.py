@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+from tiered_summarization import ComputeBudget, SummarizationPolicy, extractive_summary, split_sentences
+
+ARTICLE = (
+    "The city council approved a new budget for public transport on Monday. "
+    "The budget adds three bus lines and extends tram service to the airport. "
+    "Council members argued for hours about the cost of the tram extension. "
+    "The weather was mild and sunny throughout the day. "
+    "Public transport ridership has grown every year since the budget was last raised. "
+    "A local bakery celebrated its fiftieth anniversary."
+)
+
+
+def test_split_sentences_drops_truncation_marker():
+    assert split_sentences("First sentence. Second one... [+1234 chars]") == ["First sentence.", "Second one..."]
+
+
+def test_short_texts_are_returned_whole():
+    assert extractive_summary("Only one sentence here.") == "Only one sentence here."
+    assert extractive_summary("") == ""
+
+
+def test_summary_keeps_central_sentences_in_order():
+    summary = extractive_summary(ARTICLE, max_sentences=2)
+    sentences = split_sentences(summary)
+    assert len(sentences) == 2
+    assert all(sentence in split_sentences(ARTICLE) for sentence in sentences)
+    assert "bakery" not in summary
+    positions = [ARTICLE.index(sentence) for sentence in sentences]
+    assert positions == sorted(positions)
+
+
+def test_policy_routes_short_old_and_excluded_articles_to_extractive():
+    policy = SummarizationPolicy(min_abstractive_length=50, max_age_hours=24, extractive_categories=["Sports"])
+    now = datetime(2024, 1, 10, tzinfo=timezone.utc)
+    long_content = "x" * 100
+
+    assert policy.use_abstractive({"content": long_content, "date": "2024-01-09T12:00:00Z"}, now)
+    assert not policy.use_abstractive({"content": "short", "date": "2024-01-09T12:00:00Z"}, now)
+    assert not policy.use_abstractive({"content": long_content, "date": "2024-01-01T00:00:00Z"}, now)
+    assert not policy.use_abstractive({"content": long_content, "category": "sports"}, now)
+
+
+def test_budget_caps_articles_and_seconds():
+    budget = ComputeBudget(articles=5)
+    assert budget.take(3) == 3
+    budget.charge(1.0, 3)
+    assert budget.take(3) == 2
+
+    budget = ComputeBudget(seconds=10)
+    assert budget.take(8) == 8
+    budget.charge(10.0, 8)
+    assert budget.take(8) == 0
@@ -0,0 +1,108 @@
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'])")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# NewsAPI appends a "[+1234 chars]" marker to truncated content
+TRUNCATION_MARKER = re.compile(r"\s*\[\+\d+ chars\]")
+
+
+def split_sentences(text: str) -> List[str]:
+    text = TRUNCATION_MARKER.sub("", text).strip()
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+
+def extractive_summary(text: str, max_sentences: int = 3, damping: float = 0.85, iterations: int = 30) -> str:
+    """TextRank over TF-IDF sentence vectors; returns the top sentences in their original order"""
+    sentences = split_sentences(text)
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences) if sentences else text[:200]
+
+    tokens = [TOKEN_PATTERN.findall(sentence.lower()) for sentence in sentences]
+    vocabulary = {term: i for i, term in enumerate(sorted({term for sentence in tokens for term in sentence}))}
+    if not vocabulary:
+        return " ".join(sentences[:max_sentences])
+
+    # TF-IDF matrix with sentences as documents, rows L2-normalized
+    tf = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+    for row, sentence in enumerate(tokens):
+        for term, count in Counter(sentence).items():
+            tf[row, vocabulary[term]] = count
+    df = np.count_nonzero(tf, axis=0)
+    tfidf = tf * np.log((1 + len(sentences)) / (1 + df) + 1)
+    tfidf /= np.linalg.norm(tfidf, axis=1, keepdims=True).clip(min=1e-9)
+
+    # Cosine similarity graph, row-normalized into a transition matrix
+    similarity = tfidf @ tfidf.T
+    np.fill_diagonal(similarity, 0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1 / len(sentences)), where=row_sums > 0)
+
+    scores = np.full(len(sentences), 1 / len(sentences), dtype=np.float32)
+    for _ in range(iterations):
+        scores = (1 - damping) / len(sentences) + damping * transition.T @ scores
+
+    top = sorted(np.argsort(-scores)[:max_sentences])
+    return " ".join(sentences[i] for i in top)
+
+
+class SummarizationPolicy:
+    """Decides which articles are worth an abstractive (BART) summary.
+
+    Articles shorter than ``min_abstractive_length`` characters, older than
+    ``max_age_hours`` or in one of ``extractive_categories`` get the
+    extractive tier instead.
+    """
+
+    def __init__(
+        self,
+        min_abstractive_length: int = 0,
+        max_age_hours: Optional[float] = None,
+        extractive_categories: Iterable[str] = ()
+    ):
+        self.min_abstractive_length = min_abstractive_length
+        self.max_age_hours = max_age_hours
+        self.extractive_categories = {category.lower() for category in extractive_categories}
+
+    def use_abstractive(self, article: dict, now: datetime = None) -> bool:
+        if len(article.get('content') or '') < self.min_abstractive_length:
+            return False
+        if (article.get('category') or '').lower() in self.extractive_categories:
+            return False
+        if self.max_age_hours is not None and article.get('date'):
+            try:
+                published = datetime.fromisoformat(article['date'].replace("Z", "+00:00"))
+                if published.tzinfo is None:
+                    published = published.replace(tzinfo=timezone.utc)
+                age = (now or datetime.now(timezone.utc)) - published
+                if age.total_seconds() > self.max_age_hours * 3600:
+                    return False
+            except ValueError:
+                pass
+        return True
+
+
+class ComputeBudget:
+    """Per-run cap on abstractive summarization, in seconds and/or articles"""
+
+    def __init__(self, seconds: Optional[float] = None, articles: Optional[int] = None):
+        self.seconds = seconds
+        self.articles = articles
+        self.spent_seconds = 0.0
+        self.spent_articles = 0
+
+    def take(self, requested: int) -> int:
+        """How many of the requested articles may still use the abstractive tier"""
+        if self.seconds is not None and self.spent_seconds >= self.seconds:
+            return 0
+        if self.articles is not None:
+            return max(0, min(requested, self.articles - self.spent_articles))
+        return requested
+
+    def charge(self, seconds: float, articles: int):
+        self.spent_seconds += seconds
+        self.spent_articles += articles